@@ -6,7 +6,7 @@ from fastapi.encoders import jsonable_encoder
 from fastapi.security import OAuth2PasswordRequestForm
 from starlette.middleware.trustedhost import TrustedHostMiddleware
 from services.performance_service import calcular_performance_diaria, calcular_performance_7dias, calcular_performance_30dias
-from utils import get_integracao_por_plataforma
+from utils import get_apis_ativas
 from services.performance_service import (
     get_performance_diaria,
     get_performance_7dias,
@@ -42,9 +42,16 @@ from rotas import solarcloud_routes
 from passlib.hash import bcrypt
 from clients.isolarcloud_client import ApiSolarCloud
 from services.scheduler import start_scheduler
+from services.historico_service import obter_historico
+from services.alarm_service import (
+    sincronizar_alarmes, ja_sincronizado, listar_alarmes, STATUS_ATUAIS, STATUS_RESOLVIDOS
+)
 from utils import hash_sha256
 from clients.huawei_client import ApiHuawei
+from clients.adaptadores import criar_adapter, reunir
+from clients.limitador_fusionsolar import limitador_fusionsolar
 import traceback
+import asyncio
 
 # ============== ⬇ APP ==============
 app = FastAPI()
@@ -72,93 +79,90 @@ start_scheduler()
 
 # ============== ⬇ ROTAS PRINCIPAIS ==============
 
-@app.get("/alarmes_atuais/todos")
-def listar_todos_atuais(db: Session = Depends(get_db), usuario_logado: User = Depends(get_current_user)):
+def _alarmes_da_integracao(db: Session, usuario_logado: User, process_status: str, plant_id=None, fault_level=None):
     integracao = db.query(Integracao).filter_by(cliente_id=usuario_logado.id, plataforma="Sungrow").first()
     if not integracao:
-        raise HTTPException(status_code=404, detail="Integração não encontrada")
+        raise HTTPException(status_code=404, detail="Integração da plataforma Sungrow não encontrada")
 
-    solarcloud = ApiSolarCloud(db=db, integracao=integracao)
-    return solarcloud.get_todos_alarmes_atuais()
+    # Primeira consulta da integração: popula o banco antes de responder
+    if not ja_sincronizado(db, integracao.id):
+        sincronizar_alarmes(db, ApiSolarCloud(db=db, integracao=integracao), completo=True)
 
-@app.get("/alarmes_historico/todos")
-def listar_todos_historico(db: Session = Depends(get_db), usuario_logado: User = Depends(get_current_user)):
-    integracao = db.query(Integracao).filter_by(cliente_id=usuario_logado.id, plataforma="Sungrow").first()
-    if not integracao:
-        raise HTTPException(status_code=404, detail="Integração não encontrada")
+    return listar_alarmes(db, integracao.id, process_status, ps_id=plant_id, fault_level=fault_level)
 
-    solarcloud = ApiSolarCloud(db=db, integracao=integracao)
-    return solarcloud.get_todos_alarmes_historico()
+
+@app.get("/alarmes_atuais/todos")
+def listar_todos_atuais(
+    fault_level: Optional[int] = Query(None),
+    db: Session = Depends(get_db),
+    usuario_logado: User = Depends(get_current_user)
+):
+    return {"alarmes": _alarmes_da_integracao(db, usuario_logado, STATUS_ATUAIS, fault_level=fault_level)}
+
+@app.get("/alarmes_historico/todos")
+def listar_todos_historico(
+    fault_level: Optional[int] = Query(None),
+    db: Session = Depends(get_db),
+    usuario_logado: User = Depends(get_current_user)
+):
+    return {"historico": _alarmes_da_integracao(db, usuario_logado, STATUS_RESOLVIDOS, fault_level=fault_level)}
 
 
 @app.get("/alarmes_atuais")
 def obter_alarmes_atuais(
     plant_id: int = Query(...),
+    fault_level: Optional[int] = Query(None),
     db: Session = Depends(get_db),
     usuario_logado: User = Depends(get_current_user)
 ):
-    integracao = db.query(Integracao).filter_by(cliente_id=usuario_logado.id, plataforma="Sungrow").first()
-
-    if not integracao:
-        raise HTTPException(status_code=404, detail="Integração da plataforma Sungrow não encontrada")
-
-    isolarcloud = ApiSolarCloud(db=db, integracao=integracao)
-
     try:
-        return isolarcloud.get_alarmes_atuais(plant_id=plant_id)
+        alarmes = _alarmes_da_integracao(db, usuario_logado, STATUS_ATUAIS, plant_id, fault_level)
+        return {"alarmes_atuais": alarmes}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao obter alarmes atuais: {str(e)}")
 
 @app.get("/alarmes_historico")
 def obter_alarmes_historico(
     plant_id: int = Query(...),
+    fault_level: Optional[int] = Query(None),
     db: Session = Depends(get_db),
     usuario_logado: User = Depends(get_current_user)
 ):
-    integracao = db.query(Integracao).filter_by(cliente_id=usuario_logado.id, plataforma="Sungrow").first()
-
-    if not integracao:
-        raise HTTPException(status_code=404, detail="Integração da plataforma Sungrow não encontrada")
-
-    isolarcloud = ApiSolarCloud(db=db, integracao=integracao)
-
     try:
-        return isolarcloud.get_alarmes_historico(plant_id=plant_id)
+        historico = _alarmes_da_integracao(db, usuario_logado, STATUS_RESOLVIDOS, plant_id, fault_level)
+        return {"alarmes_historicos": historico}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao obter alarmes históricos: {str(e)}")
 
 @app.get("/usina")
-def listar_usinas(
+async def listar_usinas(
     usuario_logado: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     usinas = []
 
     # Busca todas as integrações desse usuário
-    integracoes = db.query(Integracao).filter_by(cliente_id=usuario_logado.id).all()
+    integracoes = await asyncio.to_thread(lambda: db.query(Integracao).filter_by(cliente_id=usuario_logado.id).all())
 
     if not integracoes:
         print("⚠️ Nenhuma integração encontrada para o cliente.")
         return []
 
-    for integracao in integracoes:
-        try:
-            print(f"🔍 Verificando integração: {integracao.plataforma}")
-            plataforma = integracao.plataforma.lower()
-
-            if plataforma == "sungrow":
-                client = ApiSolarCloud(db=db, integracao=integracao)
-            elif plataforma == "deye":
-                client = ApiDeye(db=db, integracao=integracao)
-            else:
-                print(f"⚠️ Plataforma não suportada: {plataforma}")
-                continue
+    # Todas as plataformas são consultadas ao mesmo tempo
+    criados = await asyncio.gather(*(criar_adapter(i, db) for i in integracoes), return_exceptions=True)
+    adapters = []
+    for integracao, adapter in zip(integracoes, criados):
+        if isinstance(adapter, Exception):
+            print(f"❌ Erro ao buscar usinas da plataforma {integracao.plataforma}:", adapter)
+        elif adapter is not None:
+            adapters.append(adapter)
 
-            usinas += client.get_usinas()
-
-        except Exception as e:
-            print(f"❌ Erro ao buscar usinas da plataforma {integracao.plataforma}:", e)
-            continue
+    for resultado in await reunir(adapters, "listar_usinas"):
+        usinas += resultado or []
 
     print(f"📦 Total de usinas retornadas: {len(usinas)}")
     return agrupar_usinas_por_nome(usinas)
@@ -171,85 +175,48 @@ def listar_geracoes_diarias(
 ):
     geracoes = []
 
-    try:
-        integracao_solar = get_integracao_por_plataforma(db, usuario_logado.id, "Sungrow")
-        if integracao_solar:
-            isolarcloud = ApiSolarCloud(db=db, integracao=integracao_solar)
-            geracoes += isolarcloud.get_geracao().get("diario", [])
-        else:
-            print("⚠️ Integração Sungrow não encontrada")
-    except Exception as e:
-        print("⚠️ Erro ao obter geração da iSolarCloud:", str(e))
-
-    try:
-        integracao_deye = get_integracao_por_plataforma(db, usuario_logado.id, "deye")
-        if integracao_deye:
-            deye = ApiDeye(
-                username=integracao_deye.username,
-                password=integracao_deye.senha
-            )
-            geracoes += deye.get_geracao().get("diario", [])
-        else:
-            print("⚠️ Integração Deye não encontrada")
-    except Exception as e:
-        print("⚠️ Erro ao obter geração da Deye:", str(e))
+    for api in get_apis_ativas(db, usuario_logado.id):
+        try:
+            geracoes += api.get_geracao().get("diario", [])
+        except Exception as e:
+            print(f"⚠️ Erro ao obter geração de {api.__class__.__name__}:", str(e))
 
     return geracoes
 
 
 @app.get("/performance_diaria")
 def performance_diaria(
+    plant_id: Optional[str] = Query(None),
     db: Session = Depends(get_db),
     usuario_logado: User = Depends(get_current_user)
 ):
-    apis = []
-    integracao_sungrow = get_integracao_por_plataforma(db, usuario_logado.id, "Sungrow")
-    integracao_deye = get_integracao_por_plataforma(db, usuario_logado.id, "Deye")
-
-    if integracao_sungrow:
-        apis.append(ApiSolarCloud(db=db, integracao=integracao_sungrow))
-    if integracao_deye:
-        apis.append(ApiDeye(integracao=integracao_deye, db=db))
-
-    return get_performance_diaria(apis, db, usuario_logado.id)
+    apis = get_apis_ativas(db, usuario_logado.id)
+    return get_performance_diaria(apis, db, usuario_logado.id, plant_id=plant_id)
 
 
 
 @app.get("/performance_7dias")
 def performance_7dias(
+    plant_id: Optional[str] = Query(None),
     db: Session = Depends(get_db),
     usuario_logado: User = Depends(get_current_user)
 ):
-    apis = []
-    integracao_sungrow = get_integracao_por_plataforma(db, usuario_logado.id, "Sungrow")
-    integracao_deye = get_integracao_por_plataforma(db, usuario_logado.id, "Deye")
-
-    if integracao_sungrow:
-        apis.append(ApiSolarCloud(db=db, integracao=integracao_sungrow))
-    if integracao_deye:
-        apis.append(ApiDeye(integracao=integracao_deye, db=db))
-
-    return get_performance_7dias(apis, db, usuario_logado.id)
+    apis = get_apis_ativas(db, usuario_logado.id)
+    return get_performance_7dias(apis, db, usuario_logado.id, plant_id=plant_id)
 
 @app.get("/performance_30dias")
 def performance_30dias(
+    plant_id: Optional[str] = Query(None),
     db: Session = Depends(get_db),
     usuario_logado: User = Depends(get_current_user)
 ):
-    apis = []
-    integracao_sungrow = get_integracao_por_plataforma(db, usuario_logado.id, "Sungrow")
-    integracao_deye = get_integracao_por_plataforma(db, usuario_logado.id, "Deye")
-
-    if integracao_sungrow:
-        apis.append(ApiSolarCloud(db=db, integracao=integracao_sungrow))
-    if integracao_deye:
-        apis.append(ApiDeye(integracao=integracao_deye, db=db))
-
-    return get_performance_30dias(apis, db, usuario_logado.id)
+    apis = get_apis_ativas(db, usuario_logado.id)
+    return get_performance_30dias(apis, db, usuario_logado.id, plant_id=plant_id)
 
 @app.get("/dados_tecnicos")
 def obter_dados_tecnicos(
     plant_id: int,
+    perfil: str = Query("completo", regex="^(summary|mppt|strings|grid|completo)$"),
     db: Session = Depends(get_db),
     usuario_logado: User = Depends(get_current_user)
 ):
@@ -259,7 +226,7 @@ def obter_dados_tecnicos(
         raise HTTPException(status_code=404, detail="Integração da plataforma Sungrow não encontrada")
 
     isolarcloud = ApiSolarCloud(db=db, integracao=integracao)
-    return isolarcloud.get_dados_tecnicos(plant_id=plant_id)
+    return isolarcloud.get_dados_tecnicos(plant_id=plant_id, perfil=perfil)
 
 @app.get("/api/geracao")
 def obter_geracao_diaria(
@@ -276,8 +243,11 @@ def obter_geracao_diaria(
     if not integracao:
         raise HTTPException(status_code=404, detail="Integração da plataforma Sungrow não encontrada")
 
-    isolarcloud = ApiSolarCloud(db=db, integracao=integracao)
-    return isolarcloud.get_geracao(period="day", date=date, plant_id=plant_id)
+    def buscar():
+        isolarcloud = ApiSolarCloud(db=db, integracao=integracao)
+        return isolarcloud.get_geracao_dia(data=date, plant_id=plant_id, com_status=True)
+
+    return obter_historico(db, integracao.id, plant_id, "dia", date, buscar)
 
 
 @app.get("/api/geracao/mensal")
@@ -291,8 +261,11 @@ def obter_geracao_mensal(
     if not integracao:
         raise HTTPException(status_code=404, detail="Integração da plataforma Sungrow não encontrada")
 
-    isolarcloud = ApiSolarCloud(db=db, integracao=integracao)
-    return isolarcloud.get_geracao_mes(data=date, plant_id=plant_id)
+    def buscar():
+        isolarcloud = ApiSolarCloud(db=db, integracao=integracao)
+        return isolarcloud.get_geracao_mes(data=date, plant_id=plant_id, com_status=True)
+
+    return obter_historico(db, integracao.id, plant_id, "mes", date, buscar)
 
 @app.get("/api/geracao/anual")
 def obter_geracao_anual(
@@ -305,8 +278,11 @@ def obter_geracao_anual(
     if not integracao:
         raise HTTPException(status_code=404, detail="Integração da plataforma Sungrow não encontrada")
 
-    isolarcloud = ApiSolarCloud(db=db, integracao=integracao)
-    return isolarcloud.get_geracao_ano(ano=year, plant_id=plant_id)
+    def buscar():
+        isolarcloud = ApiSolarCloud(db=db, integracao=integracao)
+        return isolarcloud.get_geracao_ano(ano=year, plant_id=plant_id, com_status=True)
+
+    return obter_historico(db, integracao.id, plant_id, "ano", year, buscar)
 
 @app.get("/protegido")
 def rota_protegida(usuario_logado: User = Depends(get_current_user)):
@@ -417,9 +393,7 @@ def forcar_performance(
     db: Session = Depends(get_db),
     usuario_logado: User = Depends(get_current_user)
 ):
-    from services.performance_service import (
-        get_performance_diaria, get_performance_7dias, get_performance_30dias
-    )
+    from services.performance_service import calcular_performances
     from utils import get_apis_ativas
 
     apis = get_apis_ativas(db, usuario_logado.id)  # ← busca todas APIs daquele cliente
@@ -429,15 +403,13 @@ def forcar_performance(
 
     print(f"🚀 Recalculando performance para cliente_id={usuario_logado.id}")
 
-    diaria = get_performance_diaria(apis, db, usuario_logado.id, forcar=True)
-    dias7 = get_performance_7dias(apis, db, usuario_logado.id, forcar=True)
-    dias30 = get_performance_30dias(apis, db, usuario_logado.id, forcar=True)
+    performances = calcular_performances(apis, db, usuario_logado.id, forcar=True)
 
     return {
         "mensagem": f"Performance recalculada para o cliente.",
-        "diaria": diaria,
-        "7dias": dias7,
-        "30dias": dias30
+        "diaria": performances["diaria"],
+        "7dias": performances["7dias"],
+        "30dias": performances["30dias"]
     }
 
 @integracao_router.post("/")
@@ -527,11 +499,7 @@ from models.monthly_projection import MonthlyProjection
 from esquemas import ProjecaoMensalCreate
 from dependencies import get_current_user
 from database import get_db
-from services.performance_service import (
-    get_performance_diaria,
-    get_performance_7dias,
-    get_performance_30dias
-)
+from services.performance_service import calcular_performances
 from utils import get_apis_ativas
 import traceback
 
@@ -572,16 +540,14 @@ def salvar_e_recalcular_projecao(
 
         # ⚙️ Recalcular performance apenas dessa usina
         apis = get_apis_ativas(db, current_user.id)
-        diaria = get_performance_diaria(apis, db, current_user.id, forcar=True, apenas_plant_id=plant_id)
-        dias7 = get_performance_7dias(apis, db, current_user.id, forcar=True, apenas_plant_id=plant_id)
-        dias30 = get_performance_30dias(apis, db, current_user.id, forcar=True, apenas_plant_id=plant_id)
+        performances = calcular_performances(apis, db, current_user.id, forcar=True, apenas_plant_id=plant_id)
 
         return {
             "message": "Projeções atualizadas e performance recalculada com sucesso.",
             "plant_id": plant_id,
-            "diaria": diaria,
-            "7dias": dias7,
-            "30dias": dias30
+            "diaria": performances["diaria"],
+            "7dias": performances["7dias"],
+            "30dias": performances["30dias"]
         }
 
     except Exception as e:
@@ -614,6 +580,21 @@ def testar_token_huawei(db: Session = Depends(get_db), user: User = Depends(get_
         "token_updated_at": integracao.token_updated_at
     }
 
+@app.get("/huawei/fila")
+def fila_huawei(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    """Chamadas ao FusionSolar em andamento ou aguardando no limitador, por integração e interface."""
+    integracoes = db.query(Integracao).filter_by(cliente_id=user.id, plataforma="Huawei").all()
+    if not integracoes:
+        raise HTTPException(status_code=404, detail="Integração Huawei não encontrada.")
+
+    return {
+        integracao.id: {
+            interface: quantidade
+            for (_, interface), quantidade in limitador_fusionsolar.profundidade_fila(integracao.id).items()
+        }
+        for integracao in integracoes
+    }
+
 # ============== ⬇ INCLUDES ==============
 
 app.include_router(projection.router)
@@ -0,0 +1,88 @@
+import asyncio
+import traceback
+from clients.base_client import AdapterSincrono
+from clients.isolarcloud_client import ApiSolarCloud
+from clients.deye_client import ApiDeye
+from clients.huawei_client import ApiHuawei
+from clients.hypontech_client import ApiHyponCloud
+from sqlalchemy.orm import Session
+
+
+class AdapterSungrow(AdapterSincrono):
+    plataforma = "sungrow"
+
+
+class AdapterDeye(AdapterSincrono):
+    plataforma = "deye"
+
+
+class AdapterHuawei(AdapterSincrono):
+    plataforma = "huawei"
+
+
+class AdapterHypontech(AdapterSincrono):
+    plataforma = "hypontech"
+
+
+ADAPTADORES = {
+    ApiSolarCloud: AdapterSungrow,
+    ApiDeye: AdapterDeye,
+    ApiHuawei: AdapterHuawei,
+    ApiHyponCloud: AdapterHypontech,
+}
+
+CLIENTES_POR_PLATAFORMA = {
+    "sungrow": ApiSolarCloud,
+    "deye": ApiDeye,
+    "huawei": ApiHuawei,
+    "hypontech": ApiHyponCloud,
+}
+
+
+def adaptar(api):
+    """Envolve um cliente síncrono já criado no adapter assíncrono do seu fabricante."""
+    adapter = ADAPTADORES.get(type(api))
+    if adapter is None:
+        raise ValueError(f"Cliente sem adapter assíncrono: {api.__class__.__name__}")
+    return adapter(api)
+
+
+def _criar_cliente(cliente_cls, integracao, db):
+    """
+    Cria o cliente com uma Session só desta thread, no mesmo engine da `db`:
+    clientes criados ao mesmo tempo nunca dividem a Session da requisição.
+    Depois de criado, o cliente fica com a `db`, como os criados fora daqui.
+    """
+    sessao = Session(bind=db.get_bind())
+    try:
+        cliente = cliente_cls(db=sessao, integracao=integracao)
+    finally:
+        sessao.close()
+    cliente.db = db
+    return cliente
+
+
+async def criar_adapter(integracao, db):
+    """Cria o cliente da integração (em thread, pois o login é bloqueante) e o adapter. None se não suportada."""
+    cliente_cls = CLIENTES_POR_PLATAFORMA.get(integracao.plataforma.lower())
+    if cliente_cls is None:
+        print(f"⚠️ Plataforma não suportada: {integracao.plataforma}")
+        return None
+    cliente = await asyncio.to_thread(_criar_cliente, cliente_cls, integracao, db)
+    return adaptar(cliente)
+
+
+async def reunir(adapters, operacao: str, *args, **kwargs) -> list:
+    """
+    Executa a mesma operação em todos os adapters ao mesmo tempo. Os
+    resultados voltam na ordem dos adapters; os que falharem retornam None.
+    """
+    async def executar(adapter):
+        try:
+            return await getattr(adapter, operacao)(*args, **kwargs)
+        except Exception as e:
+            print(f"❌ Erro em {operacao} de {adapter.plataforma}: {e}")
+            traceback.print_exc()
+            return None
+
+    return await asyncio.gather(*(executar(a) for a in adapters))
@@ -11,4 +11,78 @@ class BaseClient(ABC):
 
     @abstractmethod
     def get_device_info(self, ps_id: str):
-        pass
\ No newline at end of file
+        pass
+
+import asyncio
+import threading
+from sqlalchemy.orm import Session
+
+
+class BaseClientAsync(ABC):
+    """
+    Interface assíncrona comum aos fabricantes. Operações que um fabricante não
+    oferece devolvem resultado vazio, para que a agregação entre plataformas
+    não precise tratar cada caso.
+    """
+
+    plataforma = None
+
+    @abstractmethod
+    async def listar_usinas(self) -> list:
+        pass
+
+    @abstractmethod
+    async def janelas_geracao(self) -> dict:
+        """Geração no formato {"diario", "7dias", "30dias": {"total", "por_usina"}}."""
+        pass
+
+    async def geracao_diaria(self, inicio, fim) -> dict:
+        """
+        Energia diária (kWh) por usina entre as datas inicio e fim: {ps_id: {date: kWh}}.
+        Usina consultada sem dados vem com {}; usina cuja consulta falhou fica de fora.
+        """
+        return {}
+
+
+class AdapterSincrono(BaseClientAsync):
+    """
+    Expõe um cliente síncrono (ApiSolarCloud, ApiDeye, ...) pela interface
+    assíncrona, executando cada chamada em uma thread. As requisições continuam
+    saindo pelas sessões HTTP compartilhadas por host, então conexões
+    keep-alive são reaproveitadas entre todas as chamadas concorrentes.
+    """
+
+    def __init__(self, cliente):
+        self.cliente = cliente
+        self._lock = threading.Lock()
+
+    def _executar(self, operacao, *args, **kwargs):
+        """
+        Roda a operação com uma Session do banco só desta thread, aberta no
+        mesmo engine da do cliente: a Session da requisição nunca é usada por
+        duas threads ao mesmo tempo. Chamadas ao mesmo cliente vão uma de cada vez.
+        """
+        with self._lock:
+            db = getattr(self.cliente, "db", None)
+            if db is None:
+                return operacao(*args, **kwargs)
+
+            sessao = Session(bind=db.get_bind())
+            self.cliente.db = sessao
+            try:
+                return operacao(*args, **kwargs)
+            finally:
+                self.cliente.db = db
+                sessao.close()
+
+    async def _em_thread(self, operacao, *args, **kwargs):
+        return await asyncio.to_thread(self._executar, operacao, *args, **kwargs)
+
+    async def listar_usinas(self) -> list:
+        return await self._em_thread(self.cliente.get_usinas) or []
+
+    async def janelas_geracao(self) -> dict:
+        return await self._em_thread(self.cliente.get_geracao) or {}
+
+    async def geracao_diaria(self, inicio, fim) -> dict:
+        return await self._em_thread(self.cliente.get_geracao_diaria, inicio, fim) or {}
@@ -1,15 +1,32 @@
 import requests
 import json
 import time
+import os
 from helpers import parse_float
 from datetime import datetime, timedelta
 from pytz import timezone
 from modelos import Integracao
 from sqlalchemy.orm import Session
+from clients.token_broker import token_broker
+from clients.sessao_http import criar_sessao, codigos_de_erro
+from clients.fanout import paginar, executar_em_paralelo
+from clients.hedging import post_com_hedge
+import threading
+
+
+# Lista de usinas (já com today_energy) por integração, compartilhada entre instâncias: integracao_id -> (timestamp, usinas)
+_usinas_cache = {}
+_usinas_lock = threading.Lock()
+
+# "code" de resposta tratados como falha transitória (retentativa e disjuntor)
+CODIGOS_TRANSITORIOS = os.getenv("DEYE_CODIGOS_TRANSITORIOS", "").split(",")
 
 class ApiDeye:
-    base_url = "https://us1-developer.deyecloud.com/v1.0/"
+    base_url = os.getenv("DEYE_BASE_URL", "https://us1-developer.deyecloud.com/v1.0/")
     cache_expiry = 600 # 10 minutos
+    validade_token = timedelta(hours=2)
+    usinas_por_pagina = 50
+    max_concorrencia = int(os.getenv("DEYE_MAX_CONCORRENCIA", 8))  # requisições simultâneas por conta
     headers_login = {
         'Content-Type': 'application/json'
     }
@@ -27,7 +44,7 @@ class ApiDeye:
         self.last_token_time = 0
         self.cached_data = None
         self.last_cache_time = 0
-        self.session = requests.Session()
+        self.session = criar_sessao(self.base_url, integracao.id, codigos_de_erro("code", CODIGOS_TRANSITORIOS))
         self._geracao_cache = None
         self._geracao_cache_timestamp = None
 
@@ -35,26 +52,29 @@ class ApiDeye:
 
     def autenticar(self):
         """
-        Verifica se já há token válido salvo no banco.
-        Caso contrário, faz:
-        1. login sem companyId,
-        2. obtém companyId,
-        3. login com companyId,
-        4. salva token final e companyId no banco.
+        Obtém o token Deye pelo broker compartilhado, que reaproveita o token
+        em memória/banco e só faz o login completo quando necessário.
         """
-        TOKEN_EXPIRACAO_SEGUNDOS = 7200  # 2 horas
+        try:
+            self.accesstoken = token_broker.obter_token(self.integracao.id, self.validade_token, self._login)
+        except Exception as e:
+            print("❌ Falha na autenticação Deye:", e)
+            return None
 
-        # ✅ 1. Verifica se já existe um token válido no banco
-        if self.integracao.token_acesso and self.integracao.token_updated_at:
-            tempo_passado = (datetime.utcnow() - self.integracao.token_updated_at).total_seconds()
-            if tempo_passado < TOKEN_EXPIRACAO_SEGUNDOS:
-                print("✅ Token Deye válido encontrado no banco — reutilizando")
-                self.accesstoken = self.integracao.token_acesso
-                return self.accesstoken
+        self.last_token_time = time.time()
+        return self.accesstoken
 
+    def _login(self, db: Session, integracao: Integracao):
+        """
+        Login completo Deye:
+        1. login sem companyId,
+        2. obtém companyId,
+        3. login com companyId.
+        Retorna o token final; o companyId é gravado na integração junto com o token.
+        """
         print("🔁 Nenhum token válido — iniciando nova autenticação Deye")
 
-        # 2. Primeiro login sem companyId
+        # 1. Primeiro login sem companyId
         url_login_inicial = self.base_url + f"account/token?appId={self.appid}"
         body_inicial = {
             "appSecret": self.appsecret,
@@ -73,7 +93,7 @@ class ApiDeye:
             print("❌ Token temporário ausente na resposta inicial.")
             return None
 
-        # 3. Obter companyId
+        # 2. Obter companyId
         url_info = self.base_url + "account/info"
         headers_info = {
             "Authorization": f"Bearer {token_temporario}",
@@ -94,7 +114,7 @@ class ApiDeye:
         company_id = str(orgs[0].get("companyId"))
         print("🏢 companyId obtido:", company_id)
 
-        # 4. Login final com companyId
+        # 3. Login final com companyId
         body_final = {
             "appSecret": self.appsecret,
             "email": self.username,
@@ -113,21 +133,57 @@ class ApiDeye:
             print("❌ Erro ao obter token final.")
             return None
 
-        # 5. Salvar token e companyId no banco
-        self.integracao.companyid = company_id
-        self.integracao.token_acesso = token_final
-        self.integracao.token_updated_at = datetime.utcnow()
-        self.db.commit()
-        self.db.refresh(self.integracao)
-
-        self.accesstoken = token_final
-        self.last_token_time = time.time()
+        integracao.companyid = company_id
+        self.companyId = company_id
 
         print("✅ Autenticação Deye concluída com sucesso — novo token salvo")
         return token_final
 
 
+    def _buscar_pagina_usinas(self, pagina: int, headers: dict):
+        """Uma página do station/list. Retorna (estações, total de registros)."""
+        url = self.base_url + "station/list"
+        body = {
+            "page": pagina,
+            "size": self.usinas_por_pagina,
+        }
+
+        response = post_com_hedge(self.session, url, json=body, headers=headers)
+        if response.status_code != 200:
+            print("❌ Erro ao buscar usinas:", response.status_code, response.text)
+            return [], 0
+
+        dados = response.json()
+        estacoes = dados.get("stationList", [])
+        return estacoes, int(dados.get("total") or len(estacoes))
+
+    def _energia_hoje(self, station_id, headers: dict) -> float:
+        hoje = datetime.now(timezone("America/Sao_Paulo")).strftime("%Y-%m-%d")
+        amanha = (datetime.now(timezone("America/Sao_Paulo")) + timedelta(days=1)).strftime("%Y-%m-%d")
+
+        url_energy = self.base_url + "station/history"
+        body_energy = {
+            "stationId": station_id,
+            "startAt": hoje,
+            "endAt": amanha,
+            "granularity": 2,
+        }
+
+        response_energy = self.session.post(url_energy, json=body_energy, headers=headers)
+        if response_energy.status_code == 200:
+            items = response_energy.json().get("stationDataItems", [])
+            if items:
+                return round(float(items[0].get("generationValue", 0.0)), 2)
+        return 0.0
+
     def get_usinas(self):
+        with _usinas_lock:
+            cache = _usinas_cache.get(self.integracao.id)
+        if cache and (time.time() - cache[0] < self.cache_expiry or self.session.indisponivel):
+            # Com o disjuntor aberto a última lista é servida mesmo vencida
+            self.cached_data, self.last_cache_time = cache[1], cache[0]
+            return self.cached_data
+
         # 🔐 Garante token válido com fluxo completo
         if not self.autenticar():
             return []
@@ -137,47 +193,28 @@ class ApiDeye:
             'Authorization': f"Bearer {self.accesstoken}"
         }
 
-        if self.cached_data and time.time() - self.last_cache_time < self.cache_expiry:
-            return self.cached_data
-
-        url = self.base_url + "station/list"
-        body = {
-            "page": 1,
-            "size": 50,
-        }
-
-        response = self.session.post(url, json=body, headers=headers)
-        if response.status_code != 200:
-            print("❌ Erro ao buscar usinas:", response.status_code, response.text)
+        estacoes = paginar(
+            lambda pagina: self._buscar_pagina_usinas(pagina, headers),
+            self.usinas_por_pagina,
+            self.max_concorrencia,
+        )
+        if not estacoes:
             return []
 
-        dados = response.json()
+        # today_energy de todas as estações numa única passada paralela
+        energias_hoje = executar_em_paralelo(
+            lambda usina: self._energia_hoje(usina.get("id"), headers),
+            estacoes,
+            self.max_concorrencia,
+        )
+
         dados_usinas = []
 
         try:
-            for usina in dados.get("stationList", []):
-                today_energy = 0.0
-                try:
-                    hoje = datetime.now(timezone("America/Sao_Paulo")).strftime("%Y-%m-%d")
-                    amanha = (datetime.now(timezone("America/Sao_Paulo")) + timedelta(days=1)).strftime("%Y-%m-%d")
-
-                    url_energy = self.base_url + "station/history"
-                    body_energy = {
-                        "stationId": usina.get("id"),
-                        "startAt": hoje,
-                        "endAt": amanha,
-                        "granularity": 2,
-                    }
-
-                    response_energy = self.session.post(url_energy, json=body_energy, headers=headers)
-                    if response_energy.status_code == 200:
-                        energy_data = response_energy.json()
-                        items = energy_data.get("stationDataItems", [])
-                        if items:
-                            today_energy = round(float(items[0].get("generationValue", 0.0)), 2)
-
-                except Exception as e:
-                    print(f"⚠️ Erro ao buscar today_energy para usina {usina.get('id')}: {e}")
+            for usina, today_energy in zip(estacoes, energias_hoje):
+                if today_energy is None:
+                    print(f"⚠️ Erro ao buscar today_energy para usina {usina.get('id')}")
+                    today_energy = 0.0
 
                 try:
                     curr_power = float(usina.get("generationPower", 0))
@@ -219,11 +256,78 @@ class ApiDeye:
 
         self.cached_data = dados_usinas
         self.last_cache_time = time.time()
+        with _usinas_lock:
+            _usinas_cache[self.integracao.id] = (self.last_cache_time, dados_usinas)
         return dados_usinas
 
     
     # OBTENDO PS_KEYS E SERIAL NUMBER E DEMAIS DADOS
 
+    def _serie_diaria(self, station_id, start_at: str, end_at: str, headers: dict) -> dict:
+        """
+        Série diária de geração (kWh) de uma estação via station/history.
+        Retorna {"YYYY-MM-DD": kWh}; se o item não trouxer a data, ela é
+        deduzida pela posição a partir de start_at.
+        """
+        body = {
+            "stationId": station_id,
+            "startAt": start_at,
+            "endAt": end_at,
+            "granularity": 2
+        }
+
+        res = self.session.post(self.base_url + "station/history", json=body, headers=headers)
+        if res.status_code != 200:
+            raise Exception(f"Erro HTTP {res.status_code} no station/history da usina {station_id}")
+
+        inicio = datetime.strptime(start_at, "%Y-%m-%d")
+        serie = {}
+        for i, item in enumerate(res.json().get("stationDataItems", [])):
+            if item.get("year") and item.get("month") and item.get("day"):
+                dia = f"{int(item['year']):04d}-{int(item['month']):02d}-{int(item['day']):02d}"
+            else:
+                dia = (inicio + timedelta(days=i)).strftime("%Y-%m-%d")
+            serie[dia] = float(item.get("generationValue") or 0.0)
+
+        return serie
+
+    def get_geracao_diaria(self, inicio, fim) -> dict:
+        """
+        Energia diária (kWh) de todas as estações entre as datas inicio e fim
+        (inclusive): {ps_id: {date: kWh}}. Estações sem dados vêm com {}; as
+        que falharam ficam de fora.
+        """
+        if not self.autenticar():
+            return {}
+
+        usinas = self.get_usinas()
+        if not usinas:
+            return {}
+
+        headers = {
+            'Content-Type': 'application/json',
+            'Authorization': f"Bearer {self.accesstoken}"
+        }
+
+        # endAt é exclusivo no station/history: pede até o dia seguinte a `fim`
+        fim_exclusivo = (fim + timedelta(days=1)).strftime("%Y-%m-%d")
+        estacoes = [usina.get("ps_id") for usina in usinas if usina.get("ps_id")]
+        series = executar_em_paralelo(
+            lambda ps_id: self._serie_diaria(ps_id, inicio.strftime("%Y-%m-%d"), fim_exclusivo, headers),
+            estacoes,
+            self.max_concorrencia,
+        )
+
+        por_usina = {}
+        for ps_id, serie in zip(estacoes, series):
+            if serie is None:
+                print(f"❌ Erro ao consultar usina {ps_id}")
+                continue
+            dias = {datetime.strptime(dia, "%Y-%m-%d").date(): valor for dia, valor in serie.items()}
+            por_usina[ps_id] = {dia: valor for dia, valor in dias.items() if inicio <= dia <= fim}
+
+        return por_usina
+
     def get_geracao(self):
         print("Chamando get_geracao() para Deye 🚀")
         brasil = timezone("America/Sao_Paulo")
@@ -249,75 +353,40 @@ class ApiDeye:
         }
 
         # Datas para os 3 períodos
-        hoje = agora.strftime("%Y-%m-%d")
         ontem = (agora - timedelta(days=1)).strftime("%Y-%m-%d")
         anteontem = (agora - timedelta(days=2)).strftime("%Y-%m-%d")
         sete_dias_atras = (agora - timedelta(days=8)).strftime("%Y-%m-%d")
         trinta_dias_atras = (agora - timedelta(days=31)).strftime("%Y-%m-%d")
 
+        # Uma única série diária de 31 dias por estação, buscadas em paralelo
+        estacoes = [usina.get("ps_id") for usina in usinas if usina.get("ps_id")]
+        series = executar_em_paralelo(
+            lambda ps_id: self._serie_diaria(ps_id, trinta_dias_atras, ontem, headers),
+            estacoes,
+            self.max_concorrencia,
+        )
+
         diario = []
         setedias = []
         mensal = []
 
-        for usina in usinas:
-            ps_id = usina.get("ps_id")
-            if not ps_id:
+        for ps_id, serie in zip(estacoes, series):
+            if serie is None:
+                print(f"❌ Erro ao consultar usina {ps_id}")
                 continue
 
-            url = self.base_url + "station/history"
-
-            body_diario = {
-                "stationId": ps_id,
-                "startAt": anteontem,
-                "endAt": ontem,
-                "granularity": 2
-            }
-
-            body_7dias = {
-                "stationId": ps_id,
-                "startAt": sete_dias_atras,
-                "endAt": ontem,
-                "granularity": 2
-            }
+            # Diária: mesmo dia que a consulta anteontem → ontem retornava
+            if anteontem in serie:
+                v = round(serie[anteontem], 2)
+                diario.append({"ps_id": ps_id, "data": ontem, "energia_gerada_kWh": v})
 
-            body_30dias = {
-                "stationId": ps_id,
-                "startAt": trinta_dias_atras,
-                "endAt": ontem,
-                "granularity": 2
-            }
+            # 7 dias
+            soma_7 = round(sum(v for dia, v in serie.items() if dia >= sete_dias_atras), 2)
+            setedias.append({"ps_id": ps_id, "periodo": f"{sete_dias_atras} a {ontem}", "energia_gerada_kWh": soma_7})
 
-            try:
-                # Diária
-                res_d = self.session.post(url, json=body_diario, headers=headers)
-                if res_d.status_code == 200:
-                    data = res_d.json()
-                    items = data.get("stationDataItems", [])
-                    if items:
-                        v = round(float(items[0].get("generationValue", 0.0)), 2)
-                        diario.append({"ps_id": ps_id, "data": ontem, "energia_gerada_kWh": v})
-
-                # 7 dias
-                res_7 = self.session.post(url, json=body_7dias, headers=headers)
-                if res_7.status_code == 200:
-                    data = res_7.json()
-                    items = data.get("stationDataItems", [])
-                    soma_7 = round(sum(float(p.get("generationValue", 0.0)) for p in items), 2)
-                    setedias.append({"ps_id": ps_id, "periodo": f"{sete_dias_atras} a {ontem}", "energia_gerada_kWh": soma_7})
-
-                # 30 dias
-                res_30 = self.session.post(url, json=body_30dias, headers=headers)
-                if res_30.status_code == 200:
-                    data = res_30.json()
-                    items = data.get("stationDataItems", [])
-                    soma_30 = round(sum(float(p.get("generationValue", 0.0)) for p in items), 2)
-                    mensal.append({"ps_id": ps_id, "periodo": f"{trinta_dias_atras} a {ontem}", "energia_gerada_kWh": soma_30})
-
-            except Exception as e:
-                import traceback
-                print(f"❌ Erro ao consultar usina {ps_id}: {e}")
-                traceback.print_exc()
-                continue
+            # 30 dias
+            soma_30 = round(sum(serie.values()), 2)
+            mensal.append({"ps_id": ps_id, "periodo": f"{trinta_dias_atras} a {ontem}", "energia_gerada_kWh": soma_30})
 
         total_30dias = sum(item["energia_gerada_kWh"] for item in mensal)
 
@@ -0,0 +1,62 @@
+import threading
+import time
+import os
+
+# Falhas consecutivas (já após as retentativas) que abrem o disjuntor de uma integração
+FALHAS_PARA_ABRIR = int(os.getenv("VENDOR_FALHAS_PARA_ABRIR", 5))
+# Tempo em que o disjuntor fica aberto antes de liberar uma chamada de teste
+TEMPO_ABERTO = float(os.getenv("VENDOR_DISJUNTOR_ABERTO_S", 60))
+
+
+class Disjuntor:
+    """
+    Circuit breaker de uma integração. Fechado: chamadas liberadas. Aberto:
+    chamadas recusadas até TEMPO_ABERTO passar. Depois disso uma única chamada
+    de teste é liberada; se ela falhar o disjuntor volta a abrir.
+    """
+
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.falhas = 0
+        self.aberto_ate = None
+        self.testando = False
+        self._lock = threading.Lock()
+
+    @property
+    def aberto(self) -> bool:
+        with self._lock:
+            return self.aberto_ate is not None and (time.monotonic() < self.aberto_ate or self.testando)
+
+    def permitir(self) -> bool:
+        with self._lock:
+            if self.aberto_ate is None:
+                return True
+            if time.monotonic() < self.aberto_ate or self.testando:
+                return False
+            self.testando = True
+            return True
+
+    def registrar_sucesso(self):
+        with self._lock:
+            if self.aberto_ate is not None:
+                print(f"✅ Disjuntor {self.nome} fechado novamente.")
+            self.falhas = 0
+            self.aberto_ate = None
+            self.testando = False
+
+    def registrar_falha(self):
+        with self._lock:
+            self.falhas += 1
+            if self.testando or self.falhas >= FALHAS_PARA_ABRIR:
+                self.aberto_ate = time.monotonic() + TEMPO_ABERTO
+                print(f"🔌 Disjuntor {self.nome} aberto por {TEMPO_ABERTO:.0f}s após {self.falhas} falha(s).")
+            self.testando = False
+
+
+_disjuntores = {}
+_lock = threading.Lock()
+
+
+def obter_disjuntor(nome: str) -> Disjuntor:
+    with _lock:
+        return _disjuntores.setdefault(nome, Disjuntor(nome))
@@ -0,0 +1,2 @@
+class FabricanteIndisponivel(Exception):
+    """Disjuntor da integração aberto: o fabricante não é chamado até o próximo teste."""
@@ -0,0 +1,48 @@
+from concurrent.futures import ThreadPoolExecutor
+import traceback
+import math
+
+
+def executar_em_paralelo(funcao, itens, max_concorrencia: int = 8) -> list:
+    """
+    Executa `funcao(item)` para cada item com no máximo `max_concorrencia`
+    chamadas simultâneas. Os resultados voltam na mesma ordem dos itens, para
+    que a agregação seja determinística; itens que falharem retornam None.
+    """
+    itens = list(itens)
+    if not itens:
+        return []
+
+    def executar(item):
+        try:
+            return funcao(item)
+        except Exception as e:
+            print(f"❌ Erro na execução paralela para {item}: {e}")
+            traceback.print_exc()
+            return None
+
+    if len(itens) == 1 or max_concorrencia <= 1:
+        return [executar(item) for item in itens]
+
+    with ThreadPoolExecutor(max_workers=min(max_concorrencia, len(itens))) as executor:
+        return list(executor.map(executar, itens))
+
+
+def paginar(buscar_pagina, tamanho_pagina: int, max_concorrencia: int = 8) -> list:
+    """
+    Listagem paginada completa. `buscar_pagina(n)` retorna (itens, total); a
+    primeira página informa o total e as demais são buscadas em paralelo.
+    Os itens voltam na ordem das páginas.
+    """
+    itens, total = buscar_pagina(1)
+    itens = list(itens or [])
+
+    paginas = math.ceil((total or 0) / tamanho_pagina)
+    if paginas <= 1:
+        return itens
+
+    restantes = executar_em_paralelo(lambda n: buscar_pagina(n)[0], range(2, paginas + 1), max_concorrencia)
+    for pagina in restantes:
+        itens.extend(pagina or [])
+
+    return itens
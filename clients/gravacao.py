@@ -0,0 +1,230 @@
+"""
+Gravação e reprodução das respostas dos fabricantes.
+
+Com VENDOR_MODO_GRAVACAO=gravar, toda resposta que passa pelas sessões de
+clients/sessao_http.py é salva (tokens e credenciais mascarados) em arquivos
+gzip por host em VENDOR_GRAVACOES_DIR, junto com a latência observada. Com
+VENDOR_MODO_GRAVACAO=reproduzir, nenhuma chamada sai da máquina: as respostas
+gravadas são devolvidas na mesma ordem, após esperar a latência original
+(multiplicada por VENDOR_REPRODUCAO_FATOR_LATENCIA).
+
+Datas de dia inteiro nos pedidos entram na chave relativas ao dia da
+gravação, guardado em cada registro: "ontem" pedido hoje encontra o "ontem"
+gravado dias atrás, e as datas da resposta são deslocadas na mesma medida.
+"""
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from urllib.parse import urlsplit, parse_qsl, urlencode
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+from pytz import timezone
+import threading
+import hashlib
+import json
+import gzip
+import time
+import os
+
+MODO = os.getenv("VENDOR_MODO_GRAVACAO", "").lower()  # "", "gravar" ou "reproduzir"
+DIRETORIO = os.getenv("VENDOR_GRAVACOES_DIR", "gravacoes")
+FATOR_LATENCIA = float(os.getenv("VENDOR_REPRODUCAO_FATOR_LATENCIA", 1.0))
+
+# Campos de corpo/resposta/query que nunca são gravados em claro
+CAMPOS_SENSIVEIS = {
+    "token", "accesstoken", "access_token", "refreshtoken", "appkey", "appid", "appsecret",
+    "user_password", "password", "systemcode", "user_account", "username", "email",
+}
+CABECALHOS_SENSIVEIS = {"authorization", "xsrf-token", "x-access-key", "set-cookie", "cookie"}
+MASCARA = "***"
+
+# Datas reconhecidas (string inteira) em query, corpo e resposta, com o tamanho de cada formato
+FORMATOS_DATA = [("%Y-%m-%d %H:%M:%S", 19), ("%Y%m%d%H%M%S", 14), ("%Y-%m-%d", 10), ("%Y%m%d", 8)]
+
+
+def _hoje() -> date:
+    return datetime.now(timezone("America/Sao_Paulo")).date()
+
+
+def _mascarar(valor):
+    if isinstance(valor, dict):
+        return {k: MASCARA if k.lower() in CAMPOS_SENSIVEIS else _mascarar(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_mascarar(v) for v in valor]
+    return valor
+
+
+def _url_mascarada(url: str) -> str:
+    partes = urlsplit(url)
+    query = [(k, MASCARA if k.lower() in CAMPOS_SENSIVEIS else v) for k, v in parse_qsl(partes.query)]
+    return partes._replace(query=urlencode(query)).geturl()
+
+
+def _corpo(conteudo):
+    """Corpo JSON mascarado; corpos que não são JSON viram texto."""
+    if not conteudo:
+        return None
+    if isinstance(conteudo, bytes):
+        conteudo = conteudo.decode("utf-8", errors="replace")
+    try:
+        return _mascarar(json.loads(conteudo))
+    except ValueError:
+        return conteudo
+
+
+def _como_data(valor):
+    """(datetime, formato) se `valor` for uma string que é inteira uma data reconhecida; senão None."""
+    if not isinstance(valor, str):
+        return None
+    for formato, tamanho in FORMATOS_DATA:
+        if len(valor) != tamanho:
+            continue
+        try:
+            momento = datetime.strptime(valor, formato)
+        except ValueError:
+            continue
+        if 2000 <= momento.year <= 2100:
+            return momento, formato
+    return None
+
+
+def _trocar_datas(valor, trocar):
+    """Aplica `trocar(momento, formato)` a toda data em `valor` (chaves e valores de dicts, listas)."""
+    if isinstance(valor, dict):
+        return {_trocar_datas(k, trocar): _trocar_datas(v, trocar) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [_trocar_datas(v, trocar) for v in valor]
+    data = _como_data(valor)
+    return trocar(*data) if data else valor
+
+
+def _relativo(valor, referencia: date):
+    """Datas como distância em dias até `referencia`, mantendo formato e horário."""
+    return _trocar_datas(
+        valor, lambda momento, formato: f"<dia{(momento.date() - referencia).days:+d}|{formato}|{momento:%H:%M:%S}>"
+    )
+
+
+def _deslocar(valor, dias: int):
+    return _trocar_datas(valor, lambda momento, formato: (momento + timedelta(days=dias)).strftime(formato))
+
+
+def _chave(metodo: str, url: str, corpo, referencia: date) -> str:
+    """Método, URL e corpo já mascarados, com as datas relativas ao dia `referencia`."""
+    partes = urlsplit(url)
+    query = [(k, _relativo(v, referencia)) for k, v in parse_qsl(partes.query)]
+    url = partes._replace(query=urlencode(query)).geturl()
+    texto = json.dumps([metodo.upper(), url, _relativo(corpo, referencia)], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(texto.encode()).hexdigest()
+
+
+def _arquivo(url: str) -> str:
+    return os.path.join(DIRETORIO, urlsplit(url).netloc.replace(":", "_") + ".jsonl.gz")
+
+
+class AdaptadorGravacao(HTTPAdapter):
+    """
+    Adaptador HTTP que grava (repassando ao adaptador real) ou reproduz as
+    respostas de um host. A correspondência é por método, URL e corpo já
+    mascarados e com as datas relativas ao dia, então tokens diferentes e
+    dias diferentes entre gravação e reprodução não atrapalham.
+    """
+
+    def __init__(self, interno: HTTPAdapter, modo: str):
+        super().__init__()
+        self.interno = interno
+        self.modo = modo
+        self._lock = threading.Lock()
+        self._gravacoes = None  # chave -> [registros], carregado na primeira reprodução
+        self._proxima = defaultdict(int)
+
+    def send(self, request, **kwargs):
+        url = _url_mascarada(request.url)
+        corpo = _corpo(request.body)
+        hoje = _hoje()
+        chave = _chave(request.method, url, corpo, hoje)
+
+        if self.modo == "reproduzir":
+            return self._reproduzir(request, chave)
+
+        inicio = time.monotonic()
+        response = self.interno.send(request, **kwargs)
+        latencia = time.monotonic() - inicio
+        self._gravar(request.url, {
+            "chave": chave,
+            "metodo": request.method,
+            "url": url,
+            "corpo": corpo,
+            "status": response.status_code,
+            "cabecalhos": {
+                k: (MASCARA if k.lower() in CABECALHOS_SENSIVEIS else v)
+                for k, v in response.headers.items()
+                if k.lower() in CABECALHOS_SENSIVEIS or k.lower() == "content-type"
+            },
+            "resposta": _corpo(response.content),
+            "latencia": round(latencia, 4),
+            "gravado_em": hoje.isoformat(),
+        })
+        return response
+
+    def _gravar(self, url: str, registro: dict):
+        os.makedirs(DIRETORIO, exist_ok=True)
+        linha = json.dumps(registro, ensure_ascii=False) + "\n"
+        with self._lock:
+            # Cada append vira um membro gzip novo; gzip.open lê todos em sequência
+            with gzip.open(_arquivo(url), "at", encoding="utf-8") as arquivo:
+                arquivo.write(linha)
+
+    def _carregar(self, url: str) -> dict:
+        gravacoes = defaultdict(list)
+        caminho = _arquivo(url)
+        if os.path.exists(caminho):
+            with gzip.open(caminho, "rt", encoding="utf-8") as arquivo:
+                for linha in arquivo:
+                    if linha.strip():
+                        registro = json.loads(linha)
+                        gravacoes[registro["chave"]].append(registro)
+        print(f"📼 {sum(len(v) for v in gravacoes.values())} respostas gravadas carregadas de {caminho}")
+        return gravacoes
+
+    def _reproduzir(self, request, chave: str) -> Response:
+        with self._lock:
+            if self._gravacoes is None:
+                self._gravacoes = self._carregar(request.url)
+            registros = self._gravacoes.get(chave)
+            registro = None
+            if registros:
+                # Chamadas repetidas recebem as respostas na ordem em que foram gravadas
+                registro = registros[self._proxima[chave] % len(registros)]
+                self._proxima[chave] += 1
+
+        if registro is None:
+            print(f"📼 Sem gravação para {request.method} {_url_mascarada(request.url)}")
+            return self._resposta(request, 404, {"Content-Type": "application/json"}, {"erro": "sem gravação"}, 0.0)
+
+        resposta = registro["resposta"]
+        if registro.get("gravado_em"):
+            dias = (_hoje() - date.fromisoformat(registro["gravado_em"])).days
+            if dias:
+                resposta = _deslocar(resposta, dias)
+
+        time.sleep(registro["latencia"] * FATOR_LATENCIA)
+        return self._resposta(request, registro["status"], registro["cabecalhos"], resposta, registro["latencia"])
+
+    @staticmethod
+    def _resposta(request, status: int, cabecalhos: dict, corpo, latencia: float) -> Response:
+        response = Response()
+        response.status_code = status
+        response.headers = CaseInsensitiveDict(cabecalhos)
+        if corpo is None:
+            response._content = b""
+        else:
+            response._content = (corpo if isinstance(corpo, str) else json.dumps(corpo)).encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=latencia)
+        return response
+
+    def close(self):
+        self.interno.close()
@@ -0,0 +1,109 @@
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import deque
+from urllib.parse import urlsplit
+import threading
+import time
+import os
+
+# Hedging é opcional: só atua com VENDOR_HEDGE_ATIVO=1 e apenas nas leituras que o usam
+HEDGE_ATIVO = os.getenv("VENDOR_HEDGE_ATIVO", "0").lower() in ("1", "true", "sim")
+# Percentil da latência do endpoint a partir do qual a cópia é disparada
+PERCENTIL = float(os.getenv("VENDOR_HEDGE_PERCENTIL", 95))
+# Fração máxima das chamadas elegíveis que pode gerar cópia
+ORCAMENTO = float(os.getenv("VENDOR_HEDGE_ORCAMENTO", 0.03))
+# Amostras mínimas de um endpoint antes de confiar no percentil
+AMOSTRAS_MINIMAS = int(os.getenv("VENDOR_HEDGE_AMOSTRAS_MIN", 50))
+JANELA = 500
+
+# Só as cópias passam por este pool; a chamada principal nunca espera na fila dele
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("VENDOR_HEDGE_THREADS", 16)), thread_name_prefix="hedge")
+
+
+class _Estatisticas:
+    def __init__(self):
+        self.latencias = {}  # endpoint -> deque de segundos
+        self.chamadas = deque(maxlen=JANELA * 4)  # True para as que geraram cópia
+        self._lock = threading.Lock()
+
+    def registrar_latencia(self, endpoint: str, segundos: float):
+        with self._lock:
+            self.latencias.setdefault(endpoint, deque(maxlen=JANELA)).append(segundos)
+
+    def limiar(self, endpoint: str):
+        """Percentil PERCENTIL das latências recentes do endpoint, ou None com poucas amostras."""
+        with self._lock:
+            amostras = sorted(self.latencias.get(endpoint, ()))
+        if len(amostras) < AMOSTRAS_MINIMAS:
+            return None
+        return amostras[min(len(amostras) - 1, int(len(amostras) * PERCENTIL / 100))]
+
+    def decidir_copia(self, permitir: bool = True) -> bool:
+        """Registra a chamada e diz se ela pode ser copiada sem estourar o orçamento global."""
+        with self._lock:
+            copiar = permitir and (sum(self.chamadas) + 1) / (len(self.chamadas) + 1) <= ORCAMENTO
+            self.chamadas.append(copiar)
+            return copiar
+
+
+estatisticas = _Estatisticas()
+
+
+def _endpoint(url: str) -> str:
+    partes = urlsplit(url)
+    return partes.netloc + partes.path
+
+
+def _iniciar(chamar) -> Future:
+    """Executa `chamar` numa thread própria, iniciada na hora, para que o limiar conte só a latência do fabricante."""
+    futuro = Future()
+
+    def executar():
+        if not futuro.set_running_or_notify_cancel():
+            return
+        try:
+            futuro.set_result(chamar())
+        except BaseException as e:
+            futuro.set_exception(e)
+
+    threading.Thread(target=executar, name="hedge-principal", daemon=True).start()
+    return futuro
+
+
+def post_com_hedge(sessao, url: str, **kwargs):
+    """
+    POST para leituras idempotentes. Se a resposta não chegar dentro do
+    percentil de latência aprendido para o endpoint, dispara uma cópia e usa a
+    que responder primeiro. Sem hedging ativo equivale a `sessao.post`.
+    """
+    endpoint = _endpoint(url)
+
+    def chamar():
+        inicio = time.monotonic()
+        response = sessao.post(url, **kwargs)
+        estatisticas.registrar_latencia(endpoint, time.monotonic() - inicio)
+        return response
+
+    if not HEDGE_ATIVO:
+        return chamar()
+
+    limiar = estatisticas.limiar(endpoint)
+    if limiar is None:
+        estatisticas.decidir_copia(permitir=False)
+        return chamar()
+
+    principal = _iniciar(chamar)
+    prontas, _ = wait([principal], timeout=limiar)
+    if not estatisticas.decidir_copia(permitir=not prontas):
+        return principal.result()
+
+    print(f"🪞 {endpoint} sem resposta em {limiar:.2f}s, disparando cópia")
+    pendentes = {principal, _executor.submit(chamar)}
+    erro = None
+    while pendentes:
+        prontas, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+        for futuro in prontas:
+            try:
+                return futuro.result()
+            except Exception as e:
+                erro = e
+    raise erro
@@ -1,25 +1,48 @@
 import requests
+import time
+import os
+import threading
 from datetime import datetime, timedelta
 from pytz import timezone
 from sqlalchemy.orm import Session
 from modelos import Integracao
-from utils import get_horario_brasilia
+from clients.token_broker import token_broker
+from clients.sessao_http import criar_sessao, codigos_de_erro
+from clients.fanout import paginar
+from clients.limitador_fusionsolar import limitador_fusionsolar
+
+
+# Lista de usinas por integração, compartilhada entre instâncias:
+# integracao_id -> (timestamp, usinas, {stationCode: [devIds dos inversores]})
+_usinas_cache = {}
+_usinas_lock = threading.Lock()
+
+# failCodes tratados como falha transitória (retentativa e disjuntor); 407 fica com o limitador
+CODIGOS_TRANSITORIOS = os.getenv("HUAWEI_CODIGOS_TRANSITORIOS", "").split(",")
 
 class ApiHuawei:
-    base_url = "https://la5.fusionsolar.huawei.com/thirdData/"
+    base_url = os.getenv("HUAWEI_BASE_URL", "https://la5.fusionsolar.huawei.com/thirdData/")
+    validade_token = timedelta(minutes=30)
+    cache_expiry = 600  # 10 minutos
+    itens_por_lote = 100  # máximo de stationCodes/devIds por chamada no FusionSolar
 
     def __init__(self, integracao: Integracao, db: Session):
         self.username = integracao.username
         self.password = integracao.senha
         self.integracao = integracao
         self.db = db
-        self.session = requests.Session()
+        self.session = criar_sessao(self.base_url, integracao.id, codigos_de_erro("failCode", CODIGOS_TRANSITORIOS))
         self.xsrf = integracao.token_acesso
         self.token_updated_at = integracao.token_updated_at
+        self.cached_data = None
+        self.last_cache_time = 0
+        self._inversores_por_usina = {}
+        self._geracao_cache = None
+        self._geracao_cache_timestamp = None
 
 # ----------------------LOGIN------------------------#
 
-    def login_huawei(self):
+    def _login(self, db: Session, integracao: Integracao):
         url = self.base_url + "login"
         payload = {
             "userName": self.username,
@@ -30,106 +53,161 @@ class ApiHuawei:
 
         if response.status_code != 200:
             print(f"Erro ao fazer login Huawei: {response.status_code} - {response.text}")
-            return False
+            return None
 
         token = response.headers.get("xsrf-token")
         if not token:
             print("Token não encontrado no header da resposta.")
-            return False
+            return None
 
-        # Atualiza o token no banco
-        horario = get_horario_brasilia()
-        self.integracao.token_acesso = token
-        self.integracao.token_updated_at = horario
-        self.db.commit()
-        self.db.refresh(self.integracao)
+        return token
 
-        # Salva na instância
-        self.xsrf = token
-        self.token_updated_at = horario
+    def login_huawei(self):
+        try:
+            self.get_token_valido()
+        except Exception as e:
+            print(e)
+            return False
         return True
 
-    def token_expirado(self):
-        if not self.token_updated_at or not self.xsrf:
-            return True
-        return get_horario_brasilia() > self.token_updated_at + timedelta(minutes=30)
-
     def get_token_valido(self):
-        if self.token_expirado():
-            print("🔁 Token expirado ou inexistente. Fazendo login Huawei...")
-            if not self.login_huawei():
-                raise Exception("❌ Falha ao renovar token Huawei.")
+        """Token XSRF vindo do broker compartilhado; login só quando nenhum worker tem um válido."""
+        try:
+            self.xsrf = token_broker.obter_token(self.integracao.id, self.validade_token, self._login)
+        except Exception as e:
+            raise Exception("❌ Falha ao renovar token Huawei.") from e
         return self.xsrf
 
-# ----------------------GET USINAS------------------------#
-
-    # def get_usinas(self):
-        if self.cached_data and (time.time() - self.last_cache_time < self.cache_expiry):
-            return self.cached_data  # Reutiliza dados se ainda não expiraram
+    def _post(self, url, body, headers):
+        """POST passando pela fila da interface no limitador da conta."""
+        interface = url.rsplit("/", 1)[-1]
+        return limitador_fusionsolar.executar(
+            self.integracao.id, interface, lambda: self.session.post(url, json=body, headers=headers)
+        )
+
+    def _post_with_auth(self, url, body):
+        token = self.get_token_valido()
+        headers = {"Content-Type": "application/json", "XSRF-TOKEN": token}
+        response = self._post(url, body, headers)
+
+        # failCode 305: sessão expirada no FusionSolar, refaz login uma vez
+        if response.status_code == 200 and response.json().get("failCode") == 305:
+            print("⚠️ Token Huawei expirado. Renovando...")
+            self.xsrf = token_broker.renovar(
+                self.integracao.id, self.validade_token, self._login, token_invalido=token
+            )
+            headers["XSRF-TOKEN"] = self.xsrf
+            response = self._post(url, body, headers)
+
+        return response
+
+    def _post_em_lotes(self, interface: str, campo: str, codigos: list, extra: dict = None, falhas: set = None) -> list:
+        """
+        Chama `interface` com os códigos (stationCodes/devIds) agrupados por
+        vírgula em lotes de `itens_por_lote` e junta as listas "data" das respostas.
+        Se `falhas` for informado, recebe os códigos dos lotes que falharam.
+        Limite de frequência persistente sobe como FabricanteIndisponivel.
+        """
+        codigos = [str(c) for c in codigos if c]
+        lotes = [codigos[i:i + self.itens_por_lote] for i in range(0, len(codigos), self.itens_por_lote)]
+
+        dados = []
+        for lote in lotes:
+            body = {campo: ",".join(lote)}
+            body.update(extra or {})
+            response = self._post_with_auth(self.base_url + interface, body)
+            if response.status_code != 200:
+                print(f"[Huawei] Erro HTTP {response.status_code} em {interface}")
+                if falhas is not None:
+                    falhas.update(lote)
+                continue
+            resposta = response.json()
+            if not resposta.get("success", True):
+                print(f"[Huawei] Falha em {interface}: failCode={resposta.get('failCode')}")
+                if falhas is not None:
+                    falhas.update(lote)
+                continue
+            dados += resposta.get("data") or []
+        return dados
 
-        url_stations = self.base_url + "stations"
-        url_kpi = self.base_url + "getStationRealKpi"
-        url_dev = self.base_url + "getDevList"
-        url_real = self.base_url + "getDevRealKpi"
+# ----------------------GET USINAS------------------------#
 
-        response = self._post_with_auth(url_stations, {"pageNo": 1})
+    def _buscar_pagina_usinas(self, pagina: int):
+        """Uma página de stations. Retorna (usinas, total de registros)."""
+        response = self._post_with_auth(self.base_url + "stations", {"pageNo": pagina, "pageSize": self.itens_por_lote})
         if response.status_code != 200:
             print("Erro ao buscar usinas Huawei:", response.status_code)
+            return [], 0
+
+        dados = response.json().get("data") or {}
+        usinas = dados.get("list", [])
+        return usinas, int(dados.get("total") or len(usinas))
+
+    def get_usinas(self):
+        with _usinas_lock:
+            cache = _usinas_cache.get(self.integracao.id)
+        if cache and (time.time() - cache[0] < self.cache_expiry or self.session.indisponivel):
+            # Com o disjuntor aberto a última lista é servida mesmo vencida
+            self.last_cache_time, self.cached_data, self._inversores_por_usina = cache
+            return self.cached_data  # Reutiliza dados se ainda não expiraram
+
+        estacoes = paginar(self._buscar_pagina_usinas, self.itens_por_lote, max_concorrencia=1)
+        codigos = [u.get("plantCode") for u in estacoes if u.get("plantCode")]
+        if not codigos:
             return []
 
-        dados = response.json()
+        # KPIs e inversores de todas as usinas em lotes de stationCodes
+        kpis = {
+            item.get("stationCode"): item.get("dataItemMap") or {}
+            for item in self._post_em_lotes("getStationRealKpi", "stationCodes", codigos)
+        }
+        dispositivos = self._post_em_lotes("getDevList", "stationCodes", codigos)
+        inversores = [d for d in dispositivos if str(d.get("devTypeId")) == "1" and d.get("id")]
+        self._inversores_por_usina = {}
+        for d in inversores:
+            self._inversores_por_usina.setdefault(d.get("stationCode"), []).append(d.get("id"))
+
+        # Potência atual de todos os inversores em lotes de devIds
+        potencia_por_inversor = {
+            str(item.get("devId")): float((item.get("dataItemMap") or {}).get("active_power") or 0)
+            for item in self._post_em_lotes(
+                "getDevRealKpi", "devIds", [d.get("id") for d in inversores], {"devTypeId": "1"}
+            )
+        }
+
         dados_usinas = []
 
-        for usina in dados.get("data", {}).get("list", []):
+        for usina in estacoes:
             station_code = usina.get("plantCode")
             if not station_code:
                 continue
 
-            resp_kpi = self._post_with_auth(url_kpi, {"stationCodes": station_code})
-
-            resp_dev = self._post_with_auth(url_dev, {"stationCodes": station_code})
-
-
             # Valores padrão
-            id_usina = "--"
             total_energy = today_energy = co2_total = income_total = curr_power = 0.0
             ps_fault_status = 0
 
             try:
-                kpi_data = resp_kpi.json().get("data", [])
-                if kpi_data:
-                    dados_kpi = kpi_data[0].get("dataItemMap", {})
-                    total_energy = float(dados_kpi.get("total_power", 0))
-                    today_energy = float(dados_kpi.get("day_power", 0))
-                    co2_total = float(dados_kpi.get("co2_reduction", 0))
-                    income_total = float(dados_kpi.get("total_income", 0))
-                    ps_fault_status = int(dados_kpi.get("real_health_state", 0))
-
-                dev_data = resp_dev.json().get("data", [])
-                if dev_data:
-                    id_usina = dev_data[0].get("id", "--")
-
-                if id_usina and id_usina != "--":
-                    resp_real = self._post_with_auth(url_real, {
-                        "devIds": id_usina,
-                        "devTypeId": "1"
-                    })
-
-                    real_data = resp_real.json().get("data", [])
-                    if real_data:
-                        dados_real = real_data[0].get("dataItemMap", {})
-                        curr_power = float(dados_real.get("active_power", 0))
+                dados_kpi = kpis.get(station_code, {})
+                total_energy = float(dados_kpi.get("total_power") or 0)
+                today_energy = float(dados_kpi.get("day_power") or 0)
+                co2_total = float(dados_kpi.get("co2_reduction") or 0)
+                income_total = float(dados_kpi.get("total_income") or 0)
+                ps_fault_status = int(dados_kpi.get("real_health_state") or 0)
+
+                curr_power = sum(
+                    potencia_por_inversor.get(str(dev_id), 0.0)
+                    for dev_id in self._inversores_por_usina.get(station_code, [])
+                )
 
             except Exception as e:
                 print(f"[Huawei] Erro ao processar usina {station_code}: {e}")
 
             dados_usinas.append({
                 "ps_id": station_code,
-                "id_usina": id_usina,
                 "curr_power": curr_power/1000,
                 "ps_name": usina.get("plantName", "sem nome"),
-                "location": usina.get("address", "--"),
-                "capacidade": float(usina.get("capacity", 0)),
+                "location": usina.get("plantAddress") or usina.get("address", "--"),
+                "capacidade": float(usina.get("capacity") or 0),
                 "total_energy": total_energy,
                 "today_energy": today_energy,
                 "co2_total": co2_total,
@@ -139,6 +217,8 @@ class ApiHuawei:
 
         self.cached_data = dados_usinas
         self.last_cache_time = time.time()
+        with _usinas_lock:
+            _usinas_cache[self.integracao.id] = (self.last_cache_time, dados_usinas, self._inversores_por_usina)
         if  dados_usinas:
             print("Dados das usinas obtidos com sucesso!")
 
@@ -146,107 +226,130 @@ class ApiHuawei:
     
     # OBTENDO GERAÇÃO
 
+    def _energia_diaria_inversores(self, dev_ids: list, dias: list, falhas: set = None) -> dict:
+        """
+        Energia diária (kWh) dos inversores via getDevKpiDay, que devolve o mês
+        inteiro de `collectTime`: uma chamada por mês coberto e por lote de devIds.
+        Retorna {devId: {"YYYYMMDD": kWh}}; `falhas` recebe os devIds de lotes que falharam.
+        """
+        brasil = timezone("America/Sao_Paulo")
+        meses = sorted({(d.year, d.month) for d in dias})
+
+        por_dispositivo = {}
+        for ano, mes in meses:
+            collect_time = int(brasil.localize(datetime(ano, mes, 1)).timestamp() * 1000)
+            itens = self._post_em_lotes(
+                "getDevKpiDay", "devIds", dev_ids, {"devTypeId": 1, "collectTime": collect_time}, falhas
+            )
+            for item in itens:
+                try:
+                    dia = datetime.fromtimestamp(int(item["collectTime"]) / 1000, brasil).strftime("%Y%m%d")
+                    valor = float((item.get("dataItemMap") or {}).get("product_power") or 0)
+                except (KeyError, TypeError, ValueError):
+                    continue
+                por_dispositivo.setdefault(str(item.get("devId")), {})[dia] = valor
+
+        return por_dispositivo
+
+    def get_geracao_diaria(self, inicio, fim) -> dict:
+        """
+        Energia diária (kWh) de todas as usinas entre as datas inicio e fim
+        (inclusive): {ps_id: {date: kWh}}. Usinas consultadas sem nenhum dado
+        vêm com {}; as que tiveram algum inversor em lote com falha ficam de fora.
+        """
+        usinas = self.get_usinas()
+        if not usinas:
+            return {}
+
+        dias = [inicio + timedelta(days=n) for n in range((fim - inicio).days + 1)]
+        dev_ids = [dev_id for ids in self._inversores_por_usina.values() for dev_id in ids]
+        falhas = set()
+        energia = self._energia_diaria_inversores(dev_ids, dias, falhas)
+
+        inicio_str, fim_str = inicio.strftime("%Y%m%d"), fim.strftime("%Y%m%d")
+        por_usina = {}
+        for usina in usinas:
+            ps_id = usina.get("ps_id")
+            inversores = self._inversores_por_usina.get(ps_id, [])
+            if any(str(dev_id) in falhas for dev_id in inversores):
+                continue
+            serie = {}
+            for dev_id in inversores:
+                for dia, valor in energia.get(str(dev_id), {}).items():
+                    if inicio_str <= dia <= fim_str:
+                        data = datetime.strptime(dia, "%Y%m%d").date()
+                        serie[data] = serie.get(data, 0.0) + valor
+            por_usina[ps_id] = serie
+
+        return por_usina
+
     def get_geracao(self):
-        print("Chamando get_geracao() no Railway 🚀")
+        print("Chamando get_geracao() para Huawei 🚀")
         brasil = timezone("America/Sao_Paulo")
         agora = datetime.now(brasil)
 
-        if self.cached_data and (time.time() - self.last_cache_time < self.cache_expiry):
-            return self.cached_data  # Reutiliza dados se ainda não expiraram
-
-        if not hasattr(self, "xsrf") or not self.xsrf:
-            self.login_huawei()
+        # 🔁 Cache local (10 minutos)
+        if self._geracao_cache and self._geracao_cache_timestamp:
+            if (agora - self._geracao_cache_timestamp) < timedelta(minutes=10):
+                print("🔁 Retornando geração do cache local")
+                return self._geracao_cache
 
-        if not hasattr(self, "cached_data") or not self.cached_data:
-            self.get_usinas()
+        usinas = self.get_usinas()
+        if not usinas:
+            return []
 
-        # Calcula ontem em milissegundos
-        ontem = agora - timedelta(days=1)
-        inicio = datetime(ontem.year, ontem.month, ontem.day, 0, 0, 0, tzinfo=brasil)
-        fim = inicio + timedelta(days=1)
+        ontem = (agora - timedelta(days=1)).strftime("%Y%m%d")
+        sete_dias_atras = (agora - timedelta(days=8)).strftime("%Y%m%d")
+        mes_atras = (agora - timedelta(days=31)).strftime("%Y%m%d")
+        dias = [agora - timedelta(days=n) for n in range(1, 32)]
 
-        start_ms = int(inicio.timestamp() * 1000)
-        end_ms = int(fim.timestamp() * 1000)
+        # Todos os inversores de todas as usinas, em lotes de devIds
+        dev_ids = [dev_id for ids in self._inversores_por_usina.values() for dev_id in ids]
+        energia = self._energia_diaria_inversores(dev_ids, dias)
 
-        energia_por_usina = {}
+        diario = []
+        setedias = []
+        mensal = []
 
-        for usina in self.cached_data:
+        for usina in usinas:
             ps_id = usina.get("ps_id")
-            if not ps_id:
-                continue
+            serie = {}
+            for dev_id in self._inversores_por_usina.get(ps_id, []):
+                for dia, valor in energia.get(str(dev_id), {}).items():
+                    serie[dia] = serie.get(dia, 0.0) + valor
 
-            url_device_list = self.base_url + "getDevList"
-            body_device = {"stationCodes": ps_id}
-
-            response = self._post_with_auth(url_device_list, body_device)
-            print(f"🔁 Consultando inversores da usina {ps_id}")
-            if response.status_code != 200:
-                print(f"Erro ao buscar inversores da usina {ps_id}")
+            if not serie:
                 continue
 
-            try:
-                data = response.json()
-                device_list = data["data"]
-
-                for device in device_list:
-                    ps_key = device.get("id")
-                    if not ps_key:
-                        continue
-
-                    url_energy = self.base_url + "getDevHistoryKpi"
-                    body_energy = {
-                        "devIds": ps_key,
-                        "devTypeId": 1,
-                        "startTime": start_ms,
-                        "endTime": end_ms
-                    }
-
-                    print(f"🔁 Consultando geração para ps_key {ps_key}")
-                    r = self._post_with_auth(url_energy, body_energy)
-                    if r.status_code != 200:
-                        print(f"Erro ao buscar energia para ps_key {ps_key}")
-                        continue
-
-                    try:
-                        energia_data = r.json()
-                        dados = energia_data.get("result_data", {})
-                        if not dados:
-                            continue
-
-                        chave = next(iter(dados))
-                        lista_p1 = dados[chave].get("p1", [])
-                        if not lista_p1:
-                            continue
-
-                        ultimo_ponto = lista_p1[-1]
-                        valor_str = ultimo_ponto.get("day_cap", "0") or ultimo_ponto.get("2", "0")
-                        energia_total = float(valor_str)
-
-                        if ps_id not in energia_por_usina:
-                            energia_por_usina[ps_id] = 0.0
-                        energia_por_usina[ps_id] += energia_total
-
-                    except Exception as e:
-                        import traceback
-                        print(f"❌ Erro ao extrair energia para ps_key {ps_key}: {e}")
-                        traceback.print_exc()
-                        continue
+            diario.append({
+                "ps_id": ps_id,
+                "data": ontem,
+                "energia_gerada_kWh": round(serie.get(ontem, 0.0), 2)
+            })
+            setedias.append({
+                "ps_id": ps_id,
+                "periodo": f"{sete_dias_atras} a {ontem}",
+                "energia_gerada_kWh": round(sum(v for d, v in serie.items() if sete_dias_atras <= d <= ontem), 2)
+            })
+            mensal.append({
+                "ps_id": ps_id,
+                "periodo": f"{mes_atras} a {ontem}",
+                "energia_gerada_kWh": round(sum(v for d, v in serie.items() if mes_atras <= d <= ontem), 2)
+            })
 
-            except Exception as e:
-                print(f"Erro ao processar ps_id {ps_id}: {e}")
-                continue
+        total_30dias = sum(item["energia_gerada_kWh"] for item in mensal)
 
-        ps_daily_energy = [
-            {
-                "ps_id": ps_id,
-                "data": inicio.strftime("%Y%m%d"),
-                "energia_gerada_kWh": round(energia_total / 1000, 2)
+        resultado = {
+            "diario": diario,
+            "7dias": setedias,
+            "30dias": {
+                "total": round(total_30dias, 2),
+                "por_usina": mensal
             }
-            for ps_id, energia_total in energia_por_usina.items()
-        ]
+        }
 
-        self._geracao_cache = ps_daily_energy
+        self._geracao_cache = resultado
         self._geracao_cache_timestamp = agora
-        print("✅ Geração salva em cache")
-        print(f"✅ Total de registros obtidos: {len(ps_daily_energy)}")
-        return ps_daily_energy
\ No newline at end of file
+
+        print("✅ Geração Huawei salva em cache")
+        return resultado
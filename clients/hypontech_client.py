@@ -1,32 +1,74 @@
-import requests
+from datetime import datetime, timedelta
+from pytz import timezone
+from sqlalchemy.orm import Session
+from modelos import Integracao
+from helpers import parse_float
+from clients.sessao_http import criar_sessao, codigos_de_erro
+from clients.token_broker import token_broker
+from clients.fanout import paginar, executar_em_paralelo
+from clients.excessions import FabricanteIndisponivel
+import threading
 import time
+import os
+
+
+# Credenciais da aplicação Hypon Cloud, usadas quando a integração não traz as suas
+HYPON_APPKEY = os.getenv("HYPON_APPKEY")
+HYPON_ACCESS_KEY = os.getenv("HYPON_ACCESS_KEY")
+
+# result_code do gateway tratados como falha transitória (retentativa e disjuntor)
+CODIGOS_TRANSITORIOS = os.getenv("HYPON_CODIGOS_TRANSITORIOS", "E900").split(",")
+
+# Lista de usinas por integração, compartilhada entre instâncias: integracao_id -> (timestamp, usinas)
+_usinas_cache = {}
+_usinas_lock = threading.Lock()
+
 
 class ApiHyponCloud:
-    base_url = "https://api.hypon.cloud/v2/"
-    appkey = "03A0E186C87230B4DE9E028F90491A58"
-    headers = {
-        "Content-Type": "application/json",
-        "x-access-key": "4ey7zficrz2np518aqku2a8997ha1ebz",
-        "sys_code": "901"
-    }
-
-    def __init__(self, username, password):
-        self.username = username
-        self.password = password
+    """
+    Hypontech (Hypon Cloud). Login (appkey/x-access-key, sys_code 901) e
+    envelope result_code/result_data como no contrato original do cliente;
+    usinas em plant/list e energia diária em plant/energy/day, sempre pelo
+    broker de tokens e pela sessão HTTP compartilhada.
+    """
+
+    base_url = os.getenv("HYPON_BASE_URL", "https://api.hypon.cloud/v2/")
+    validade_token = timedelta(minutes=10)
+    cache_expiry = 600  # 10 minutos
+    usinas_por_pagina = 100
+    max_concorrencia = int(os.getenv("HYPON_MAX_CONCORRENCIA", 8))  # requisições simultâneas por conta
+
+    def __init__(self, db: Session, integracao: Integracao):
+        self.db = db
+        self.integracao = integracao
+        self.username = integracao.username
+        self.password = integracao.senha
+        self.appkey = integracao.appkey or HYPON_APPKEY
+        x_access_key = integracao.x_access_key or HYPON_ACCESS_KEY
+        if not self.appkey or not x_access_key:
+            raise ValueError(
+                f"Integração Hypontech {integracao.id} sem appkey/x-access-key: "
+                "cadastre-as na integração ou defina HYPON_APPKEY e HYPON_ACCESS_KEY"
+            )
+
         self.token = None
-        self.usinas_cache = None
-        self.token_cache = None
-        self.token_timestamp = None
-        self.usinas_timestamp = None
-        self.session = requests.Session()
+        self.session = criar_sessao(self.base_url, integracao.id, codigos_de_erro("result_code", CODIGOS_TRANSITORIOS))
+        self.headers = {
+            "Content-Type": "application/json",
+            "x-access-key": x_access_key,
+            "sys_code": "901"
+        }
         self._geracao_cache = None
         self._geracao_cache_timestamp = None
-        
 
     def login_solarcloud(self):
-        if self.token_cache and time.time() - self.token_timestamp < 600:  # 10 minutos de cache
-            return self.token_cache
-        
+        """Token do broker compartilhado: só há login quando nenhum worker tem um token válido."""
+        self.token = token_broker.obter_token(
+            self.integracao.id, self.validade_token, lambda db, integracao: self._obter_token()
+        )
+        return self.token
+
+    def _obter_token(self):
         url = self.base_url + "login"
         body = {
             "appkey": self.appkey,
@@ -39,11 +81,161 @@ class ApiHyponCloud:
             return None
         dados = response.json()
         try:
-            self.token = dados["result_data"]["token"]
-            self.token_cache = self.token
-            self.token_timestamp = time.time()
-        except KeyError:
+            token = dados["result_data"]["token"]
+        except (KeyError, TypeError):
             print("Token não encontrado na resposta:", dados)
             return None
-        print("Novo token SUNGROW obtido:", self.token)
-        return self.token
\ No newline at end of file
+        print("✅ Novo token HYPON obtido:", token)
+        return token
+
+    def _post_with_auth(self, interface: str, body: dict) -> dict:
+        """
+        POST autenticado; renova o token uma vez se o gateway o recusar.
+        Retorna o result_data e levanta exceção em qualquer falha.
+        """
+        token = self.login_solarcloud()
+        body = {"appkey": self.appkey, "token": token, **body}
+        response = self.session.post(self.base_url + interface, json=body, headers=self.headers)
+
+        if response.status_code in (401, 403):
+            print("⚠️ Token HYPON expirado. Renovando...")
+            self.token = token_broker.renovar(
+                self.integracao.id, self.validade_token,
+                lambda db, integracao: self._obter_token(), token_invalido=token
+            )
+            body["token"] = self.token
+            response = self.session.post(self.base_url + interface, json=body, headers=self.headers)
+
+        if response.status_code != 200:
+            raise Exception(f"Erro HTTP {response.status_code} em {interface}")
+        dados = response.json()
+        if dados.get("result_code") != "1":
+            raise Exception(f"Falha em {interface}: {dados.get('result_code')} {dados.get('result_msg')}")
+        return dados.get("result_data") or {}
+
+# ----------------------GET USINAS------------------------#
+
+    def _buscar_pagina_usinas(self, pagina: int):
+        """Uma página do plant/list já normalizada. Retorna (usinas, total de registros)."""
+        try:
+            dados = self._post_with_auth("plant/list", {"page": pagina, "page_size": self.usinas_por_pagina})
+        except FabricanteIndisponivel as e:
+            print("🔌", e)
+            return [], 0
+        except Exception as e:
+            print("❌ Erro ao buscar usinas Hypontech:", e)
+            return [], 0
+
+        # Mapear status para ps_fault_status
+        status_falha = {"online": 3, "warning": 2, "fault": 1, "offline": 1}
+
+        dados_usinas = []
+        for usina in dados.get("pageList") or []:
+            dados_usinas.append({
+                "ps_id": usina.get("plant_id"),
+                "ps_name": usina.get("plant_name"),
+                "location": usina.get("address", ""),
+                "curr_power": parse_float(usina.get("power")),
+                "total_energy": parse_float(usina.get("e_total")),
+                "today_energy": parse_float(usina.get("e_today")),
+                "capacidade": parse_float(usina.get("capacity")),
+                "co2_total": 0.0,
+                "income_total": 0.0,
+                "ps_fault_status": status_falha.get(str(usina.get("status", "")).lower(), 0),
+            })
+        return dados_usinas, int(dados.get("rowCount") or len(dados_usinas))
+
+    def get_usinas(self):
+        with _usinas_lock:
+            cache = _usinas_cache.get(self.integracao.id)
+        if cache and (time.time() - cache[0] < self.cache_expiry or self.session.indisponivel):
+            # Com o disjuntor aberto a última lista é servida mesmo vencida
+            return cache[1]
+
+        dados_usinas = paginar(self._buscar_pagina_usinas, self.usinas_por_pagina, self.max_concorrencia)
+        if not dados_usinas:
+            return cache[1] if cache and self.session.indisponivel else []
+
+        with _usinas_lock:
+            _usinas_cache[self.integracao.id] = (time.time(), dados_usinas)
+        return dados_usinas
+
+    # OBTENDO GERAÇÃO
+
+    def _serie_diaria(self, plant_id, inicio: str, fim: str) -> dict:
+        """Série diária de geração (kWh) de uma usina entre inicio e fim (YYYY-MM-DD, inclusive): {"YYYY-MM-DD": kWh}."""
+        dados = self._post_with_auth(
+            "plant/energy/day", {"plant_id": plant_id, "start_date": inicio, "end_date": fim}
+        )
+        return {item["date"]: parse_float(item.get("energy")) for item in dados.get("list") or [] if item.get("date")}
+
+    def get_geracao_diaria(self, inicio, fim) -> dict:
+        """
+        Energia diária (kWh) de todas as usinas entre as datas inicio e fim
+        (inclusive): {ps_id: {date: kWh}}. Usinas sem dados vêm com {}; as
+        que falharam ficam de fora.
+        """
+        usinas = self.get_usinas()
+        if not usinas:
+            return {}
+
+        plant_ids = [usina.get("ps_id") for usina in usinas if usina.get("ps_id")]
+        series = executar_em_paralelo(
+            lambda plant_id: self._serie_diaria(plant_id, inicio.strftime("%Y-%m-%d"), fim.strftime("%Y-%m-%d")),
+            plant_ids,
+            self.max_concorrencia,
+        )
+
+        por_usina = {}
+        for ps_id, serie in zip(plant_ids, series):
+            if serie is None:
+                print(f"❌ Erro ao consultar usina {ps_id}")
+                continue
+            dias = {datetime.strptime(dia, "%Y-%m-%d").date(): valor for dia, valor in serie.items()}
+            por_usina[ps_id] = {dia: valor for dia, valor in dias.items() if inicio <= dia <= fim}
+
+        return por_usina
+
+    def get_geracao(self):
+        print("Chamando get_geracao() para Hypontech 🚀")
+        brasil = timezone("America/Sao_Paulo")
+        agora = datetime.now(brasil)
+
+        # 🔁 Cache local (10 minutos)
+        if self._geracao_cache and self._geracao_cache_timestamp:
+            if (agora - self._geracao_cache_timestamp) < timedelta(minutes=10):
+                print("🔁 Retornando geração do cache local")
+                return self._geracao_cache
+
+        # Uma única série de 30 dias terminando ontem por usina, buscadas em paralelo
+        ontem = (agora - timedelta(days=1)).date()
+        sete_dias_atras = ontem - timedelta(days=6)
+        trinta_dias_atras = ontem - timedelta(days=29)
+        por_usina = self.get_geracao_diaria(trinta_dias_atras, ontem)
+
+        diario = []
+        setedias = []
+        mensal = []
+
+        for ps_id, serie in por_usina.items():
+            if ontem in serie:
+                diario.append({"ps_id": ps_id, "data": str(ontem), "energia_gerada_kWh": round(serie[ontem], 2)})
+
+            soma_7 = round(sum(v for dia, v in serie.items() if dia >= sete_dias_atras), 2)
+            setedias.append({"ps_id": ps_id, "periodo": f"{sete_dias_atras} a {ontem}", "energia_gerada_kWh": soma_7})
+
+            soma_30 = round(sum(serie.values()), 2)
+            mensal.append({"ps_id": ps_id, "periodo": f"{trinta_dias_atras} a {ontem}", "energia_gerada_kWh": soma_30})
+
+        resultado = {
+            "diario": diario,
+            "7dias": setedias,
+            "30dias": {
+                "total": round(sum(item["energia_gerada_kWh"] for item in mensal), 2),
+                "por_usina": mensal
+            }
+        }
+
+        self._geracao_cache = resultado
+        self._geracao_cache_timestamp = agora
+        return resultado
@@ -1,12 +1,21 @@
 import requests
 import json
 import time
+import os
 from helpers import parse_float
 from datetime import datetime, timedelta
 from pytz import timezone
 from typing import Optional
 from calendar import monthrange
-from models .codificacoes_sungrow import ponto_legivel
+from collections import defaultdict
+from functools import partial
+from models .codificacoes_sungrow import perfis_pontos, traduzir_ponto
+from services import device_catalog_service
+from clients.sessao_http import criar_sessao, codigos_de_erro
+from clients.excessions import FabricanteIndisponivel
+from clients.hedging import post_com_hedge
+from clients.fanout import executar_em_paralelo, paginar
+from clients.token_broker import token_broker
 from sqlalchemy.orm import Session
 from modelos import Integracao
 
@@ -15,15 +24,40 @@ import time
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from modelos import Integracao
+import threading
 
 
-class ApiSolarCloud:
-    base_url = "https://gateway.isolarcloud.com.hk/openapi/"
+# Curva parcial do dia corrente: (integracao_id, ps_id, data) -> {ps_key: {"ultimo": time_stamp, "buscado_ate": datetime, "itens": {time_stamp: item}}}
+_curvas_do_dia = {}
+_curvas_lock = threading.Lock()
+
+# Último retrato em tempo real por inversor: (ps_key, perfil) -> (timestamp, dados legíveis)
+_snapshots_tempo_real = {}
+SNAPSHOT_TTL = int(os.getenv("SUNGROW_SNAPSHOT_TTL", 30))
+
+# Trecho final da curva do dia pedido de novo a cada atualização: o gateway às vezes publica slots com atraso
+RELEITURA_CURVA = timedelta(minutes=int(os.getenv("SUNGROW_CURVA_RELEITURA_MIN", 15)))
+
+# result_code do gateway tratados como falha transitória (retentativa e disjuntor)
+CODIGOS_TRANSITORIOS = os.getenv("SUNGROW_CODIGOS_TRANSITORIOS", "E900").split(",")
+
+# Última lista de usinas obtida por integração, servida enquanto o disjuntor estiver aberto
+_ultimas_usinas = {}
+
 
-    def __init__(self, db: Session, integracao: Integracao):
+class ApiSolarCloud:
+    base_url = os.getenv("SUNGROW_BASE_URL", "https://gateway.isolarcloud.com.hk/openapi/")
+    ps_keys_por_requisicao = 50  # limite de ps_keys por chamada aceito pelo gateway
+    ps_keys_por_requisicao_minutos = 10  # idem para getDevicePointMinuteDataList
+    usinas_por_pagina = 100
+    max_concorrencia = int(os.getenv("SUNGROW_MAX_CONCORRENCIA", 8))  # requisições simultâneas por conta
+    validade_token = timedelta(minutes=50)
+
+    def __init__(self, db: Session, integracao: Integracao, max_concorrencia: Optional[int] = None):
         self.db = db
         self.integracao = integracao
-        self.token_timestamp = 0
+        if max_concorrencia:
+            self.max_concorrencia = max_concorrencia
 
         self.username = integracao.username
         self.password = integracao.senha
@@ -39,50 +73,22 @@ class ApiSolarCloud:
         self.token_cache = None
         self.usinas_cache = None
 
-        self.session = requests.Session()
+        self.session = criar_sessao(self.base_url, integracao.id, codigos_de_erro("result_code", CODIGOS_TRANSITORIOS))
         self.headers = {
             "Content-Type": "application/json",
             "x-access-key": self.x_access_key,
             "sys_code": "901"
         }
 
-        # ⚠️ Verifica no banco se outro processo atualizou o token antes de gerar novo
-        self.db.refresh(self.integracao)
-
-        if self.integracao.token_acesso and self.integracao.token_updated_at:
-            tempo_expirado = datetime.utcnow() - self.integracao.token_updated_at
-            if tempo_expirado < timedelta(minutes=50):
-                print("✅ Usando token armazenado no banco")
-                self.token = self.integracao.token_acesso
-                self.token_cache = self.token
-            else:
-                print("🔄 Token expirado, verificando necessidade de renovação...")
-                self.token = self._autenticar_e_salvar_token()
-        else:
-            print("🔑 Nenhum token encontrado, obtendo novo...")
-            self.token = self._autenticar_e_salvar_token()
-
-    def _autenticar_e_salvar_token(self):
-        # Verifica novamente se já foi atualizado por outro processo
-        self.db.refresh(self.integracao)
-        if self.integracao.token_acesso and self.integracao.token_updated_at:
-            tempo_expirado = datetime.utcnow() - self.integracao.token_updated_at
-            if tempo_expirado < timedelta(minutes=50):
-                print("♻️ Outro processo já atualizou o token.")
-                return self.integracao.token_acesso
-
-        novo_token = self._obter_token()
-        if not novo_token:
-            raise Exception("❌ Falha ao obter novo token da API Sungrow.")
-
-        self.integracao.token_acesso = novo_token
-        self.integracao.token_updated_at = datetime.utcnow()
+        self._token_valido()
 
-        self.db.add(self.integracao)
-        self.db.commit()
-        self.db.refresh(self.integracao)
-
-        return novo_token
+    def _token_valido(self):
+        """Token do broker compartilhado: só há login quando nenhum worker tem um token válido."""
+        self.token = token_broker.obter_token(
+            self.integracao.id, self.validade_token, lambda db, integracao: self._obter_token()
+        )
+        self.token_cache = self.token
+        return self.token
 
     def _obter_token(self):
         url = self.base_url + "login"
@@ -118,61 +124,100 @@ class ApiSolarCloud:
         print("✅ Novo token SUNGROW obtido:", self.token)
         return self.token
 
-    def _post_with_auth(self, url, body):
-        token = self.token_cache or self.token
-        if not token:
-            print("⚠️ Nenhum token disponível, tentando obter novo...")
-            token = self._obter_token()
-            if not token:
-                print("❌ Falha ao obter token.")
-                return None
-            self.token_cache = token
+    def _post_with_auth(self, url, body, hedge: bool = False):
+        """`hedge=True` apenas em leituras idempotentes: permite disparar uma cópia se a resposta demorar."""
+        post = partial(post_com_hedge, self.session) if hedge else self.session.post
+        try:
+            token = self._token_valido()
+        except Exception as e:
+            print("❌ Falha ao obter token:", e)
+            return None
 
         body["token"] = token
-        response = self.session.post(url, json=body, headers=self.headers)
+        try:
+            response = post(url, json=body, headers=self.headers)
+        except FabricanteIndisponivel as e:
+            print("🔌", e)
+            return None
 
         if response.status_code in (401, 403):
             print("⚠️ Token expirado. Renovando...")
-            self.token_cache = None
-            token = self._obter_token()
-            if not token:
-                print("❌ Falha ao renovar token.")
+            try:
+                token = token_broker.renovar(
+                    self.integracao.id, self.validade_token,
+                    lambda db, integracao: self._obter_token(), token_invalido=token
+                )
+            except Exception as e:
+                print("❌ Falha ao renovar token:", e)
                 return None
+            self.token = self.token_cache = token
             body["token"] = token
-            response = self.session.post(url, json=body, headers=self.headers)
+            try:
+                response = post(url, json=body, headers=self.headers)
+            except FabricanteIndisponivel as e:
+                print("🔌", e)
+                return None
 
         return response
 
+    def _buscar_dispositivos(self, ps_id) -> list:
+        """Consulta os inversores da usina no getDeviceList (alimenta o catálogo de dispositivos)."""
+        body = {
+            "appkey": self.appkey,
+            "token": self.token_cache,
+            "curPage": 1,
+            "size": 100,
+            "ps_id": str(ps_id),
+            "device_type_list": [1],
+            "lang": "_pt_BR"
+        }
+
+        response = self._post_with_auth(self.base_url + "getDeviceList", body)
+        if response is None or response.status_code != 200:
+            raise Exception(f"Erro ao buscar dispositivos da usina {ps_id}")
 
-    def get_usinas(self):
-        if self.usinas_cache and (time.time() - getattr(self, "usinas_timestamp", 0)) < 300:
-            return self.usinas_cache
+        inversores = (response.json().get("result_data") or {}).get("pageList", [])
+        return [
+            {
+                "ps_key": inv.get("ps_key"),
+                "device_type": inv.get("device_type"),
+                "device_sn": inv.get("device_sn"),
+            }
+            for inv in inversores if inv.get("ps_key")
+        ]
 
+    def _obter_ps_keys(self, ps_id) -> list:
+        """ps_keys da usina vindos do catálogo local, sem ida ao fabricante quando já conhecidos."""
+        return device_catalog_service.obter_ps_keys(self.db, self.integracao.id, ps_id, self._buscar_dispositivos)
+
+
+    def _buscar_pagina_usinas(self, pagina: int):
+        """Uma página do getPowerStationList já normalizada. Retorna (usinas, total de registros)."""
         url = self.base_url + "getPowerStationList"
         body = {
-            "curPage": 1,
+            "curPage": pagina,
             "appkey": self.appkey,
-            "size": 100,
+            "size": self.usinas_por_pagina,
             "lang": "_pt_BR"
         }
 
-        response = self._post_with_auth(url, body)
+        response = self._post_with_auth(url, body, hedge=True)
 
         if response is None:
             print("Erro: resposta nula ao buscar usinas. Verifique token ou login.")
-            return []
+            return [], 0
 
         # Verifica status code
         if response.status_code != 200:
             print("Erro ao buscar usinas:", response.status_code, response.text)
-            return []
+            return [], 0
 
         try:
             dados = response.json()
         except Exception as e:
             print("Erro ao decodificar JSON da resposta de usinas:", e)
             print("Resposta bruta:", response.text)
-            return []
+            return [], 0
 
         dados_usinas = []
 
@@ -205,16 +250,158 @@ class ApiSolarCloud:
         except KeyError as e:
             print("Erro ao acessar dados da resposta:", e)
             print("Conteúdo recebido:", dados)
-            return []
+            return [], 0
+
+        total = dados["result_data"].get("rowCount") or len(dados_usinas)
+        return dados_usinas, int(total)
+
+    def get_usinas(self):
+        if self.usinas_cache and (time.time() - getattr(self, "usinas_timestamp", 0)) < 300:
+            return self.usinas_cache
+
+        # Fabricante fora do ar: devolve a última lista obtida em vez de esperar timeouts
+        if self.session.indisponivel and self.integracao.id in _ultimas_usinas:
+            print("🔌 Sungrow indisponível, retornando última lista de usinas")
+            return _ultimas_usinas[self.integracao.id]
+
+        dados_usinas = paginar(self._buscar_pagina_usinas, self.usinas_por_pagina, self.max_concorrencia)
+        if not dados_usinas:
+            return _ultimas_usinas.get(self.integracao.id, []) if self.session.indisponivel else []
 
         # Salva no cache com timestamp
         self.usinas_cache = dados_usinas
         self.usinas_timestamp = time.time()
+        _ultimas_usinas[self.integracao.id] = dados_usinas
 
         return dados_usinas
 
+    def _buscar_energia_diaria(self, ps_keys: list, start_time: str, end_time: str, mensal: bool = False) -> dict:
+        """
+        Busca a série diária do ponto p1 (Wh) de vários inversores de uma vez,
+        agrupando até `ps_keys_por_requisicao` ps_keys em cada chamada e
+        buscando os lotes em paralelo. Com `mensal`, start/end são YYYYMM e a
+        série é por mês. Retorna ({ps_key: {"YYYYMMDD" (ou "YYYYMM"): Wh}},
+        ps_keys de algum lote que falhou).
+        """
+        url = self.base_url + "getDevicePointsDayMonthYearDataList"
+        lotes = [
+            ps_keys[i:i + self.ps_keys_por_requisicao]
+            for i in range(0, len(ps_keys), self.ps_keys_por_requisicao)
+        ]
+        campo = "4" if mensal else "2"
+
+        def buscar_lote(lote):
+            body = {
+                "appkey": self.appkey,
+                "token": self.token_cache,
+                "data_point": "p1",
+                "start_time": start_time,
+                "end_time": end_time,
+                "query_type": "2" if mensal else "1",
+                "ps_key_list": lote,
+                "data_type": campo,
+                "order": "0"
+            }
+
+            r = self._post_with_auth(url, body)
+            if r is None or r.status_code != 200:
+                print(f"❌ Erro ao buscar geração do lote {lote}")
+                return None
+
+            try:
+                dados = r.json()
+            except ValueError as e:
+                print(f"❌ Erro ao decodificar geração do lote {lote}: {e}")
+                return None
+
+            if dados.get("result_code") != "1":
+                print(f"⚠️ Erro ao buscar geração do lote {lote}: {dados.get('result_msg')}")
+                return None
+            return dados.get("result_data") or {}
+
+        serie = {}
+        falhas = set()
+        for lote, dados in zip(lotes, executar_em_paralelo(buscar_lote, lotes, self.max_concorrencia)):
+            if dados is None:
+                falhas.update(lote)
+                continue
+            for ps_key, pontos in dados.items():
+                if not isinstance(pontos, dict):
+                    continue
+                por_periodo = serie.setdefault(ps_key, {})
+                for p in pontos.get("p1", []):
+                    timestamp = p.get("time_stamp")
+                    if timestamp:
+                        por_periodo[timestamp[:6] if mensal else timestamp[:8]] = parse_float(p.get(campo, "0"))
+
+        return serie, falhas
+
+    @staticmethod
+    def _somar_janela(por_dia: dict, inicio: str, fim: str) -> float:
+        """Soma os valores de uma série {"YYYYMMDD": Wh} entre inicio e fim (inclusive)."""
+        return sum(valor for dia, valor in por_dia.items() if inicio <= dia <= fim)
+
+    def _janelas_de_geracao(self, ps_keys: list, agora: datetime) -> dict:
+        """
+        Baixa a janela de 31 dias uma única vez e recorta localmente os totais
+        de ontem, 7 dias e 30 dias. Retorna {ps_key: (1d, 7d, 30d)} em Wh.
+        """
+        ontem = (agora - timedelta(days=1)).strftime("%Y%m%d")
+        sete_dias_atras = (agora - timedelta(days=8)).strftime("%Y%m%d")
+        mes_atras = (agora - timedelta(days=31)).strftime("%Y%m%d")
+
+        serie, _ = self._buscar_energia_diaria(ps_keys, mes_atras, ontem)
+
+        return {
+            ps_key: (
+                self._somar_janela(por_dia, ontem, ontem),
+                self._somar_janela(por_dia, sete_dias_atras, ontem),
+                self._somar_janela(por_dia, mes_atras, ontem),
+            )
+            for ps_key, por_dia in serie.items()
+        }
+
+    def get_geracao_diaria(self, inicio, fim) -> dict:
+        """
+        Energia diária (kWh) de todas as usinas entre as datas inicio e fim
+        (inclusive), somando os inversores. Retorna {ps_id: {date: kWh}}:
+        usinas consultadas sem nenhum dado (ou sem inversores) vêm com {}; as
+        que tiveram algum inversor em lote com falha ficam de fora.
+        """
+        self._token_valido()
+
+        if not self.usinas_cache:
+            self.get_usinas()
+
+        ps_ids = [usina.get("ps_id") for usina in self.usinas_cache if usina.get("ps_id")]
+        ps_keys_por_usina = device_catalog_service.obter_ps_keys_em_lote(
+            self.db, self.integracao.id, ps_ids, self._buscar_dispositivos, self.max_concorrencia
+        )
+        usina_por_ps_key = {
+            ps_key: ps_id
+            for ps_id, ps_keys in zip(ps_ids, ps_keys_por_usina)
+            for ps_key in ps_keys or []
+        }
+
+        inicio_str, fim_str = inicio.strftime("%Y%m%d"), fim.strftime("%Y%m%d")
+        serie, falhas = self._buscar_energia_diaria(list(usina_por_ps_key), inicio_str, fim_str)
+
+        com_falha = {usina_por_ps_key[ps_key] for ps_key in falhas if ps_key in usina_por_ps_key}
+        por_usina = {ps_id: {} for ps_id in ps_ids if ps_id not in com_falha}
+        for ps_key, por_dia in serie.items():
+            ps_id = usina_por_ps_key.get(ps_key)
+            if ps_id is None or ps_id in com_falha:
+                continue
+            dias = por_usina[ps_id]
+            for dia, valor in por_dia.items():
+                if inicio_str <= dia <= fim_str:
+                    data = datetime.strptime(dia, "%Y%m%d").date()
+                    dias[data] = dias.get(data, 0.0) + valor / 1000
+
+        return por_usina
+
 # OBTENDO PS_KEYS E SERIAL NUMBER E DEMAIS DADOS
-    
+
     def get_geracao_para_usina(self, db: Session, ps_id: str):
         from models.monthly_projection import MonthlyProjection
 
@@ -227,8 +414,7 @@ class ApiSolarCloud:
             return None
 
         # Garante token e lista de usinas atualizadas
-        if not self.token_cache:
-            self._obter_token()
+        self._token_valido()
 
         if not self.usinas_cache:
             self.get_usinas()
@@ -239,70 +425,17 @@ class ApiSolarCloud:
             return None
 
         # Busca ps_keys
-        url_device_list = self.base_url + "getDeviceList"
-        body_device = {
-            "appkey": self.appkey,
-            "token": self.token_cache,
-            "curPage": 1,
-            "size": 100,
-            "ps_id": ps_id,
-            "device_type_list": [1],
-            "lang": "_pt_BR"
-        }
-
-        response = self._post_with_auth(url_device_list, body_device)
-        if response.status_code != 200:
+        ps_keys = self._obter_ps_keys(ps_id)
+        if not ps_keys:
             print(f"Erro ao buscar dispositivos da usina {ps_id}")
             return None
 
-        data = response.json()
-        ps_keys = [dev.get("ps_key") for dev in data["result_data"]["pageList"] if dev.get("ps_key")]
-
         brasil = timezone("America/Sao_Paulo")
-        agora = datetime.now(brasil)
-        ontem = (agora - timedelta(days=1)).strftime("%Y%m%d")
-        sete_dias_atras = (agora - timedelta(days=8)).strftime("%Y%m%d")
-        mes_atras = (agora - timedelta(days=31)).strftime("%Y%m%d")
+        janelas = self._janelas_de_geracao(ps_keys, datetime.now(brasil))
 
-        energia_1d = 0.0
-        energia_7d = 0.0
-        energia_30d = 0.0
-
-        for ps_key in ps_keys:
-            for periodo, start, soma_destino in [
-                ("1d", ontem, lambda v: energia_1d + v),
-                ("7d", sete_dias_atras, lambda v: energia_7d + v),
-                ("30d", mes_atras, lambda v: energia_30d + v),
-            ]:
-                body = {
-                    "appkey": self.appkey,
-                    "token": self.token_cache,
-                    "data_point": "p1",
-                    "end_time": ontem,
-                    "query_type": "1",
-                    "start_time": start,
-                    "ps_key_list": [ps_key],
-                    "data_type": "2",
-                    "order": "0"
-                }
-
-                r = self._post_with_auth(self.base_url + "getDevicePointsDayMonthYearDataList", body)
-                if r.status_code == 200:
-                    try:
-                        dados = r.json()["result_data"]
-                        chave = next(iter(dados))
-                        lista = dados[chave]["p1"]
-                        if periodo == "1d":
-                            valor_str = lista[0].get("2", "0")
-                            energia_1d += float(valor_str)
-                        else:
-                            soma = sum(float(p.get("2", "0")) for p in lista)
-                            if periodo == "7d":
-                                energia_7d += soma
-                            elif periodo == "30d":
-                                energia_30d += soma
-                    except Exception as e:
-                        print(f"Erro extraindo geração {periodo} de {ps_key}: {e}")
+        energia_1d = sum(j[0] for j in janelas.values())
+        energia_7d = sum(j[1] for j in janelas.values())
+        energia_30d = sum(j[2] for j in janelas.values())
 
         return {
             "ps_id": ps_id,
@@ -313,90 +446,22 @@ class ApiSolarCloud:
 
     def get_geracao_por_usina(self, ps_id: int) -> dict:
         """Retorna geração 1d, 7d e 30d para uma única usina"""
-        if not self.token_cache:
-            self._obter_token()
+        self._token_valido()
 
         print(f"🔍 Consultando geração apenas para ps_id={ps_id}")
 
-        url_device_list = self.base_url + "getDeviceList"
-        body_device = {
-            "appkey": self.appkey,
-            "token": self.token_cache,
-            "curPage": 1,
-            "size": 100,
-            "ps_id": ps_id,
-            "device_type_list": [1],
-            "lang": "_pt_BR"
-        }
-
-        response = self._post_with_auth(url_device_list, body_device)
-        if response.status_code != 200:
+        ps_keys = self._obter_ps_keys(ps_id)
+        if not ps_keys:
             print(f"Erro ao buscar inversores da usina {ps_id}")
             return {}
 
         try:
-            device_list = response.json()["result_data"]["pageList"]
             brasil = timezone("America/Sao_Paulo")
-            agora = datetime.now(brasil)
-            ontem = (agora - timedelta(days=1)).strftime("%Y%m%d")
-            sete_dias_atras = (agora - timedelta(days=8)).strftime("%Y%m%d")
-            mes_atras = (agora - timedelta(days=31)).strftime("%Y%m%d")
-
-            total_1d = 0.0
-            total_7d = 0.0
-            total_30d = 0.0
-
-            for device in device_list:
-                ps_key = device.get("ps_key")
-
-                # Geração 1 dia
-                body_1d = {
-                    "appkey": self.appkey,
-                    "token": self.token_cache,
-                    "data_point": "p1",
-                    "start_time": ontem,
-                    "end_time": ontem,
-                    "query_type": "1",
-                    "ps_key_list": [ps_key],
-                    "data_type": "2",
-                    "order": "0"
-                }
-                r1 = self._post_with_auth(self.base_url + "getDevicePointsDayMonthYearDataList", body_1d)
-                if r1.status_code == 200:
-                    try:
-                        dados = r1.json()["result_data"]
-                        chave = next(iter(dados))
-                        lista = dados[chave]["p1"]
-                        valor = float(lista[0].get("2", "0"))
-                        total_1d += valor
-                    except Exception as e:
-                        print(f"Erro extraindo 1d: {e}")
-
-                # Geração 7 dias
-                body_7d = body_1d.copy()
-                body_7d["start_time"] = sete_dias_atras
-                r2 = self._post_with_auth(self.base_url + "getDevicePointsDayMonthYearDataList", body_7d)
-                if r2.status_code == 200:
-                    try:
-                        dados = r2.json()["result_data"]
-                        chave = next(iter(dados))
-                        lista = dados[chave]["p1"]
-                        total_7d += sum(float(p.get("2", "0")) for p in lista)
-                    except Exception as e:
-                        print(f"Erro extraindo 7d: {e}")
-
-                # Geração 30 dias
-                body_30d = body_1d.copy()
-                body_30d["start_time"] = mes_atras
-                r3 = self._post_with_auth(self.base_url + "getDevicePointsDayMonthYearDataList", body_30d)
-                if r3.status_code == 200:
-                    try:
-                        dados = r3.json()["result_data"]
-                        chave = next(iter(dados))
-                        lista = dados[chave]["p1"]
-                        total_30d += sum(float(p.get("2", "0")) for p in lista)
-                    except Exception as e:
-                        print(f"Erro extraindo 30d: {e}")
+            janelas = self._janelas_de_geracao(ps_keys, datetime.now(brasil))
+
+            total_1d = sum(j[0] for j in janelas.values())
+            total_7d = sum(j[1] for j in janelas.values())
+            total_30d = sum(j[2] for j in janelas.values())
 
             return {
                 "ps_id": ps_id,
@@ -417,8 +482,7 @@ class ApiSolarCloud:
         agora = datetime.now(brasil)
 
         if period == "day" and date and plant_id:
-            if not self.token_cache:
-                self._obter_token()
+            self._token_valido()
 
             if not self.usinas_cache:
                 self.get_usinas()
@@ -426,17 +490,13 @@ class ApiSolarCloud:
             print(f"🔍 Buscando geração do dia {date} para plant_id={plant_id}")
             return self.get_geracao_dia(data=date, plant_id=plant_id)
 
-        # Demais chamadas padrão da dashboard (sem filtro específico)
+        # ✅ Lógica de cache para resposta padrão da dashboard
         if self._geracao_cache and self._geracao_cache_timestamp:
             if (agora - self._geracao_cache_timestamp) < timedelta(minutes=10):
                 print("🔁 Retornando geração do cache diário")
-                return {
-                    "diario": self._geracao_cache,
-                    "7dias": self.geracao7_cache or []
-                }
+                return self._geracao_cache
 
-        if not self.token_cache:
-            self._obter_token()
+        self._token_valido()
 
         if not self.usinas_cache:
             self.get_usinas()
@@ -446,135 +506,36 @@ class ApiSolarCloud:
         sete_dias_atras = (agora - timedelta(days=8)).strftime("%Y%m%d")
         self.mes_atras = (agora - timedelta(days=31)).strftime("%Y%m%d")
 
+        # Mapeia cada ps_key para sua usina, para depois buscar todos de uma vez
+        usina_por_ps_key = {}
 
-        # ✅ Lógica de cache para resposta padrão da dashboard
-        if self._geracao_cache and self._geracao_cache_timestamp:
-            if (agora - self._geracao_cache_timestamp) < timedelta(minutes=10):
-                print("🔁 Retornando geração do cache diário")
-                return {
-                    "diario": self._geracao_cache,
-                    "7dias": self.geracao7_cache or []
-                }
+        ps_ids = [usina.get("ps_id") for usina in self.usinas_cache if usina.get("ps_id")]
+        ps_keys_por_usina = device_catalog_service.obter_ps_keys_em_lote(
+            self.db, self.integracao.id, ps_ids, self._buscar_dispositivos, self.max_concorrencia
+        )
 
-        if not self.token_cache:
-            self._obter_token()
+        for ps_id, ps_keys in zip(ps_ids, ps_keys_por_usina):
+            if not ps_keys:
+                print(f"Erro ao buscar inversores da usina {ps_id}")
+                continue
 
-        if not self.usinas_cache:
-            self.get_usinas()
+            for ps_key in ps_keys:
+                usina_por_ps_key[ps_key] = ps_id
 
-        self.anteontem = (agora - timedelta(days=2)).strftime("%Y%m%d")
-        self.ontem = (agora - timedelta(days=1)).strftime("%Y%m%d")
-        sete_dias_atras = (agora - timedelta(days=8)).strftime("%Y%m%d")
-        self.mes_atras = (agora - timedelta(days=31)).strftime("%Y%m%d")
+        # Uma única janela de 31 dias para todos os inversores, em lotes
+        janelas = self._janelas_de_geracao(list(usina_por_ps_key), agora)
 
         energia_por_usina = {}
         energia_7dias_por_usina = {}
         energia_30dias_por_usina = {}
 
-        for usina in self.usinas_cache:
-            ps_id = usina.get("ps_id")
-            if not ps_id:
-                continue
-
-            url_device_list = self.base_url + "getDeviceList"
-            body_device = {
-                "appkey": self.appkey,
-                "token": self.token_cache,
-                "curPage": 1,
-                "size": 100,
-                "ps_id": ps_id,
-                "device_type_list": [1],
-                "lang": "_pt_BR"
-            }
-
-            response = self._post_with_auth(url_device_list, body_device)
-            if response.status_code != 200:
-                print(f"Erro ao buscar inversores da usina {ps_id}")
-                continue
-
-            try:
-                data = response.json()
-                device_list = data["result_data"]["pageList"]
-
-                for device in device_list:
-                    ps_key = device.get("ps_key")
-
-                    # Geração diária
-                    body_energy_1d = {
-                        "appkey": self.appkey,
-                        "token": self.token_cache,
-                        "data_point": "p1",
-                        "end_time": self.ontem,
-                        "query_type": "1",
-                        "start_time": self.ontem,
-                        "ps_key_list": [ps_key],
-                        "data_type": "2",
-                        "order": "0"
-                    }
-
-                    r1 = self._post_with_auth(self.base_url + "getDevicePointsDayMonthYearDataList", body_energy_1d)
-                    if r1.status_code == 200:
-                        try:
-                            dados1 = r1.json()["result_data"]
-                            chave = next(iter(dados1))
-                            lista_p1 = dados1[chave]["p1"]
-                            valor_str = lista_p1[0].get("2", "0")
-                            energia_total = float(valor_str)
-                            energia_por_usina[ps_id] = energia_por_usina.get(ps_id, 0.0) + energia_total
-                        except Exception as e:
-                            print(f"Erro extraindo geração 1d de {ps_key}: {e}")
-
-                    # Geração 7 dias
-                    body_energy_7d = {
-                        "appkey": self.appkey,
-                        "token": self.token_cache,
-                        "data_point": "p1",
-                        "end_time": self.ontem,
-                        "query_type": "1",
-                        "start_time": sete_dias_atras,
-                        "ps_key_list": [ps_key],
-                        "data_type": "2",
-                        "order": "0"
-                    }
-
-                    r2 = self._post_with_auth(self.base_url + "getDevicePointsDayMonthYearDataList", body_energy_7d)
-                    if r2.status_code == 200:
-                        try:
-                            dados2 = r2.json()["result_data"]
-                            chave = next(iter(dados2))
-                            lista_p1 = dados2[chave]["p1"]
-                            soma_7dias = sum(float(p.get("2", "0")) for p in lista_p1)
-                            energia_7dias_por_usina[ps_id] = energia_7dias_por_usina.get(ps_id, 0.0) + soma_7dias
-                        except Exception as e:
-                            print(f"Erro extraindo geração 7d de {ps_key}: {e}")
-
-                    # Geração 30 dias
-                    body_energy_mes = {
-                        "appkey": self.appkey,
-                        "token": self.token_cache,
-                        "data_point": "p1",
-                        "end_time": self.ontem,
-                        "query_type": "1",
-                        "start_time": self.mes_atras,
-                        "ps_key_list": [ps_key],
-                        "data_type": "2",
-                        "order": "0"
-                    }
-
-                    r3 = self._post_with_auth(self.base_url + "getDevicePointsDayMonthYearDataList", body_energy_mes)
-                    if r3.status_code == 200:
-                        try:
-                            dados3 = r3.json()["result_data"]
-                            chave = next(iter(dados3))
-                            lista_p2 = dados3[chave]["p1"]
-                            soma_30dias = sum(float(p.get("2", "0")) for p in lista_p2)
-                            energia_30dias_por_usina[ps_id] = energia_30dias_por_usina.get(ps_id, 0.0) + soma_30dias
-                        except Exception as e:
-                            print(f"Erro extraindo geração 30d de {ps_key}: {e}")
-
-            except Exception as e:
-                print(f"Erro processando usina {ps_id}: {e}")
+        for ps_key, (valor_1d, valor_7d, valor_30d) in janelas.items():
+            ps_id = usina_por_ps_key.get(ps_key)
+            if ps_id is None:
                 continue
+            energia_por_usina[ps_id] = energia_por_usina.get(ps_id, 0.0) + valor_1d
+            energia_7dias_por_usina[ps_id] = energia_7dias_por_usina.get(ps_id, 0.0) + valor_7d
+            energia_30dias_por_usina[ps_id] = energia_30dias_por_usina.get(ps_id, 0.0) + valor_30d
 
         ps_daily_energy = [
             {
@@ -605,14 +566,7 @@ class ApiSolarCloud:
 
         total_30dias = sum(item["energia_gerada_kWh"] for item in ps_30dias_energy)
 
-        # Salvar no cache
-        self._geracao_cache = ps_daily_energy
-        self.geracao7_cache = ps_7dias_energy
-        self.geracao30_cache = ps_30dias_energy
-        self._geracao_cache_timestamp = agora
-
-        print("✅ Geração salva em cache")
-        return {
+        resultado = {
             "diario": ps_daily_energy,
             "7dias": ps_7dias_energy,
             "30dias": {
@@ -621,108 +575,201 @@ class ApiSolarCloud:
             }
         }
 
-    
+        # Salvar no cache
+        self._geracao_cache = resultado
+        self.geracao7_cache = ps_7dias_energy
+        self.geracao30_cache = ps_30dias_energy
+        self._geracao_cache_timestamp = agora
+
+        print("✅ Geração salva em cache")
+        return resultado
+
+
     #OBTENDO GERAÇÃO HISTÓRICA
 
-    def get_geracao_dia(self, data: str, ps_key: str = None, plant_id: int = None):
+    def _buscar_curva_minutos(self, ps_keys: list, blocos: list):
         """
-        Consulta a potência p24 a cada 15min, somando os dados de todos os ps_key da usina (caso existam vários).
-        Também busca o ponto p1 (geração diária total acumulada).
+        Busca os pontos p24/p1 a cada 5 minutos para vários ps_keys e blocos de
+        horário [(inicio, fim), ...] em paralelo, agrupando ps_keys por requisição.
+        Retorna ({ps_key: [itens]} com os itens de todos os blocos, ps_keys de
+        alguma requisição que falhou).
         """
-        from datetime import datetime, timedelta
-        from pytz import timezone
-        import time
-        import requests
-        from collections import defaultdict
+        url = self.base_url + "getDevicePointMinuteDataList"
+        lotes = [
+            ps_keys[i:i + self.ps_keys_por_requisicao_minutos]
+            for i in range(0, len(ps_keys), self.ps_keys_por_requisicao_minutos)
+        ]
+        tarefas = [(inicio, fim, lote) for inicio, fim in blocos for lote in lotes]
+
+        def buscar(tarefa):
+            inicio, fim, lote = tarefa
+            start_str = inicio.strftime("%Y%m%d%H%M%S")
+            end_str = fim.strftime("%Y%m%d%H%M%S")
 
+            body = {
+                "appkey": self.appkey,
+                "token": self.token_cache,
+                "start_time_stamp": start_str,
+                "end_time_stamp": end_str,
+                "minute_interval": 5,
+                "points": "p24,p1",  # ✅ inclui p1
+                "ps_key_list": lote,
+                "is_get_data_acquisition_time": "1"
+            }
+
+            print(f"⏱️ Requisição: {start_str} → {end_str} ({len(lote)} ps_keys)")
+            res = self._post_with_auth(url, body)
+
+            if res is None or res.status_code != 200:
+                print(f"❌ Erro HTTP no bloco {start_str} - {end_str}")
+                return None
+
+            res_json = res.json()
+            if res_json.get("result_code") != "1" or "result_data" not in res_json:
+                print(f"⚠️ Falha API no bloco {start_str} - {end_str}: {res_json}")
+                return None
+
+            return res_json["result_data"] or {}
+
+        curva = defaultdict(list)
+        falhas = set()
+        for (_, _, lote), dados in zip(tarefas, executar_em_paralelo(buscar, tarefas, self.max_concorrencia)):
+            if dados is None:
+                falhas.update(lote)
+                continue
+            for ps_key, itens in dados.items():
+                if isinstance(itens, list):
+                    curva[ps_key].extend(itens)
+
+        return curva, falhas
+
+    def _atualizar_curva_do_dia(self, plant_id, data_dt: datetime, ps_keys: list) -> dict:
+        """
+        Curva de hoje com busca incremental: para cada ps_key, retoma do último
+        time_stamp já recebido (ou, se o inversor ainda não trouxe pontos, de
+        até onde já foi buscado), relendo os últimos RELEITURA_CURVA para pegar
+        slots publicados com atraso, e acrescenta ao que está em memória.
+        Retorna {ps_key: [itens]}.
+        """
+        brasil = timezone("America/Sao_Paulo")
+        agora = datetime.now(brasil).replace(tzinfo=data_dt.tzinfo)
+        data = data_dt.strftime("%Y-%m-%d")
+        chave = (self.integracao.id, str(plant_id), data)
+
+        with _curvas_lock:
+            # Descarta curvas de dias anteriores
+            for antiga in [k for k in _curvas_do_dia if k[2] != data]:
+                del _curvas_do_dia[antiga]
+            parcial = _curvas_do_dia.setdefault(chave, {})
+
+            # Agrupa os ps_keys pelo ponto de onde precisam continuar
+            por_inicio = defaultdict(list)
+            for key in ps_keys:
+                registro = parcial.get(key, {})
+                meia_noite = data_dt.replace(hour=0, minute=0, second=0)
+                if registro.get("ultimo"):
+                    retomada = datetime.strptime(registro["ultimo"], "%Y%m%d%H%M%S").replace(tzinfo=data_dt.tzinfo)
+                    retomada += timedelta(minutes=5)
+                elif registro.get("buscado_ate"):
+                    retomada = registro["buscado_ate"]
+                else:
+                    retomada = meia_noite
+
+                inicio = max(meia_noite, retomada - RELEITURA_CURVA)
+                inicio = inicio.replace(minute=inicio.minute - inicio.minute % 5, second=0, microsecond=0)
+                por_inicio[inicio].append(key)
+
+        for inicio, keys in por_inicio.items():
+            blocos = []
+            while inicio <= agora:
+                fim = min(inicio + timedelta(hours=3, seconds=-1), agora)
+                blocos.append((inicio, fim))
+                inicio += timedelta(hours=3)
+
+            if not blocos:
+                continue
+
+            print(f"➕ Curva incremental a partir de {blocos[0][0].strftime('%H:%M')} para {len(keys)} ps_keys")
+            novos, falhas = self._buscar_curva_minutos(keys, blocos)
+
+            with _curvas_lock:
+                # Marca até onde cada ps_key foi buscado: sem pontos, ele não volta à meia-noite
+                for key in keys:
+                    if key not in falhas:
+                        parcial.setdefault(key, {"ultimo": None, "itens": {}})["buscado_ate"] = blocos[-1][1]
+
+                for key, itens in novos.items():
+                    registro = parcial.setdefault(key, {"ultimo": None, "itens": {}})
+                    for item in itens:
+                        timestamp = item.get("time_stamp")
+                        if not timestamp:
+                            continue
+                        registro["itens"][timestamp] = item
+                        if not registro["ultimo"] or timestamp > registro["ultimo"]:
+                            registro["ultimo"] = timestamp
+
+        with _curvas_lock:
+            return {
+                key: [parcial[key]["itens"][ts] for ts in sorted(parcial[key]["itens"])]
+                for key in ps_keys if key in parcial
+            }
+
+    def get_geracao_dia(self, data: str, ps_key: str = None, plant_id: int = None, com_status: bool = False):
+        """
+        Consulta a potência p24 a cada 5min, somando os dados de todos os ps_key da usina (caso existam vários).
+        Também busca o ponto p1 (geração diária total acumulada). Com `com_status`,
+        retorna (resultado, completo), completo só se nenhuma requisição falhou.
+        """
         brasil = timezone("America/Sao_Paulo")
         data_dt = datetime.strptime(data, "%Y-%m-%d").replace(tzinfo=brasil)
 
-        if not self.token_cache or time.time():
-            self._obter_token()
+        self._token_valido()
 
         if not self.usinas_cache:
             self.get_usinas()
 
-        url = self.base_url + "getDeviceList"
-        ps_id = str(plant_id)
-
         # Obtem todos os ps_key dessa usina
-        body_device = {
-            "appkey": self.appkey,
-            "token": self.token_cache,
-            "curPage": 1,
-            "size": 100,
-            "ps_id": ps_id,
-            "device_type_list": [1],
-            "lang": "_pt_BR"
-        }
-
-        res_device = self._post_with_auth(url, body_device)
-        if res_device.status_code != 200:
-            raise Exception(f"Erro ao obter ps_keys da usina {plant_id}")
-
-        data_device = res_device.json()
-        dispositivos = data_device["result_data"]["pageList"]
-        ps_keys = [d.get("ps_key") for d in dispositivos if d.get("ps_key")]
+        ps_keys = self._obter_ps_keys(plant_id)
 
         if not ps_keys:
             raise ValueError(f"Nenhum ps_key encontrado para a usina {plant_id}")
 
         print(f"✅ ps_keys encontrados: {ps_keys}")
 
+        falhas = set()
+        if data == datetime.now(brasil).strftime("%Y-%m-%d"):
+            # O dia corrente nunca é fechado: a curva é completada nas próximas chamadas
+            curva = self._atualizar_curva_do_dia(plant_id, data_dt, ps_keys)
+        else:
+            blocos = []
+            for bloco in range(0, 24, 3):
+                inicio = data_dt.replace(hour=bloco, minute=0, second=0)
+                blocos.append((inicio, inicio + timedelta(hours=3, seconds=-1)))
+
+            curva, falhas = self._buscar_curva_minutos(ps_keys, blocos)
+
         dados_por_hora = defaultdict(float)
         p1_por_inversor = defaultdict(list)
 
         for key in ps_keys:
-            for bloco in range(0, 24, 3):
-                inicio = data_dt.replace(hour=bloco, minute=0, second=0)
-                fim = inicio + timedelta(hours=3, seconds=-1)
-
-                start_str = inicio.strftime("%Y%m%d%H%M%S")
-                end_str = fim.strftime("%Y%m%d%H%M%S")
-
-                body = {
-                    "appkey": self.appkey,
-                    "token": self.token_cache,
-                    "start_time_stamp": start_str,
-                    "end_time_stamp": end_str,
-                    "minute_interval": 5,
-                    "points": "p24,p1",  # ✅ inclui p1
-                    "ps_key_list": [key],
-                    "is_get_data_acquisition_time": "1"
-                }
-
-                print(f"⏱️ Requisição: {start_str} → {end_str}")
-                res = requests.post(self.base_url + "getDevicePointMinuteDataList", json=body, headers=self.headers)
-
-                if res.status_code != 200:
-                    print(f"❌ Erro HTTP ({res.status_code}) no bloco {start_str} - {end_str}")
-                    continue
-
-                res_json = res.json()
-                if res_json.get("result_code") != "1" or "result_data" not in res_json:
-                    print(f"⚠️ Falha API no bloco {start_str} - {end_str}: {res_json}")
-                    continue
+            for item in curva.get(key, []):
+                timestamp = item.get("time_stamp")
+                potencia = item.get("p24", "0")
+                energia_total = item.get("p1")  # ✅ captura p1
 
-                for item in res_json["result_data"].get(key, []):
-                    timestamp = item.get("time_stamp")
-                    potencia = item.get("p24", "0")
-                    energia_total = item.get("p1")  # ✅ captura p1
+                if timestamp:
+                    horario = timestamp[8:10] + ":" + timestamp[10:12]
+                    try:
+                        dados_por_hora[horario] += float(potencia)
+                    except (ValueError, TypeError):
+                        print(f"⚠️ Valor inválido de potência: {potencia}")
 
-                    if timestamp:
-                        horario = timestamp[8:10] + ":" + timestamp[10:12]
-                        try:
-                            dados_por_hora[horario] += float(potencia)
-                        except ValueError:
-                            print(f"⚠️ Valor inválido de potência: {potencia}")
-
-                    if energia_total:
-                        try:
-                            p1_float = float(energia_total)
-                            p1_por_inversor[key].append(p1_float)
-                        except ValueError:
-                            print(f"⚠️ Valor inválido de p1: {energia_total}")
+                if energia_total:
+                    try:
+                        p1_float = float(energia_total)
+                        p1_por_inversor[key].append(p1_float)
+                    except ValueError:
+                        print(f"⚠️ Valor inválido de p1: {energia_total}")
 
         resultado = [
             {"time": horario, "production": round(valor / 1000, 2)}
@@ -733,34 +780,21 @@ class ApiSolarCloud:
         p1_total_kwh = p1_total_wh / 1000
 
 
-        return {
+        resultado = {
             "p1": round(p1_total_kwh, 2),
             "diario": resultado
         }
+        return (resultado, not falhas) if com_status else resultado
 
 
-    def get_geracao_mes(self, data: str, ps_key: str = None, plant_id: int = None):
-        if not self.token_cache or time.time() - self.token_timestamp > 600:
-            self._obter_token()
+    def get_geracao_mes(self, data: str, ps_key: str = None, plant_id: int = None, com_status: bool = False):
+        """Geração diária do mês somando os inversores. Com `com_status`, retorna (resultado, completo)."""
+        self._token_valido()
 
         if not self.usinas_cache:
             self.get_usinas()
 
-        url = self.base_url + "getDeviceList"
-        body = {
-            "appkey": self.appkey,
-            "token": self.token_cache,
-            "curPage": 1,
-            "size": 100,
-            "ps_id": str(plant_id),
-            "device_type_list": [1],
-            "lang": "_pt_BR"
-        }
-
-        res = self._post_with_auth(url, body)
-        data_device = res.json()
-        inversores = data_device.get("result_data", {}).get("pageList", [])
-        ps_keys = [inv.get("ps_key") for inv in inversores if inv.get("ps_key")]
+        ps_keys = self._obter_ps_keys(plant_id)
 
         if not ps_keys:
             raise ValueError("Nenhum ps_key encontrado.")
@@ -775,72 +809,33 @@ class ApiSolarCloud:
         start_time = f"{ano}{mes}01"
         end_time = f"{ano}{mes}{str(ultimo_dia).zfill(2)}"
 
-        dados_acumulados = {}
-        soma_total = 0
-
-        for key in ps_keys:
-            body = {
-                "token": self.token_cache,
-                "appkey": self.appkey,
-                "data_point": "p1",
-                "start_time": start_time,
-                "end_time": end_time,
-                "query_type": "1",
-                "data_type": "2",
-                "order": "0",
-                "ps_key_list": [key]
-            }
-
-            res = requests.post(
-                self.base_url + "getDevicePointsDayMonthYearDataList",
-                json=body,
-                headers=self.headers
-            )
+        serie, falhas = self._buscar_energia_diaria(ps_keys, start_time, end_time)
+        if not serie and self.session.indisponivel:
+            raise FabricanteIndisponivel(f"Sungrow indisponível para a geração de {data} da usina {plant_id}")
 
-            res_json = res.json()
-            if res.status_code != 200 or res_json.get("result_code") != "1":
-                print(f"⚠️ Erro para ps_key {key}: {res_json}")
-                continue
-
-            dados = res_json.get("result_data", {}).get(key, {}).get("p1", [])
-            for item in dados:
-                timestamp = item.get("time_stamp")
-                valor_raw = item.get("2")
-                if timestamp and valor_raw:
-                    data_str = f"{timestamp[:4]}-{timestamp[4:6]}-{timestamp[6:8]}"
-                    valor = round(float(valor_raw) / 1000, 2)
-                    dados_acumulados[data_str] = dados_acumulados.get(data_str, 0) + valor
+        dados_acumulados = {}
+        for por_dia in serie.values():
+            for dia, valor in por_dia.items():
+                data_str = f"{dia[:4]}-{dia[4:6]}-{dia[6:8]}"
+                dados_acumulados[data_str] = dados_acumulados.get(data_str, 0) + round(valor / 1000, 2)
 
         resultado = [{"date": k, "production": round(v, 2)} for k, v in sorted(dados_acumulados.items())]
         soma_total = sum([item["production"] for item in resultado])
 
-        return {
+        resultado = {
             "30dias": resultado,
             "total": round(soma_total, 2)
         }
+        return (resultado, not falhas) if com_status else resultado
     
-    def get_geracao_ano(self, ano: str, ps_key: str = None, plant_id: int = None):
-        if not self.token_cache or time.time() - self.token_timestamp > 600:
-            self._obter_token()
+    def get_geracao_ano(self, ano: str, ps_key: str = None, plant_id: int = None, com_status: bool = False):
+        """Geração mensal do ano somando os inversores. Com `com_status`, retorna (resultado, completo)."""
+        self._token_valido()
 
         if not self.usinas_cache:
             self.get_usinas()
 
-        url = self.base_url + "getDeviceList"
-        body = {
-            "appkey": self.appkey,
-            "token": self.token_cache,
-            "curPage": 1,
-            "size": 100,
-            "ps_id": str(plant_id),
-            "device_type_list": [1],
-            "lang": "_pt_BR"
-        }
-
-        res = self._post_with_auth(url, body)
-        data_device = res.json()
-        inversores = data_device.get("result_data", {}).get("pageList", [])
-        ps_keys = [inv.get("ps_key") for inv in inversores if inv.get("ps_key")]
+        ps_keys = self._obter_ps_keys(plant_id)
 
         if not ps_keys:
             raise ValueError("Nenhum ps_key encontrado.")
@@ -848,111 +843,104 @@ class ApiSolarCloud:
         start_time = f"{ano}01"
         end_time = f"{ano}12"
 
-        dados_acumulados = {}
-        soma_total = 0
-
-        for key in ps_keys:
-            body = {
-                "token": self.token_cache,
-                "appkey": self.appkey,
-                "data_point": "p1",
-                "start_time": start_time,
-                "end_time": end_time,
-                "query_type": "2",
-                "data_type": "4",
-                "order": "0",
-                "ps_key_list": [key]
-            }
-
-            res = requests.post(
-                self.base_url + "getDevicePointsDayMonthYearDataList",
-                json=body,
-                headers=self.headers
-            )
+        serie, falhas = self._buscar_energia_diaria(ps_keys, start_time, end_time, mensal=True)
+        if not serie and self.session.indisponivel:
+            raise FabricanteIndisponivel(f"Sungrow indisponível para a geração de {ano} da usina {plant_id}")
 
-            res_json = res.json()
-            if res.status_code != 200 or res_json.get("result_code") != "1":
-                print(f"⚠️ Erro para ps_key {key}: {res_json}")
-                continue
-
-            dados = res_json.get("result_data", {}).get(key, {}).get("p1", [])
-            for item in dados:
-                timestamp = item.get("time_stamp")
-                valor_raw = item.get("4")
-                if timestamp and valor_raw:
-                    data_str = f"{timestamp[:4]}-{timestamp[4:6]}"  # YYYY-MM
-                    valor = round(float(valor_raw) / 1000, 2)
-                    dados_acumulados[data_str] = dados_acumulados.get(data_str, 0) + valor
+        dados_acumulados = {}
+        for por_mes in serie.values():
+            for mes, valor in por_mes.items():
+                data_str = f"{mes[:4]}-{mes[4:6]}"  # YYYY-MM
+                dados_acumulados[data_str] = dados_acumulados.get(data_str, 0) + round(valor / 1000, 2)
 
         resultado = [{"date": k, "production": round(v, 2)} for k, v in sorted(dados_acumulados.items())]
         soma_total = sum([item["production"] for item in resultado])
 
-        return {
+        resultado = {
             "anual": resultado,
             "total": round(soma_total, 2)
         }
+        return (resultado, not falhas) if com_status else resultado
 
 
-    def get_dados_tecnicos(self, ps_key: Optional[str] = None, plant_id: Optional[int] = None):
-
-        if not self.token_cache:
-            self._obter_token()
+    def get_dados_tecnicos(self, ps_key: Optional[str] = None, plant_id: Optional[int] = None, perfil: str = "completo"):
+        """
+        Dados em tempo real dos inversores, apenas com os pontos do perfil pedido
+        (summary, mppt, strings, grid ou completo). Retratos com menos de
+        SNAPSHOT_TTL segundos são reaproveitados sem nova chamada ao fabricante.
+        """
+        if perfil not in perfis_pontos:
+            raise ValueError(f"Perfil de pontos inválido: {perfil}")
 
         if not ps_key:
 
             if not self.usinas_cache:
                 self.get_usinas()
 
-            url = self.base_url + "getDeviceList"
+            ps_key = self._obter_ps_keys(plant_id)
+            print(ps_key)
+            if not ps_key:
+                raise ValueError("ps_key não encontrado no inversor.")          
+
+        ps_keys = [ps_key] if isinstance(ps_key, str) else list(ps_key)
+
+        agora = time.time()
+        retratos = {}
+        for key in ps_keys:
+            snapshot = _snapshots_tempo_real.get((key, perfil))
+            if snapshot and agora - snapshot[0] < SNAPSHOT_TTL:
+                retratos[key] = snapshot[1]
+
+        faltantes = [key for key in ps_keys if key not in retratos]
+        if faltantes:
             body = {
                 "appkey": self.appkey,
-                "token": self.token_cache,
-                "curPage": 1,
-                "size": 10,
-                "ps_id": str(plant_id),
-                "device_type_list": [1],
-                "lang": "_pt_BR"
+                "device_type": 1,
+                "point_id_list": perfis_pontos[perfil],
+                "ps_key_list": faltantes
             }
+            res = self._post_with_auth(self.base_url + "getDeviceRealTimeData", body)
+            if res is None or res.status_code != 200:
+                raise Exception("Erro ao buscar dados técnicos dos inversores.")
 
-            res = self._post_with_auth(url, body)
-            data_device = res.json()
-            inversores = data_device.get("result_data", {}).get("pageList", [])
-
-            if not inversores:
-                raise ValueError("Nenhum inversor encontrado para essa usina.")
-
-            ps_key = [inv.get("ps_key") for inv in inversores if inv.get("ps_key")]
-            print(ps_key)
-            if not ps_key:
-                raise ValueError("ps_key não encontrado no inversor.")          
-            
+            res_json = res.json()
+            dados = res_json["result_data"]["device_point_list"]
+            for item in dados:
+                dp = item["device_point"]
+                legivel = traduzir_ponto(dp)
+                key = dp.get("ps_key")
+                if key:
+                    retratos[key] = legivel
+                    _snapshots_tempo_real[(key, perfil)] = (agora, legivel)
+
+        device_points_legiveis = [retratos[key] for key in ps_keys if key in retratos]
+        return {
+            "dados": device_points_legiveis}
+    
+    def listar_alarmes_pagina(self, process_status: str, pagina: int, size: int = 200, plant_id: int = None):
+        """Uma página do getFaultAlarmInfo. Retorna (alarmes, total de registros)."""
         body = {
             "appkey": self.appkey,
-            "token": self.token_cache,
-            "device_type":1,
-            "point_id_list": ["6", "8", "10", "24", "46", "48", "50", "52", "54", "56", "58", "7451", "7452", "5", "7", "9", "45", "47", "49", "51", "53", "55", "57", "7401", "7402", "18", "19", "20", "21", "22", "23", "27", "4", "96", "97", "98", "99", "100", "101", "102", "103", "104", "105", "106", "107", "108", "109", "110", "111", "112", "113", "7166", "7167", "7168", "7169", "7170", "7171", "70", "71", "72", "73", "74", "75", "76", "77", "78", "79", "80", "81", "82", "83", "84", "85", "92", "93", "313", "314", "315", "316", "317", "318"],
-            "ps_key_list": ps_key
+            "fault_type": "1,2,3,4",
+            "fault_level": "1,2,3,4",
+            "curPage": pagina,
+            "size": size,
+            "share_type": "0,1,2",
+            "process_status": process_status,
+            "lang": "_pt_BR"
         }
-        res = requests.post(
-            self.base_url + "getDeviceRealTimeData",
-            json=body,
-            headers=self.headers
-        )
+        if plant_id:
+            body["ps_id"] = plant_id
 
-        res_json = res.json()
-        dados = res_json["result_data"]["device_point_list"]
-        device_points = [item["device_point"] for item in dados]
+        res = self._post_with_auth(self.base_url + "getFaultAlarmInfo", body)
+        if res is None or res.status_code != 200:
+            raise Exception(f"Erro ao buscar alarmes (status {process_status}, página {pagina})")
+
+        result_data = res.json().get("result_data") or {}
+        return result_data.get("pageList", []), result_data.get("rowCount", 0)
 
-        device_points_legiveis = [
-            {ponto_legivel.get(k, k): v for k, v in dp.items() if v is not None}
-            for dp in device_points
-        ]
-        return {
-            "dados": device_points_legiveis}
-    
     def get_alarmes_atuais(self, plant_id: int):
-        if not self.token_cache:
-            self._obter_token()
+        self._token_valido()
 
         if not self.usinas_cache:
             self.get_usinas()
@@ -979,8 +967,7 @@ class ApiSolarCloud:
         return {"alarmes_atuais": alarmes}
 
     def get_alarmes_historico(self, plant_id: int):
-        if not self.token_cache:
-            self._obter_token()
+        self._token_valido()
 
         if not self.usinas_cache:
             self.get_usinas()
@@ -1007,8 +994,7 @@ class ApiSolarCloud:
         return {"alarmes_historicos": historico}
     
     def get_todos_alarmes_atuais(self):
-        if not self.token_cache:
-            self._obter_token()
+        self._token_valido()
         if not self.usinas_cache:
             self.get_usinas()
 
@@ -1032,8 +1018,7 @@ class ApiSolarCloud:
         return {"alarmes": alarmes}
 
     def get_todos_alarmes_historico(self):
-        if not self.token_cache:
-            self._obter_token()
+        self._token_valido()
         if not self.usinas_cache:
             self.get_usinas()
 
@@ -0,0 +1,118 @@
+from clients.excessions import FabricanteIndisponivel
+import threading
+import random
+import time
+import os
+
+# failCodes do FusionSolar que indicam limite de frequência de chamadas
+FAILCODES_LIMITE = {407}  # ACCESS_FREQUENCY_IS_TOO_HIGH
+
+# Intervalo entre chamadas de uma mesma interface/conta, ajustado conforme as respostas
+INTERVALO_MINIMO = float(os.getenv("FUSIONSOLAR_INTERVALO_MIN_S", 1))
+INTERVALO_MAXIMO = float(os.getenv("FUSIONSOLAR_INTERVALO_MAX_S", 300))
+MAX_TENTATIVAS = int(os.getenv("FUSIONSOLAR_MAX_TENTATIVAS", 6))
+# Espera total máxima de uma chamada na fila antes de desistir com FabricanteIndisponivel
+ESPERA_MAXIMA = float(os.getenv("FUSIONSOLAR_ESPERA_MAX_S", 120))
+
+
+class _Fila:
+    def __init__(self):
+        self.lock = threading.Lock()  # protege o estado da fila; nunca é mantido durante a espera
+        self.intervalo = INTERVALO_MINIMO
+        self.proxima = 0.0  # instante (monotonic) liberado para a próxima chamada
+        self.aguardando = 0
+
+
+class LimitadorFusionSolar:
+    """
+    Enfileira as chamadas ao FusionSolar por conta e por interface. Cada fila
+    reserva horários de saída espaçados por um intervalo que dobra quando o
+    fabricante responde com limite de frequência e volta a cair a cada
+    resposta normal, convergindo para o ritmo máximo aceito pela conta.
+    """
+
+    def __init__(self):
+        self._filas = {}  # (conta, interface) -> _Fila
+        self._lock = threading.Lock()
+
+    def _fila(self, conta, interface: str) -> _Fila:
+        with self._lock:
+            return self._filas.setdefault((conta, interface), _Fila())
+
+    @staticmethod
+    def _limitado(response) -> bool:
+        if response.status_code == 429:
+            return True
+        if response.status_code != 200:
+            return False
+        try:
+            return response.json().get("failCode") in FAILCODES_LIMITE
+        except ValueError:
+            return False
+
+    def _reservar(self, fila: _Fila, prazo: float, conta, interface: str) -> float:
+        """
+        Reserva o próximo horário de saída da fila e devolve quanto esperar
+        por ele. Levanta FabricanteIndisponivel se o horário passar do `prazo`.
+        """
+        with fila.lock:
+            agora = time.monotonic()
+            saida = max(agora, fila.proxima)
+            if saida > prazo:
+                raise FabricanteIndisponivel(
+                    f"FusionSolar limitando {interface} (conta {conta}): "
+                    f"próxima vaga em {saida - agora:.0f}s, além da espera máxima de {ESPERA_MAXIMA:.0f}s"
+                )
+            fila.proxima = saida + fila.intervalo
+            return saida - agora
+
+    def executar(self, conta, interface: str, chamada):
+        """
+        Executa `chamada()` (que devolve a response) respeitando a fila de
+        `interface` para a `conta`. A espera acontece fora do lock da fila e
+        soma no máximo ESPERA_MAXIMA. Repete com recuo enquanto a resposta for
+        de limite de frequência; esgotadas as MAX_TENTATIVAS (ou o prazo),
+        levanta FabricanteIndisponivel.
+        """
+        fila = self._fila(conta, interface)
+        prazo = time.monotonic() + ESPERA_MAXIMA
+        with self._lock:
+            fila.aguardando += 1
+
+        try:
+            for tentativa in range(1, MAX_TENTATIVAS + 1):
+                espera = self._reservar(fila, prazo, conta, interface)
+                if espera > 0:
+                    time.sleep(espera)
+
+                response = chamada()
+
+                with fila.lock:
+                    if not self._limitado(response):
+                        fila.intervalo = max(INTERVALO_MINIMO, fila.intervalo * 0.8)
+                        return response
+
+                    fila.intervalo = min(INTERVALO_MAXIMO, fila.intervalo * 2)
+                    fila.proxima = max(fila.proxima, time.monotonic() + fila.intervalo * random.uniform(1.0, 1.2))
+                print(f"⏳ [Huawei] Limite de frequência em {interface} (conta {conta}), "
+                      f"tentativa {tentativa}/{MAX_TENTATIVAS}. Próxima em {fila.intervalo:.0f}s, "
+                      f"{fila.aguardando - 1} chamada(s) na fila.")
+
+            raise FabricanteIndisponivel(
+                f"FusionSolar limitando {interface} (conta {conta}) após {MAX_TENTATIVAS} tentativas"
+            )
+        finally:
+            with self._lock:
+                fila.aguardando -= 1
+
+    def profundidade_fila(self, conta=None) -> dict:
+        """Chamadas em andamento ou aguardando, por conta e interface: {(conta, interface): n}."""
+        with self._lock:
+            return {
+                chave: fila.aguardando
+                for chave, fila in self._filas.items()
+                if conta is None or chave[0] == conta
+            }
+
+
+limitador_fusionsolar = LimitadorFusionSolar()
@@ -0,0 +1,126 @@
+import requests
+import threading
+import random
+import time
+import os
+from urllib.parse import urlsplit
+from requests.adapters import HTTPAdapter
+from clients.disjuntor import obter_disjuntor
+from clients.excessions import FabricanteIndisponivel
+from clients import gravacao
+
+# Tamanho máximo do pool de conexões keep-alive por host de fabricante
+POOL_POR_HOST = int(os.getenv("VENDOR_POOL_POR_HOST", 32))
+
+# Timeouts (conexão, leitura) aplicados a toda chamada que não informar o seu
+TIMEOUT_PADRAO = (
+    float(os.getenv("VENDOR_TIMEOUT_CONEXAO_S", 5)),
+    float(os.getenv("VENDOR_TIMEOUT_LEITURA_S", 30)),
+)
+
+# Retentativas em erros transitórios (5xx, timeout, conexão, códigos de erro do fabricante)
+MAX_TENTATIVAS = int(os.getenv("VENDOR_MAX_TENTATIVAS", 3))
+RECUO_BASE = float(os.getenv("VENDOR_RECUO_BASE_S", 0.5))
+RECUO_MAXIMO = float(os.getenv("VENDOR_RECUO_MAX_S", 8))
+
+_adaptadores = {}
+_lock = threading.Lock()
+
+
+def _prefixo_host(base_url: str) -> str:
+    partes = urlsplit(base_url)
+    return f"{partes.scheme}://{partes.netloc}/"
+
+
+def codigos_de_erro(campo: str, codigos) -> callable:
+    """Predicado que marca como transitória a resposta JSON cujo `campo` esteja em `codigos`."""
+    codigos = {str(c).strip() for c in codigos if str(c).strip()}
+
+    def transitoria(response) -> bool:
+        if not codigos:
+            return False
+        try:
+            return str(response.json().get(campo)) in codigos
+        except (ValueError, AttributeError):
+            return False
+
+    return transitoria
+
+
+class SessaoResiliente(requests.Session):
+    """
+    Session com timeout padrão, retentativa com recuo exponencial e jitter em
+    erros transitórios, e disjuntor por integração: depois de falhas seguidas
+    as chamadas falham na hora com FabricanteIndisponivel, sem ocupar a thread.
+    """
+
+    def __init__(self, nome_disjuntor: str, erro_transitorio=None):
+        super().__init__()
+        self.disjuntor = obter_disjuntor(nome_disjuntor)
+        self.erro_transitorio = erro_transitorio
+
+    @property
+    def indisponivel(self) -> bool:
+        return self.disjuntor.aberto
+
+    def _transitoria(self, response) -> bool:
+        if response.status_code >= 500:
+            return True
+        return bool(self.erro_transitorio and self.erro_transitorio(response))
+
+    def request(self, method, url, *args, **kwargs):
+        if not self.disjuntor.permitir():
+            raise FabricanteIndisponivel(f"{self.disjuntor.nome} indisponível, chamada a {url} recusada")
+
+        kwargs.setdefault("timeout", TIMEOUT_PADRAO)
+        response, erro = None, None
+        sucesso = False
+
+        # Toda saída registra sucesso ou falha: se a chamada de teste do disjuntor
+        # escapar por qualquer exceção, ele não pode ficar preso em "testando"
+        try:
+            for tentativa in range(1, MAX_TENTATIVAS + 1):
+                try:
+                    response, erro = super().request(method, url, *args, **kwargs), None
+                    if not self._transitoria(response):
+                        sucesso = True
+                        return response
+                except requests.RequestException as e:
+                    response, erro = None, e
+
+                if tentativa < MAX_TENTATIVAS:
+                    espera = random.uniform(0, min(RECUO_MAXIMO, RECUO_BASE * 2 ** (tentativa - 1)))
+                    print(f"🔁 Erro transitório em {url} (tentativa {tentativa}/{MAX_TENTATIVAS}), nova tentativa em {espera:.1f}s")
+                    time.sleep(espera)
+
+            if erro is not None:
+                raise erro
+            return response
+        finally:
+            if sucesso:
+                self.disjuntor.registrar_sucesso()
+            else:
+                self.disjuntor.registrar_falha()
+
+
+def criar_sessao(base_url: str, integracao_id: int = None, erro_transitorio=None) -> SessaoResiliente:
+    """
+    Cria uma SessaoResiliente cujo adaptador HTTP é compartilhado por host.
+    Todas as instâncias de um mesmo fabricante reaproveitam as mesmas conexões
+    keep-alive, limitadas a POOL_POR_HOST conexões simultâneas. O disjuntor é
+    um por integração (ou por host, quando a integração não é informada).
+    """
+    prefixo = _prefixo_host(base_url)
+
+    with _lock:
+        adaptador = _adaptadores.get(prefixo)
+        if adaptador is None:
+            adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_POR_HOST, pool_block=True)
+            if gravacao.MODO in ("gravar", "reproduzir"):
+                adaptador = gravacao.AdaptadorGravacao(adaptador, gravacao.MODO)
+            _adaptadores[prefixo] = adaptador
+
+    nome = f"{urlsplit(base_url).netloc}:{integracao_id}" if integracao_id is not None else urlsplit(base_url).netloc
+    sessao = SessaoResiliente(nome, erro_transitorio)
+    sessao.mount(prefixo, adaptador)
+    return sessao
@@ -0,0 +1,116 @@
+from sqlalchemy import text
+from database import SessionLocal
+from modelos import Integracao
+from datetime import datetime, timedelta
+import threading
+import zlib
+import os
+
+# Antecedência com que um token é renovado em segundo plano antes de expirar
+MARGEM_RENOVACAO = timedelta(minutes=int(os.getenv("TOKEN_MARGEM_RENOVACAO_MIN", 10)))
+
+
+class TokenBroker:
+    """
+    Guarda em memória os tokens de todas as integrações (Sungrow, Deye, Huawei)
+    e garante um único login por vez para cada integração: dentro do worker via
+    lock e entre workers via advisory lock do Postgres. Tokens próximos de
+    expirar são renovados em segundo plano enquanto o atual continua em uso.
+    """
+
+    def __init__(self):
+        self._tokens = {}  # integracao_id -> {"token": str, "obtido_em": datetime, "validade": timedelta}
+        self._locks = {}
+        self._lock = threading.Lock()
+        self._renovando = set()
+
+    def _lock_da_integracao(self, integracao_id: int) -> threading.Lock:
+        with self._lock:
+            return self._locks.setdefault(integracao_id, threading.Lock())
+
+    @staticmethod
+    def _chave_advisory(integracao_id: int) -> int:
+        return zlib.crc32(f"token_broker:{integracao_id}".encode())
+
+    def obter_token(self, integracao_id: int, validade: timedelta, login) -> str:
+        """
+        Retorna um token válido para a integração. `login(db, integracao)` faz o
+        login no fabricante e devolve o novo token; só é chamado quando nenhum
+        processo tem um token válido.
+        """
+        entrada = self._tokens.get(integracao_id)
+        if entrada:
+            idade = datetime.utcnow() - entrada["obtido_em"]
+            if idade < validade:
+                if idade > validade - MARGEM_RENOVACAO:
+                    self._renovar_em_segundo_plano(integracao_id, validade, login)
+                return entrada["token"]
+
+        return self.renovar(integracao_id, validade, login)
+
+    def renovar(self, integracao_id: int, validade: timedelta, login, token_invalido: str = None,
+                proativo: bool = False) -> str:
+        """Renova o token (single-flight). `token_invalido` é descartado mesmo que ainda pareça válido."""
+        with self._lock_da_integracao(integracao_id):
+            limite = validade - MARGEM_RENOVACAO if proativo else validade
+
+            # Outra thread pode ter renovado enquanto esperávamos o lock
+            entrada = self._tokens.get(integracao_id)
+            if entrada and entrada["token"] != token_invalido and datetime.utcnow() - entrada["obtido_em"] < limite:
+                return entrada["token"]
+
+            db = SessionLocal()
+            try:
+                # Lock entre workers, liberado no commit/rollback da transação
+                db.execute(text("SELECT pg_advisory_xact_lock(:chave)"), {"chave": self._chave_advisory(integracao_id)})
+                integracao = db.get(Integracao, integracao_id)
+                if integracao is None:
+                    raise Exception(f"❌ Integração {integracao_id} não encontrada.")
+
+                agora = datetime.utcnow()
+                if (
+                    integracao.token_acesso
+                    and integracao.token_acesso != token_invalido
+                    and integracao.token_updated_at
+                    and agora - integracao.token_updated_at < limite
+                ):
+                    print(f"♻️ Outro processo já renovou o token da integração {integracao_id}.")
+                    token, obtido_em = integracao.token_acesso, integracao.token_updated_at
+                    db.rollback()
+                else:
+                    print(f"🔑 Obtendo novo token para integração {integracao_id} ({integracao.plataforma})")
+                    token = login(db, integracao)
+                    if not token:
+                        raise Exception(f"❌ Falha ao obter novo token da integração {integracao_id}.")
+                    obtido_em = datetime.utcnow()
+                    integracao.token_acesso = token
+                    integracao.token_updated_at = obtido_em
+                    db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+
+            self._tokens[integracao_id] = {"token": token, "obtido_em": obtido_em, "validade": validade}
+            return token
+
+    def _renovar_em_segundo_plano(self, integracao_id: int, validade: timedelta, login):
+        with self._lock:
+            if integracao_id in self._renovando:
+                return
+            self._renovando.add(integracao_id)
+
+        def tarefa():
+            try:
+                self.renovar(integracao_id, validade, login, proativo=True)
+            except Exception as e:
+                print(f"❌ Erro ao renovar token da integração {integracao_id} em segundo plano: {e}")
+            finally:
+                with self._lock:
+                    self._renovando.discard(integracao_id)
+
+        threading.Thread(target=tarefa, daemon=True).start()
+
+
+token_broker = TokenBroker()
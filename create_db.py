@@ -1,4 +1,24 @@
+from sqlalchemy import text
 from database import Base, engine
 from modelos import Base
+from models.device_catalog import DeviceCatalog
+from models.generation_history import GenerationHistory
+from models.vendor_alarm import VendorAlarm, AlarmSyncState
+from models.performance_cache import PerformanceCache
+from models.daily_generation import DailyGeneration
 
 Base.metadata.create_all(bind=engine)
+
+# performance_cache passou de uma lista JSON por (cliente, tipo) para uma linha por usina.
+# As linhas antigas (plant_id nulo) são só cache e voltam no próximo cálculo.
+with engine.begin() as conn:
+    conn.execute(text("ALTER TABLE performance_cache ALTER COLUMN plant_id TYPE VARCHAR USING plant_id::varchar"))
+    conn.execute(text("DELETE FROM performance_cache WHERE plant_id IS NULL"))
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_performance_cache_cliente_tipo_plant "
+        "ON performance_cache (cliente_id, tipo, plant_id)"
+    ))
+
+# daily_generation: energia_kwh nulo marca dia já consultado sem dado no fabricante.
+with engine.begin() as conn:
+    conn.execute(text("ALTER TABLE daily_generation ALTER COLUMN energia_kwh DROP NOT NULL"))
@@ -109,3 +109,35 @@ ponto_legivel = {
     "communication_dev_sn": "serial_comunicacao",
     "dev_fault_status": "codigo_falha"
 }
+
+
+# Perfis de pontos para getDeviceRealTimeData: cada tela pede só o que exibe
+perfis_pontos = {
+    "summary": ["24", "4", "27"],
+    "mppt": [
+        "5", "7", "9", "45", "47", "49", "51", "53", "55", "57", "7401", "7402",
+        "6", "8", "10", "46", "48", "50", "52", "54", "56", "58", "7451", "7452",
+    ],
+    "strings": [
+        "96", "97", "98", "99", "100", "101", "102", "103", "104", "105", "106", "107",
+        "108", "109", "110", "111", "112", "113", "7166", "7167", "7168", "7169", "7170", "7171",
+        "70", "71", "72", "73", "74", "75", "76", "77", "78", "79", "80", "81",
+        "82", "83", "84", "85", "92", "93", "313", "314", "315", "316", "317", "318",
+    ],
+    "grid": ["18", "19", "20", "21", "22", "23", "27", "24"],
+    "completo": [
+        "6", "8", "10", "24", "46", "48", "50", "52", "54", "56", "58", "7451", "7452",
+        "5", "7", "9", "45", "47", "49", "51", "53", "55", "57", "7401", "7402",
+        "18", "19", "20", "21", "22", "23", "27", "4",
+        "96", "97", "98", "99", "100", "101", "102", "103", "104", "105", "106", "107",
+        "108", "109", "110", "111", "112", "113", "7166", "7167", "7168", "7169", "7170", "7171",
+        "70", "71", "72", "73", "74", "75", "76", "77", "78", "79", "80", "81",
+        "82", "83", "84", "85", "92", "93", "313", "314", "315", "316", "317", "318",
+    ],
+}
+
+
+def traduzir_ponto(device_point: dict) -> dict:
+    """Troca os códigos pN / campos do device_point pelos nomes legíveis, descartando valores nulos."""
+    get = ponto_legivel.get
+    return {get(k, k): v for k, v in device_point.items() if v is not None}
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, UniqueConstraint, Index
+from database import Base
+import datetime
+
+class DailyGeneration(Base):
+    __tablename__ = "daily_generation"
+    __table_args__ = (
+        UniqueConstraint("cliente_id", "fabricante", "plant_id", "data", name="uq_daily_generation_usina_data"),
+        Index("ix_daily_generation_cliente_data", "cliente_id", "data"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    cliente_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    fabricante = Column(String, nullable=False)  # sungrow / deye / huawei / hypontech
+    plant_id = Column(String, nullable=False)
+    data = Column(Date, nullable=False)
+    energia_kwh = Column(Float, nullable=True)  # nulo: dia já consultado, sem dado no fabricante
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
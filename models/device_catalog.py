@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from database import Base
+import datetime
+
+class DeviceCatalog(Base):
+    __tablename__ = "device_catalog"
+    __table_args__ = (
+        UniqueConstraint("integracao_id", "ps_key", name="uq_device_catalog_integracao_ps_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    integracao_id = Column(Integer, ForeignKey("integracoes.id", ondelete="CASCADE"), nullable=False, index=True)
+    ps_id = Column(String, nullable=False, index=True)
+    ps_key = Column(String, nullable=False)
+    device_type = Column(Integer, nullable=True)
+    device_sn = Column(String, nullable=True)
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
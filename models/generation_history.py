@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, JSON, ForeignKey, UniqueConstraint
+from database import Base
+import datetime
+
+class GenerationHistory(Base):
+    __tablename__ = "generation_history"
+    __table_args__ = (
+        UniqueConstraint("integracao_id", "plant_id", "resolucao", "periodo", name="uq_generation_history_periodo"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    integracao_id = Column(Integer, ForeignKey("integracoes.id", ondelete="CASCADE"), nullable=False)
+    plant_id = Column(String, nullable=False)
+    resolucao = Column(String, nullable=False)  # dia / mes / ano
+    periodo = Column(String, nullable=False)    # YYYY-MM-DD / YYYY-MM / YYYY
+    resultado_json = Column(JSON, nullable=False)
+    fechado = Column(Boolean, default=False)    # período encerrado: não muda mais
+    updated_at = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
@@ -1,13 +1,16 @@
-from sqlalchemy import Column, Integer, String, DateTime, JSON
+from sqlalchemy import Column, Integer, String, DateTime, JSON, Index
 from sqlalchemy.sql import func
 from database import Base
 
 class PerformanceCache(Base):
     __tablename__ = "performance_cache"
+    __table_args__ = (
+        Index("uq_performance_cache_cliente_tipo_plant", "cliente_id", "tipo", "plant_id", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     cliente_id = Column(Integer, nullable=False)
-    plant_id = Column(Integer, nullable=True)
+    plant_id = Column(String, nullable=True)  # ps_id da usina (texto: Huawei usa códigos como "NE=...")
     tipo = Column(String, nullable=False)  # diaria / 7dias / 30dias
-    resultado_json = Column(JSON, nullable=False)
+    resultado_json = Column(JSON, nullable=False)  # resultado de uma única usina
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
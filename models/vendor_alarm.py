@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, ForeignKey, UniqueConstraint, Index
+from database import Base
+import datetime
+
+class VendorAlarm(Base):
+    __tablename__ = "vendor_alarms"
+    __table_args__ = (
+        UniqueConstraint("integracao_id", "fault_id", name="uq_vendor_alarms_integracao_fault"),
+        Index("ix_vendor_alarms_consulta", "integracao_id", "process_status", "ps_id", "fault_level"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    integracao_id = Column(Integer, ForeignKey("integracoes.id", ondelete="CASCADE"), nullable=False)
+    fault_id = Column(String, nullable=False)
+    ps_id = Column(String, nullable=True)
+    ps_key = Column(String, nullable=True)
+    fault_code = Column(String, nullable=True)
+    fault_name = Column(String, nullable=True)
+    fault_level = Column(Integer, nullable=True)
+    process_status = Column(String, nullable=True)  # 8 = atual / 9 = resolvido
+    create_time = Column(DateTime, nullable=True)
+    update_time = Column(DateTime, nullable=True)
+    dados_json = Column(JSON, nullable=False)
+    sincronizado_em = Column(DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+
+
+class AlarmSyncState(Base):
+    __tablename__ = "alarm_sync_state"
+
+    integracao_id = Column(Integer, ForeignKey("integracoes.id", ondelete="CASCADE"), primary_key=True)
+    ultima_sincronizacao = Column(DateTime, nullable=True)
+    ultima_completa = Column(DateTime, nullable=True)
@@ -0,0 +1,186 @@
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects.postgresql import insert
+from models.vendor_alarm import VendorAlarm, AlarmSyncState
+from datetime import datetime, timedelta
+from typing import Optional
+from pytz import timezone
+import os
+
+
+STATUS_ATUAIS = "8"
+STATUS_RESOLVIDOS = "9"
+TAMANHO_PAGINA = 200
+
+# Folga ao comparar com a última sincronização (relógios e atraso do fabricante)
+MARGEM_INCREMENTAL = timedelta(minutes=int(os.getenv("ALARMES_MARGEM_MIN", 60)))
+# Intervalo entre varreduras completas, que corrigem o que a incremental não enxergar
+INTERVALO_COMPLETA = timedelta(hours=int(os.getenv("ALARMES_INTERVALO_COMPLETA_H", 24)))
+
+
+def _agora_brasilia() -> datetime:
+    return datetime.now(timezone("America/Sao_Paulo")).replace(tzinfo=None)
+
+
+def _parse_data(valor) -> Optional[datetime]:
+    if not valor:
+        return None
+    for formato in ("%Y-%m-%d %H:%M:%S", "%Y%m%d%H%M%S", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.strptime(str(valor)[:19], formato)
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_int(valor) -> Optional[int]:
+    try:
+        return int(valor)
+    except (ValueError, TypeError):
+        return None
+
+
+def _fault_id(alarme: dict) -> Optional[str]:
+    fault_id = alarme.get("fault_id") or alarme.get("id") or alarme.get("uuid")
+    if fault_id:
+        return str(fault_id)
+    if alarme.get("ps_key") and alarme.get("fault_code") and alarme.get("create_time"):
+        return f"{alarme['ps_key']}:{alarme['fault_code']}:{alarme['create_time']}"
+    return None
+
+
+def _atualizado_em(alarme: dict) -> Optional[datetime]:
+    return _parse_data(alarme.get("update_time") or alarme.get("process_time") or alarme.get("create_time"))
+
+
+def _gravar(db: Session, integracao_id: int, alarmes: list, status: str):
+    """Upsert dos alarmes de uma página; sem process_status no item, vale o `status` consultado."""
+    linhas = {}
+    for alarme in alarmes:
+        fault_id = _fault_id(alarme)
+        if not fault_id:
+            continue
+        process_status = alarme.get("process_status")
+        linhas[fault_id] = {
+            "integracao_id": integracao_id,
+            "fault_id": fault_id,
+            "ps_id": str(alarme.get("ps_id")) if alarme.get("ps_id") is not None else None,
+            "ps_key": alarme.get("ps_key"),
+            "fault_code": str(alarme.get("fault_code")) if alarme.get("fault_code") is not None else None,
+            "fault_name": alarme.get("fault_name"),
+            "fault_level": _parse_int(alarme.get("fault_level")),
+            "process_status": str(process_status) if process_status is not None else status,
+            "create_time": _parse_data(alarme.get("create_time")),
+            "update_time": _atualizado_em(alarme),
+            "dados_json": alarme,
+            "sincronizado_em": datetime.utcnow(),
+        }
+
+    if not linhas:
+        return
+
+    stmt = insert(VendorAlarm).values(list(linhas.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["integracao_id", "fault_id"],
+        set_={
+            coluna: stmt.excluded[coluna]
+            for coluna in (
+                "ps_id", "ps_key", "fault_code", "fault_name", "fault_level",
+                "process_status", "create_time", "update_time", "dados_json", "sincronizado_em",
+            )
+        },
+    )
+    db.execute(stmt)
+
+
+def _resolver_desaparecidos(db: Session, integracao_id: int, atuais: set) -> int:
+    """
+    Alarmes gravados como atuais que não vieram na varredura completa dos
+    atuais: o fabricante os encerrou sem listá-los entre os resolvidos. Passam
+    a resolvidos para não ficarem abertos para sempre na tabela local.
+    """
+    agora = datetime.utcnow()
+    resolvidos = 0
+    for alarme in db.query(VendorAlarm).filter_by(integracao_id=integracao_id, process_status=STATUS_ATUAIS):
+        if alarme.fault_id in atuais:
+            continue
+        alarme.process_status = STATUS_RESOLVIDOS
+        alarme.dados_json = {**alarme.dados_json, "process_status": int(STATUS_RESOLVIDOS)}
+        alarme.sincronizado_em = agora
+        resolvidos += 1
+    return resolvidos
+
+
+def sincronizar_alarmes(db: Session, api, completo: bool = False) -> int:
+    """
+    Percorre todas as páginas do getFaultAlarmInfo (atuais e resolvidos) e faz
+    upsert na tabela local. Na sincronização incremental a paginação para na
+    primeira página sem nenhum alarme alterado desde a última passada. Na
+    completa, os atuais gravados que sumiram da lista passam a resolvidos.
+    Retorna a quantidade de alarmes recebidos.
+    """
+    integracao_id = api.integracao.id
+    estado = db.get(AlarmSyncState, integracao_id)
+    inicio = _agora_brasilia()
+
+    if not estado or not estado.ultima_completa or inicio - estado.ultima_completa > INTERVALO_COMPLETA:
+        completo = True
+    corte = None if completo else estado.ultima_sincronizacao - MARGEM_INCREMENTAL
+
+    total_recebidos = 0
+    atuais = set()
+    for status in (STATUS_ATUAIS, STATUS_RESOLVIDOS):
+        pagina = 1
+        while True:
+            alarmes, total = api.listar_alarmes_pagina(status, pagina, TAMANHO_PAGINA)
+            if not alarmes:
+                break
+
+            _gravar(db, integracao_id, alarmes, status)
+            total_recebidos += len(alarmes)
+            if status == STATUS_ATUAIS:
+                atuais.update(_fault_id(a) for a in alarmes)
+
+            if corte:
+                datas = [_atualizado_em(a) for a in alarmes]
+                if all(d is not None and d < corte for d in datas):
+                    break
+
+            if pagina * TAMANHO_PAGINA >= (total or 0):
+                break
+            pagina += 1
+
+    if completo:
+        desaparecidos = _resolver_desaparecidos(db, integracao_id, atuais)
+        if desaparecidos:
+            print(f"🚨 {desaparecidos} alarme(s) da integração {integracao_id} sumiram dos atuais e foram dados como resolvidos")
+
+    if not estado:
+        estado = AlarmSyncState(integracao_id=integracao_id)
+        db.add(estado)
+    estado.ultima_sincronizacao = inicio
+    if completo:
+        estado.ultima_completa = inicio
+    db.commit()
+
+    print(f"🚨 Alarmes sincronizados para integração {integracao_id}: {total_recebidos} ({'completa' if completo else 'incremental'})")
+    return total_recebidos
+
+
+def ja_sincronizado(db: Session, integracao_id: int) -> bool:
+    estado = db.get(AlarmSyncState, integracao_id)
+    return bool(estado and estado.ultima_sincronizacao)
+
+
+def listar_alarmes(db: Session, integracao_id: int, process_status: str, ps_id=None,
+                   fault_level: Optional[int] = None) -> list:
+    query = db.query(VendorAlarm).filter(
+        VendorAlarm.integracao_id == integracao_id,
+        VendorAlarm.process_status == process_status,
+    )
+    if ps_id is not None:
+        query = query.filter(VendorAlarm.ps_id == str(ps_id))
+    if fault_level is not None:
+        query = query.filter(VendorAlarm.fault_level == fault_level)
+
+    alarmes = query.order_by(VendorAlarm.create_time.desc()).all()
+    return [a.dados_json for a in alarmes]
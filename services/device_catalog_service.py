@@ -0,0 +1,151 @@
+from sqlalchemy.orm import Session
+from models.device_catalog import DeviceCatalog
+from database import SessionLocal
+from clients.fanout import executar_em_paralelo
+from datetime import datetime, timedelta
+import threading
+import os
+
+
+# Índice em memória: (integracao_id, ps_id) -> {"dispositivos": [...], "atualizado_em": datetime}
+_indice = {}
+_integracoes_carregadas = set()
+_em_atualizacao = set()
+_lock = threading.Lock()
+
+CATALOGO_TTL = timedelta(seconds=int(os.getenv("CATALOGO_TTL_SEGUNDOS", 6 * 3600)))
+
+
+def _carregar_do_banco(db: Session, integracao_id: int):
+    """Carrega o catálogo persistido da integração uma única vez por processo."""
+    if integracao_id in _integracoes_carregadas:
+        return
+
+    linhas = db.query(DeviceCatalog).filter_by(integracao_id=integracao_id).all()
+
+    with _lock:
+        if integracao_id in _integracoes_carregadas:
+            return
+        for linha in linhas:
+            entrada = _indice.setdefault((integracao_id, linha.ps_id), {
+                "dispositivos": [],
+                "atualizado_em": linha.updated_at or datetime.min,
+            })
+            entrada["dispositivos"].append({
+                "ps_key": linha.ps_key,
+                "device_type": linha.device_type,
+                "device_sn": linha.device_sn,
+            })
+            if linha.updated_at and linha.updated_at < entrada["atualizado_em"]:
+                entrada["atualizado_em"] = linha.updated_at
+        _integracoes_carregadas.add(integracao_id)
+
+    print(f"📚 Catálogo de dispositivos carregado para integração {integracao_id}: {len(linhas)} dispositivos")
+
+
+def _salvar(db: Session, integracao_id: int, ps_id: str, dispositivos: list):
+    agora = datetime.utcnow()
+    try:
+        db.query(DeviceCatalog).filter_by(integracao_id=integracao_id, ps_id=ps_id).delete()
+        for d in dispositivos:
+            db.add(DeviceCatalog(
+                integracao_id=integracao_id,
+                ps_id=ps_id,
+                ps_key=d["ps_key"],
+                device_type=d.get("device_type"),
+                device_sn=d.get("device_sn"),
+                updated_at=agora,
+            ))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erro ao salvar catálogo da usina {ps_id}: {e}")
+
+    with _lock:
+        _indice[(integracao_id, ps_id)] = {"dispositivos": dispositivos, "atualizado_em": agora}
+
+
+def _atualizar(db: Session, integracao_id: int, ps_id: str, buscar) -> list:
+    try:
+        dispositivos = buscar(ps_id)
+    except Exception as e:
+        print(f"❌ Erro ao atualizar catálogo da usina {ps_id}: {e}")
+        return []
+
+    if dispositivos:
+        _salvar(db, integracao_id, ps_id, dispositivos)
+    return dispositivos
+
+
+def _atualizar_em_segundo_plano(integracao_id: int, ps_id: str, buscar):
+    chave = (integracao_id, ps_id)
+    with _lock:
+        if chave in _em_atualizacao:
+            return
+        _em_atualizacao.add(chave)
+
+    def tarefa():
+        db = SessionLocal()
+        try:
+            _atualizar(db, integracao_id, ps_id, buscar)
+        finally:
+            db.close()
+            with _lock:
+                _em_atualizacao.discard(chave)
+
+    threading.Thread(target=tarefa, daemon=True).start()
+
+
+def obter_dispositivos(db: Session, integracao_id: int, ps_id, buscar) -> list:
+    """
+    Retorna os dispositivos da usina a partir do catálogo local.
+    `buscar(ps_id)` consulta o fabricante e só é chamado quando a usina não está
+    no catálogo (de forma síncrona) ou quando a entrada passou do TTL (em segundo plano).
+    """
+    ps_id = str(ps_id)
+    _carregar_do_banco(db, integracao_id)
+
+    entrada = _indice.get((integracao_id, ps_id))
+    if not entrada or not entrada["dispositivos"]:
+        print(f"🔎 Usina {ps_id} fora do catálogo, consultando fabricante...")
+        return _atualizar(db, integracao_id, ps_id, buscar)
+
+    if datetime.utcnow() - entrada["atualizado_em"] > CATALOGO_TTL:
+        _atualizar_em_segundo_plano(integracao_id, ps_id, buscar)
+
+    return entrada["dispositivos"]
+
+
+def obter_ps_keys(db: Session, integracao_id: int, ps_id, buscar) -> list:
+    return [d["ps_key"] for d in obter_dispositivos(db, integracao_id, ps_id, buscar)]
+
+
+def obter_ps_keys_em_lote(db: Session, integracao_id: int, ps_ids: list, buscar, max_concorrencia: int = 8) -> list:
+    """
+    Versão em lote de obter_ps_keys: as usinas fora do catálogo são consultadas
+    no fabricante em paralelo e gravadas em seguida, na thread chamadora.
+    Retorna uma lista de ps_keys para cada ps_id, na mesma ordem.
+    """
+    ps_ids = [str(ps_id) for ps_id in ps_ids]
+    _carregar_do_banco(db, integracao_id)
+
+    faltantes = []
+    for ps_id in ps_ids:
+        entrada = _indice.get((integracao_id, ps_id))
+        if not entrada or not entrada["dispositivos"]:
+            faltantes.append(ps_id)
+        elif datetime.utcnow() - entrada["atualizado_em"] > CATALOGO_TTL:
+            _atualizar_em_segundo_plano(integracao_id, ps_id, buscar)
+
+    if faltantes:
+        print(f"🔎 {len(faltantes)} usinas fora do catálogo, consultando fabricante...")
+        buscados = executar_em_paralelo(buscar, faltantes, max_concorrencia)
+        for ps_id, dispositivos in zip(faltantes, buscados):
+            if dispositivos:
+                _salvar(db, integracao_id, ps_id, dispositivos)
+
+    resultado = []
+    for ps_id in ps_ids:
+        entrada = _indice.get((integracao_id, ps_id))
+        resultado.append([d["ps_key"] for d in entrada["dispositivos"]] if entrada else [])
+    return resultado
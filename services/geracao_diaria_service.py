@@ -0,0 +1,207 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from models.daily_generation import DailyGeneration
+from clients.adaptadores import adaptar
+from datetime import datetime, timedelta, date
+from pytz import timezone
+import traceback
+import asyncio
+import os
+
+
+# Dias buscados na primeira carga de um fabricante (ou quando o buraco no livro é maior que isso)
+DIAS_BACKFILL = int(os.getenv("GERACAO_DIARIA_BACKFILL_DIAS", 30))
+
+# Janelas usadas no cálculo de performance, em dias terminando ontem
+JANELAS_PERFORMANCE = {"diaria": 1, "7dias": 7, "30dias": 30}
+
+
+def _ontem() -> date:
+    return (datetime.now(timezone("America/Sao_Paulo")) - timedelta(days=1)).date()
+
+
+def _ps_id(plant_id: str):
+    """ps_id no tipo em que os fabricantes o entregam: numérico quando possível."""
+    return int(plant_id) if plant_id.isdigit() else plant_id
+
+
+def _dias_da_janela(ontem: date) -> list:
+    primeiro = ontem - timedelta(days=DIAS_BACKFILL - 1)
+    return [primeiro + timedelta(days=n) for n in range(DIAS_BACKFILL)]
+
+
+def periodo_pendente(gravados: dict, plant_ids, ontem: date):
+    """
+    (inicio, fim) a pedir ao fabricante para cobrir todos os dias sem linha no
+    livro, usina a usina, dentro dos últimos DIAS_BACKFILL dias; None se nada
+    falta. `gravados` é {plant_id: {datas gravadas}} e `plant_ids` as usinas
+    atuais da conta: usina nova (sem nenhuma linha) entra com a janela inteira.
+    """
+    dias = _dias_da_janela(ontem)
+    usinas = {str(p) for p in plant_ids} | set(gravados)
+    if not usinas:
+        return dias[0], ontem
+
+    faltantes = [dia for usina in usinas for dia in dias if dia not in gravados.get(usina, ())]
+    if not faltantes:
+        return None
+    return min(faltantes), ontem
+
+
+def _dias_gravados(db: Session, cliente_id: int, fabricante: str, ontem: date) -> dict:
+    """{plant_id: {datas}} já gravadas do fabricante dentro da janela de backfill."""
+    linhas = (
+        db.query(DailyGeneration.plant_id, DailyGeneration.data)
+        .filter(
+            DailyGeneration.cliente_id == cliente_id,
+            DailyGeneration.fabricante == fabricante,
+            DailyGeneration.data >= _dias_da_janela(ontem)[0],
+            DailyGeneration.data <= ontem,
+        )
+        .all()
+    )
+    gravados = {}
+    for plant_id, data in linhas:
+        gravados.setdefault(plant_id, set()).add(data)
+    return gravados
+
+
+def marcar_dias_sem_dado(por_usina: dict, gravados: dict, inicio: date, ontem: date) -> dict:
+    """
+    Completa com None (dia consultado, sem dado no fabricante) os dias de
+    `inicio` até anteontem que a usina respondeu sem valor e que ainda não têm
+    linha no livro, para que não voltem a ser pedidos a cada execução. Ontem
+    fica de fora: o fabricante pode só não ter consolidado o dia ainda.
+    """
+    marcados = {}
+    for ps_id, dias in por_usina.items():
+        ja_gravados = gravados.get(str(ps_id), ())
+        completos = dict(dias)
+        dia = inicio
+        while dia < ontem:
+            if dia not in completos and dia not in ja_gravados:
+                completos[dia] = None
+            dia += timedelta(days=1)
+        marcados[ps_id] = completos
+    return marcados
+
+
+def _gravar(db: Session, cliente_id: int, fabricante: str, por_usina: dict) -> int:
+    """Grava os dias de `por_usina`; None vira a marca de dia sem dado, que nunca apaga um valor."""
+    agora = datetime.utcnow()
+    linhas = [
+        {
+            "cliente_id": cliente_id,
+            "fabricante": fabricante,
+            "plant_id": str(ps_id),
+            "data": data,
+            "energia_kwh": round(float(kwh), 3) if kwh is not None else None,
+            "updated_at": agora,
+        }
+        for ps_id, dias in por_usina.items()
+        if ps_id is not None
+        for data, kwh in dias.items()
+    ]
+    if not linhas:
+        return 0
+
+    stmt = insert(DailyGeneration).values(linhas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["cliente_id", "fabricante", "plant_id", "data"],
+        set_={
+            "energia_kwh": func.coalesce(stmt.excluded.energia_kwh, DailyGeneration.energia_kwh),
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    db.execute(stmt)
+    return len(linhas)
+
+
+def atualizar_geracao_diaria(apis, db: Session, cliente_id: int) -> int:
+    """
+    Completa o livro de geração diária do cliente. Para cada fabricante, os
+    dias que faltam são calculados usina a usina (inclusive usinas novas e
+    buracos deixados por falhas), e só o período que os cobre é pedido:
+    normalmente apenas ontem; na primeira vez, os últimos DIAS_BACKFILL dias.
+    Dias que o fabricante respondeu sem dado ficam marcados e não são pedidos
+    de novo. Os fabricantes são consultados ao mesmo tempo. Retorna as linhas
+    gravadas.
+    """
+    ontem = _ontem()
+    adapters = [adaptar(api) for api in apis]
+
+    async def executar(operacao, pedidos):
+        async def chamar(adapter, *args):
+            try:
+                return await getattr(adapter, operacao)(*args)
+            except Exception as e:
+                print(f"❌ Erro em {operacao} de {adapter.plataforma}: {e}")
+                traceback.print_exc()
+                return None
+
+        return await asyncio.gather(*(chamar(adapter, *args) for adapter, args in pedidos))
+
+    # Usinas atuais de cada conta, para que usinas novas também sejam completadas
+    listas = asyncio.run(executar("listar_usinas", [(adapter, ()) for adapter in adapters]))
+
+    pendentes = []
+    for adapter, usinas in zip(adapters, listas):
+        plant_ids = [u.get("ps_id") for u in usinas or [] if u.get("ps_id") is not None]
+        gravados = _dias_gravados(db, cliente_id, adapter.plataforma, ontem)
+        periodo = periodo_pendente(gravados, plant_ids, ontem)
+        if periodo:
+            pendentes.append((adapter, periodo, gravados))
+
+    if not pendentes:
+        print(f"📒 Geração diária do cliente {cliente_id} já está em dia")
+        return 0
+
+    pedidos = [(adapter, periodo) for adapter, periodo, _ in pendentes]
+    gravadas = 0
+    for (adapter, (inicio, fim), gravados), por_usina in zip(pendentes, asyncio.run(executar("geracao_diaria", pedidos))):
+        if not por_usina:
+            continue
+        por_usina = marcar_dias_sem_dado(por_usina, gravados, inicio, ontem)
+        linhas = _gravar(db, cliente_id, adapter.plataforma, por_usina)
+        print(f"📒 {linhas} dia(s) de geração {adapter.plataforma} gravados ({inicio} a {fim})")
+        gravadas += linhas
+
+    db.commit()
+    return gravadas
+
+
+def somar_janelas(db: Session, cliente_id: int, janelas: dict = None, ate: date = None) -> dict:
+    """
+    Soma a geração de cada usina em janelas de N dias terminando em `ate`
+    (ontem, por padrão), todas na mesma consulta. `janelas` é {nome: dias}.
+    Retorna {nome: [{"ps_id", "energia_gerada_kWh"}]}; usinas sem nenhum dia
+    gravado na janela ficam de fora dela.
+    """
+    janelas = janelas or JANELAS_PERFORMANCE
+    ate = ate or _ontem()
+    nomes = list(janelas)
+
+    somas = [
+        func.sum(DailyGeneration.energia_kwh)
+        .filter(DailyGeneration.data > ate - timedelta(days=janelas[nome]))
+        .label(f"janela_{i}")
+        for i, nome in enumerate(nomes)
+    ]
+    linhas = (
+        db.query(DailyGeneration.plant_id, *somas)
+        .filter(
+            DailyGeneration.cliente_id == cliente_id,
+            DailyGeneration.data > ate - timedelta(days=max(janelas.values())),
+            DailyGeneration.data <= ate,
+        )
+        .group_by(DailyGeneration.fabricante, DailyGeneration.plant_id)
+        .all()
+    )
+
+    por_janela = {nome: [] for nome in nomes}
+    for plant_id, *valores in linhas:
+        for nome, valor in zip(nomes, valores):
+            if valor is not None:
+                por_janela[nome].append({"ps_id": _ps_id(plant_id), "energia_gerada_kWh": round(valor, 2)})
+    return por_janela
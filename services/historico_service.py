@@ -0,0 +1,95 @@
+from sqlalchemy.orm import Session
+from models.generation_history import GenerationHistory
+from datetime import datetime, timedelta
+from calendar import monthrange
+from clients.excessions import FabricanteIndisponivel
+from pytz import timezone
+import os
+
+
+# Margem após o fim do período antes de considerá-lo fechado (dados do datalogger podem chegar atrasados)
+MARGEM_FECHAMENTO = timedelta(hours=int(os.getenv("HISTORICO_MARGEM_HORAS", 6)))
+
+
+def fim_do_periodo(resolucao: str, periodo: str) -> datetime:
+    if resolucao == "dia":
+        inicio = datetime.strptime(periodo, "%Y-%m-%d")
+        return inicio + timedelta(days=1)
+    if resolucao == "mes":
+        ano, mes = (int(p) for p in periodo.split("-"))
+        return datetime(ano, mes, monthrange(ano, mes)[1]) + timedelta(days=1)
+    if resolucao == "ano":
+        return datetime(int(periodo) + 1, 1, 1)
+    raise ValueError(f"Resolução inválida: {resolucao}")
+
+
+def periodo_fechado(resolucao: str, periodo: str) -> bool:
+    agora = datetime.now(timezone("America/Sao_Paulo")).replace(tzinfo=None)
+    return agora >= fim_do_periodo(resolucao, periodo) + MARGEM_FECHAMENTO
+
+
+def _tem_dados(resultado) -> bool:
+    if not isinstance(resultado, dict):
+        return False
+    return any(isinstance(v, list) and v for v in resultado.values())
+
+
+def obter_historico(db: Session, integracao_id: int, plant_id, resolucao: str, periodo: str, buscar):
+    """
+    Lê o gráfico de um dia/mês/ano do histórico local. Períodos já encerrados
+    são servidos direto do banco, sem chamar o fabricante; o período ainda
+    aberto é buscado via `buscar()` e gravado de volta. `buscar()` retorna
+    (resultado, completo): um período só é fechado quando todas as
+    requisições ao fabricante deram certo.
+    """
+    plant_id = str(plant_id)
+    registro = (
+        db.query(GenerationHistory)
+        .filter_by(integracao_id=integracao_id, plant_id=plant_id, resolucao=resolucao, periodo=periodo)
+        .first()
+    )
+
+    if registro and registro.fechado:
+        print(f"📦 Histórico {resolucao} {periodo} da usina {plant_id} servido do banco")
+        return registro.resultado_json
+
+    try:
+        resultado, completo = buscar()
+    except FabricanteIndisponivel as e:
+        if registro is None:
+            raise
+        print(f"🔌 {e}. Servindo última versão salva de {resolucao} {periodo} da usina {plant_id}")
+        return registro.resultado_json
+
+    # Resposta vazia (fabricante instável) não sobrescreve um histórico que já tinha dados
+    if registro and not _tem_dados(resultado) and _tem_dados(registro.resultado_json):
+        print(f"⚠️ Fabricante sem dados para {resolucao} {periodo} da usina {plant_id}, mantendo versão salva")
+        return registro.resultado_json
+
+    # Resposta parcial (algum lote falhou) também não substitui uma versão salva com dados
+    if registro and not completo and _tem_dados(registro.resultado_json):
+        print(f"⚠️ Resposta parcial para {resolucao} {periodo} da usina {plant_id}, mantendo versão salva")
+        return registro.resultado_json
+
+    fechado = periodo_fechado(resolucao, periodo) and completo and _tem_dados(resultado)
+
+    try:
+        if registro:
+            registro.resultado_json = resultado
+            registro.fechado = fechado
+            registro.updated_at = datetime.utcnow()
+        else:
+            db.add(GenerationHistory(
+                integracao_id=integracao_id,
+                plant_id=plant_id,
+                resolucao=resolucao,
+                periodo=periodo,
+                resultado_json=resultado,
+                fechado=fechado,
+            ))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        print(f"❌ Erro ao gravar histórico {resolucao} {periodo} da usina {plant_id}: {e}")
+
+    return resultado
@@ -1,66 +1,77 @@
 from sqlalchemy.orm import Session
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert
 from models.monthly_projection import MonthlyProjection
 from datetime import datetime, timedelta
 import calendar
 from models.performance_cache import PerformanceCache
-import json
+import traceback
+from services.geracao_diaria_service import atualizar_geracao_diaria, somar_janelas
+from services.performance_vetorizada import calcular_janela
+
+
+def carregar_projecoes(db: Session, cliente_id: int, periodos) -> dict:
+    """
+    Todas as projeções do cliente nos `periodos` [(ano, mes)] em uma única
+    consulta, indexadas por (plant_id, ano, mes) -> projection_kwh. O
+    plant_id vira str para casar com ps_ids que chegam como texto ou número.
+    """
+    periodos = list(periodos)
+    registros = (
+        db.query(MonthlyProjection.plant_id, MonthlyProjection.year, MonthlyProjection.month, MonthlyProjection.projection_kwh)
+        .filter(
+            MonthlyProjection.cliente_id == cliente_id,
+            tuple_(MonthlyProjection.year, MonthlyProjection.month).in_(periodos),
+        )
+        .order_by(MonthlyProjection.id)
+        .all()
+    )
+    projecoes = {}
+    for plant_id, ano, mes, kwh in registros:
+        projecoes.setdefault((str(plant_id), ano, mes), kwh)
+    return projecoes
 
 
-# Cache global
-_performance_diaria_cache = None
-_performance_diaria_cache_timestamp = None
-_performance_7dias_cache = None
-_performance_7dias_cache_timestamp = None
-_performance_30dias_cache = None
-_performance_30dias_cache_timestamp = None
+def _projecao_do_mes(plant_id, ano: int, mes: int, db: Session, cliente_id: int, projecoes):
+    """kWh projetado da usina no mês, ou None. Sem índice, carrega só o mês pedido."""
+    if projecoes is None:
+        projecoes = carregar_projecoes(db, cliente_id, [(ano, mes)])
+    return projecoes.get((str(plant_id), ano, mes)) or None
+
 
 # Performance diária
-def calcular_performance_diaria(plant_id: int, energia_gerada: float, db: Session, cliente_id: int):
+def calcular_performance_diaria(plant_id: int, energia_gerada: float, db: Session, cliente_id: int, projecoes=None):
     hoje = datetime.now()
     mes = hoje.month
     ano = hoje.year
 
-    projecao = db.query(MonthlyProjection).filter_by(
-        plant_id=plant_id,
-        month=mes,
-        year=ano,
-        cliente_id=cliente_id
-    ).first()
-    print(f"🔍 Buscando projeção para plant_id={plant_id} | mês={mes} | ano={ano} | cliente_id={cliente_id}")
-    print("🔎 Projeção encontrada:", projecao)
-    if projecao:
-        print("➡️ kWh previsto:", projecao.projection_kwh)
-
-    if not projecao or projecao.projection_kwh == 0:
-        print("⚠️ Nenhuma projeção válida encontrada.")
-        return {
-            "plant_id": plant_id,
-            "mes": mes,
-            "dias_do_mes": calendar.monthrange(ano, mes)[1],
-            "gerado_ontem": energia_gerada,
-            "projecao_mensal": None,
-            "media_diaria_proj": None,
-            "performance_percentual": None,
-            "mensagem": "Sem projeção"
-        }
+    dias_do_mes = calendar.monthrange(ano, mes)[1]
+    projecao_kwh = _projecao_do_mes(plant_id, ano, mes, db, cliente_id, projecoes)
+    media_diaria = projecao_kwh / dias_do_mes if projecao_kwh else None
+    performance = energia_gerada / media_diaria if media_diaria else None
+
+    return {
+        "plant_id": plant_id,
+        "mes": mes,
+        "dias_do_mes": dias_do_mes,
+        "gerado_ontem": energia_gerada,
+        "projecao_mensal": projecao_kwh,
+        "media_diaria_proj": round(media_diaria, 2) if media_diaria else None,
+        "performance_percentual": round(performance * 100) if performance is not None else None,
+        "mensagem": "Sem projeção" if not projecao_kwh else None
+    }
 
 
 
 # Performance 7 dias
-def calcular_performance_7dias(plant_id: int, energia_gerada: float, db: Session, cliente_id: int):
+def calcular_performance_7dias(plant_id: int, energia_gerada: float, db: Session, cliente_id: int, projecoes=None):
     hoje = datetime.now()
     mes = hoje.month
     ano = hoje.year
 
-    projecao = db.query(MonthlyProjection).filter_by(
-        plant_id=plant_id,
-        month=mes,
-        year=ano,
-        cliente_id=cliente_id
-    ).first()
-
     dias_do_mes = calendar.monthrange(ano, mes)[1]
-    media_diaria = projecao.projection_kwh / dias_do_mes if projecao and projecao.projection_kwh else None
+    projecao_kwh = _projecao_do_mes(plant_id, ano, mes, db, cliente_id, projecoes)
+    media_diaria = projecao_kwh / dias_do_mes if projecao_kwh else None
     media_7dias = media_diaria * 7 if media_diaria else None
     performance = energia_gerada / media_7dias if media_7dias else None
 
@@ -68,30 +79,23 @@ def calcular_performance_7dias(plant_id: int, energia_gerada: float, db: Session
         "plant_id": plant_id,
         "mes": mes,
         "dias_do_mes": dias_do_mes,
-        "projecao_mensal": projecao.projection_kwh if projecao else None,
+        "projecao_mensal": projecao_kwh,
         "media_7dias_proj": round(media_7dias, 2) if media_7dias else None,
         "gerado_7dias": energia_gerada,
         "performance_percentual": round(performance * 100) if performance is not None else None,
-        "mensagem": "Sem projeção" if not projecao or projecao.projection_kwh == 0 else None
+        "mensagem": "Sem projeção" if not projecao_kwh else None
     }
 
 
 
 # Performance 30 dias
-def calcular_performance_30dias(plant_id: int, energia_gerada: float, db: Session, cliente_id: int):
+def calcular_performance_30dias(plant_id: int, energia_gerada: float, db: Session, cliente_id: int, projecoes=None):
     hoje = datetime.now()
     mes = hoje.month
     ano = hoje.year
 
-    projecao = db.query(MonthlyProjection).filter_by(
-        plant_id=plant_id,
-        month=mes,
-        year=ano,
-        cliente_id=cliente_id
-    ).first()
-
     dias_do_mes = calendar.monthrange(ano, mes)[1]
-    projecao_kwh = projecao.projection_kwh if projecao else None
+    projecao_kwh = _projecao_do_mes(plant_id, ano, mes, db, cliente_id, projecoes)
     performance = energia_gerada / projecao_kwh if projecao_kwh else None
 
     return {
@@ -101,199 +105,139 @@ def calcular_performance_30dias(plant_id: int, energia_gerada: float, db: Sessio
         "projecao_mensal": projecao_kwh,
         "gerado_30dias": energia_gerada,
         "performance_percentual": round(performance * 100) if performance is not None else None,
-        "mensagem": "Sem projeção" if not projecao or projecao_kwh == 0 else None
+        "mensagem": "Sem projeção" if not projecao_kwh else None
     }
 
 
-# Obter performance diária
-from datetime import datetime, timedelta
-import traceback
+# Motor único: uma busca de geração para as três janelas
+VALIDADE_CACHE = timedelta(hours=23)
+
+CALCULADORAS = {
+    "diaria": calcular_performance_diaria,
+    "7dias": calcular_performance_7dias,
+    "30dias": calcular_performance_30dias,
+}
 
-def get_performance_diaria(apis, db, cliente_id, forcar=False, apenas_plant_id=None):
-    cache = (
-        db.query(PerformanceCache)
-        .filter_by(cliente_id=cliente_id, tipo="diaria")
-        .order_by(PerformanceCache.updated_at.desc())
-        .first()
+
+def _ler_caches(db, cliente_id, plant_id=None) -> dict:
+    """Linhas de PerformanceCache do cliente (opcionalmente de uma usina): {tipo: [cache, ...]}."""
+    consulta = db.query(PerformanceCache).filter(
+        PerformanceCache.cliente_id == cliente_id,
+        PerformanceCache.tipo.in_(CALCULADORAS),
+        PerformanceCache.plant_id.isnot(None),
     )
+    if plant_id is not None:
+        consulta = consulta.filter(PerformanceCache.plant_id == str(plant_id))
+
+    caches = {tipo: [] for tipo in CALCULADORAS}
+    for cache in consulta.order_by(PerformanceCache.id).all():
+        caches[cache.tipo].append(cache)
+    return caches
+
+
+def _cache_valido(linhas) -> bool:
+    """A janela vale enquanto a atualização mais recente de suas linhas tiver menos de VALIDADE_CACHE."""
+    return bool(linhas) and (datetime.now() - max(c.updated_at for c in linhas)) < VALIDADE_CACHE
+
+
+def _gravar_performances(db, cliente_id, tipo, resultados: list):
+    """Upsert de uma linha por usina; só as usinas recalculadas são tocadas."""
+    agora = datetime.now()
+    linhas = {
+        str(r["plant_id"]): {
+            "cliente_id": cliente_id,
+            "tipo": tipo,
+            "plant_id": str(r["plant_id"]),
+            "resultado_json": r,
+            "updated_at": agora,
+        }
+        for r in resultados
+        if r.get("plant_id") is not None
+    }
+    if not linhas:
+        return
 
-    if not forcar and cache and (datetime.now() - cache.updated_at) < timedelta(hours=23):
-        print("🔁 Cache diária do banco")
-        return cache.resultado_json
-
-    print("⚙️ Calculando nova performance diária...")
-
-    resultado_geracao = []
-    for api in apis:
-        try:
-            geracao = api.get_geracao()
-            print(f"🔍 Geração {api.__class__.__name__}: {geracao}")
-            resultado_geracao += geracao.get("diario", [])
-        except Exception as e:
-            print(f"❌ Erro ao obter geração de {api.__class__.__name__}: {e}")
-
-    print("📦 Resultado de geração:", resultado_geracao)
-
-    novos_resultados = []
-    for g in resultado_geracao:
-        if apenas_plant_id and g["ps_id"] != apenas_plant_id:
-            continue
-        try:
-            r = calcular_performance_diaria(g["ps_id"], g["energia_gerada_kWh"], db, cliente_id)
-            print("✅ Resultado performance:", r)
-            if isinstance(r, dict):
-                novos_resultados.append(r)
-            else:
-                print("⚠️ Resultado não é um dicionário:", r)
-        except Exception as e:
-            print("❌ Erro ao calcular performance individual:")
-            traceback.print_exc()
-
-    antigos = cache.resultado_json if cache else []
-
-    def extrair_plant_id(item):
-        if isinstance(item, dict):
-            return item.get("plant_id")
-        print("⚠️ item inesperado em novos_resultados:", item)
-        return None
-
-    novos_ids = {extrair_plant_id(r) for r in novos_resultados if extrair_plant_id(r) is not None}
-    preservados = [r for r in antigos if extrair_plant_id(r) not in novos_ids]
-
-    resultado_final = preservados + novos_resultados
-
-    # 🔍 Verificando o que está prestes a ser salvo no cache
-    print("🧾 Resultado final para salvar no cache:", resultado_final)
+    stmt = insert(PerformanceCache).values(list(linhas.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["cliente_id", "tipo", "plant_id"],
+        set_={coluna: stmt.excluded[coluna] for coluna in ("resultado_json", "updated_at")},
+    )
+    db.execute(stmt)
+
+
+def calcular_performances(apis, db, cliente_id, forcar=False, apenas_plant_id=None) -> dict:
+    """
+    Calcula a performance diária, de 7 e de 30 dias e grava as três no cache
+    em um só commit. A geração vem do livro diário (daily_generation): os
+    fabricantes só são consultados pelos dias que ainda faltam nele.
+    Sem `forcar`, devolve o cache quando as três janelas ainda são válidas.
+    Retorna {"diaria": [...], "7dias": [...], "30dias": [...]}.
+    """
+    caches = _ler_caches(db, cliente_id)
+
+    if not forcar and all(_cache_valido(caches[tipo]) for tipo in CALCULADORAS):
+        print("🔁 Cache de performance do banco")
+        return {tipo: [c.resultado_json for c in caches[tipo]] for tipo in CALCULADORAS}
+
+    print(f"⚙️ Calculando nova performance (diária, 7 e 30 dias) para cliente_id={cliente_id}...")
+    atualizar_geracao_diaria(apis, db, cliente_id)
+    por_janela = somar_janelas(db, cliente_id)
+    hoje = datetime.now()
+    projecoes = carregar_projecoes(db, cliente_id, [(hoje.year, hoje.month)])
+    dias_do_mes = calendar.monthrange(hoje.year, hoje.month)[1]
 
+    resultados = {}
     try:
-        if cache:
-            cache.resultado_json = resultado_final
-            cache.updated_at = datetime.now()
-        else:
-            db.add(PerformanceCache(
-                cliente_id=cliente_id,
-                tipo="diaria",
-                resultado_json=resultado_final
-            ))
+        for tipo in CALCULADORAS:
+            geracoes = [
+                g for g in por_janela[tipo]
+                if not apenas_plant_id or str(g["ps_id"]) == str(apenas_plant_id)
+            ]
+            novos_resultados = calcular_janela(
+                tipo,
+                [g["ps_id"] for g in geracoes],
+                [g["energia_gerada_kWh"] for g in geracoes],
+                [projecoes.get((str(g["ps_id"]), hoje.year, hoje.month)) for g in geracoes],
+                dias_do_mes,
+                hoje.month,
+            )
+
+            _gravar_performances(db, cliente_id, tipo, novos_resultados)
+
+            novos_ids = {str(r.get("plant_id")) for r in novos_resultados}
+            preservados = [c.resultado_json for c in caches[tipo] if c.plant_id not in novos_ids]
+            resultados[tipo] = preservados + novos_resultados
+
         db.commit()
-    except Exception as e:
-        print("❌ Erro ao salvar resultado_final no banco:")
+    except Exception:
+        db.rollback()
+        print("❌ Erro ao salvar performance no banco:")
         traceback.print_exc()
         raise
 
-    print("📝 Performance diária atualizada no cache com sucesso!")
-    return resultado_final
+    print("📝 Performance diária, 7 e 30 dias atualizada no cache com sucesso!")
+    return resultados
 
 
+def _obter_performance(tipo, apis, db, cliente_id, forcar=False, apenas_plant_id=None, plant_id=None):
+    """Lê a janela `tipo` do cache; se estiver vencida, recalcula as três de uma vez."""
+    if not forcar:
+        linhas = _ler_caches(db, cliente_id, plant_id)[tipo]
+        if _cache_valido(linhas):
+            print(f"🔁 Cache {tipo} do banco")
+            return [c.resultado_json for c in linhas]
 
+    resultados = calcular_performances(apis, db, cliente_id, forcar=True, apenas_plant_id=apenas_plant_id)[tipo]
+    return [r for r in resultados if plant_id is None or str(r.get("plant_id")) == str(plant_id)]
 
-def get_performance_7dias(apis, db, cliente_id, forcar=False, apenas_plant_id=None):
-    cache = (
-        db.query(PerformanceCache)
-        .filter_by(cliente_id=cliente_id, tipo="7dias")
-        .order_by(PerformanceCache.updated_at.desc())
-        .first()
-    )
 
-    if not forcar and cache and (datetime.now() - cache.updated_at) < timedelta(hours=23):
-        print("🔁 Cache 7 dias do banco")
-        return cache.resultado_json
-
-    print("⚙️ Calculando nova performance dos últimos 7 dias...")
-
-    resultado_geracao = []
-    for api in apis:
-        try:
-            geracao = api.get_geracao()
-            resultado_geracao += geracao.get("7dias", [])
-        except Exception as e:
-            print(f"❌ Erro ao obter geração de {api.__class__.__name__}: {e}")
-
-    novos_resultados = []
-    for g in resultado_geracao:
-        if apenas_plant_id and g["ps_id"] != apenas_plant_id:
-            continue
-        try:
-            r = calcular_performance_7dias(g["ps_id"], g["energia_gerada_kWh"], db, cliente_id)
-            print("✅ Resultado performance:", r)
-            novos_resultados.append(r)
-        except Exception as e:
-            print(f"❌ Erro ao calcular performance para {g}: {e}")
-
-    def extrair_plant_id(item):
-        return item.get("plant_id")
-
-    antigos = cache.resultado_json if cache else []
-    novos_ids = {extrair_plant_id(r) for r in novos_resultados}
-    preservados = [r for r in antigos if extrair_plant_id(r) not in novos_ids]
-    resultado_final = preservados + novos_resultados
-
-    if cache:
-        cache.resultado_json = resultado_final
-        cache.updated_at = datetime.now()
-    else:
-        db.add(PerformanceCache(
-            cliente_id=cliente_id,
-            tipo="7dias",
-            resultado_json=resultado_final
-        ))
-
-    db.commit()
-    print("📝 Performance 7 dias salva no cache com sucesso!")
-    return resultado_final
-
-
-def get_performance_30dias(apis, db, cliente_id, forcar=False, apenas_plant_id=None):
-    cache = (
-        db.query(PerformanceCache)
-        .filter_by(cliente_id=cliente_id, tipo="30dias")
-        .order_by(PerformanceCache.updated_at.desc())
-        .first()
-    )
+def get_performance_diaria(apis, db, cliente_id, forcar=False, apenas_plant_id=None, plant_id=None):
+    return _obter_performance("diaria", apis, db, cliente_id, forcar, apenas_plant_id, plant_id)
+
+
+def get_performance_7dias(apis, db, cliente_id, forcar=False, apenas_plant_id=None, plant_id=None):
+    return _obter_performance("7dias", apis, db, cliente_id, forcar, apenas_plant_id, plant_id)
+
 
-    if not forcar and cache and (datetime.now() - cache.updated_at) < timedelta(hours=23):
-        print("🔁 Cache 30 dias do banco")
-        return cache.resultado_json
-
-    print("⚙️ Calculando nova performance dos últimos 30 dias...")
-
-    resultado_geracao = []
-    for api in apis:
-        try:
-            geracao = api.get_geracao()
-            resultado_geracao += geracao.get("30dias", {}).get("por_usina", [])
-        except Exception as e:
-            print(f"❌ Erro ao obter geração de {api.__class__.__name__}: {e}")
-
-    novos_resultados = []
-    for g in resultado_geracao:
-        if apenas_plant_id and g["ps_id"] != apenas_plant_id:
-            continue
-        try:
-            r = calcular_performance_30dias(g["ps_id"], g["energia_gerada_kWh"], db, cliente_id)
-            print("✅ Resultado performance:", r)
-            novos_resultados.append(r)
-        except Exception as e:
-            print(f"❌ Erro ao calcular performance para {g}: {e}")
-
-    def extrair_plant_id(item):
-        return item.get("plant_id")
-
-    antigos = cache.resultado_json if cache else []
-    novos_ids = {extrair_plant_id(r) for r in novos_resultados}
-    preservados = [r for r in antigos if extrair_plant_id(r) not in novos_ids]
-    resultado_final = preservados + novos_resultados
-
-    if cache:
-        cache.resultado_json = resultado_final
-        cache.updated_at = datetime.now()
-    else:
-        db.add(PerformanceCache(
-            cliente_id=cliente_id,
-            tipo="30dias",
-            resultado_json=resultado_final
-        ))
-
-    db.commit()
-    print("📝 Performance 30 dias salva no cache com sucesso!")
-    return resultado_final
\ No newline at end of file
+def get_performance_30dias(apis, db, cliente_id, forcar=False, apenas_plant_id=None, plant_id=None):
+    return _obter_performance("30dias", apis, db, cliente_id, forcar, apenas_plant_id, plant_id)
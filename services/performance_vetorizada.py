@@ -0,0 +1,75 @@
+"""
+Cálculo vetorizado da performance de muitas usinas de uma vez.
+
+Recebe arrays de ps_id, kWh gerado na janela, projeção mensal e dias do
+mês, e devolve os mesmos dicts de calcular_performance_diaria/7dias/30dias
+com uma única passada NumPy por janela. Projeção ausente ou zero vira
+"Sem projeção", com os campos calculados nulos.
+"""
+import numpy as np
+
+# Dias cobertos pela janela, em relação à média diária projetada (None = o mês todo)
+DIAS_JANELA = {"diaria": 1, "7dias": 7, "30dias": None}
+
+
+def _como_array(valores, tamanho: int) -> np.ndarray:
+    """Array float com NaN no lugar de None; escalares são replicados para todas as usinas."""
+    if np.isscalar(valores) or valores is None:
+        valores = [valores] * tamanho
+    return np.array([np.nan if v is None else v for v in valores], dtype=float)
+
+
+def _ou_nulo(valores: np.ndarray, nulos: np.ndarray) -> list:
+    return [None if nulo else v for v, nulo in zip(valores.tolist(), nulos.tolist())]
+
+
+def calcular_janela(tipo: str, plant_ids, gerado, projecao_mensal, dias_do_mes, mes) -> list:
+    """
+    Performance da janela `tipo` ("diaria", "7dias" ou "30dias") para todas as
+    usinas informadas. `gerado` e `projecao_mensal` são alinhados a
+    `plant_ids` (None onde não houver valor); `dias_do_mes` e `mes` podem ser
+    escalares ou arrays. Retorna a lista de dicts no formato de sempre.
+    """
+    plant_ids = list(plant_ids)
+    n = len(plant_ids)
+    if not n:
+        return []
+
+    gerado = list(gerado)
+    energia = _como_array(gerado, n)
+    projecao = _como_array(projecao_mensal, n)
+    dias = _como_array(dias_do_mes, n)
+    meses = _como_array(mes, n).astype(int)
+
+    sem_projecao = ~(projecao > 0)  # NaN ou zero
+    dias_janela = DIAS_JANELA[tipo]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        esperado = projecao if dias_janela is None else projecao / dias * dias_janela
+        performance = np.rint(energia / esperado * 100)
+
+    sem_performance = sem_projecao | ~np.isfinite(performance)
+    esperado_nulo = sem_projecao | ~(esperado > 0)
+
+    colunas = {
+        "plant_id": plant_ids,
+        "mes": meses.tolist(),
+        "dias_do_mes": dias.astype(int).tolist(),
+    }
+    if tipo == "diaria":
+        colunas["gerado_ontem"] = gerado
+        colunas["projecao_mensal"] = _ou_nulo(projecao, sem_projecao)
+        colunas["media_diaria_proj"] = _ou_nulo(np.round(esperado, 2), esperado_nulo)
+    elif tipo == "7dias":
+        colunas["projecao_mensal"] = _ou_nulo(projecao, sem_projecao)
+        colunas["media_7dias_proj"] = _ou_nulo(np.round(esperado, 2), esperado_nulo)
+        colunas["gerado_7dias"] = gerado
+    else:
+        colunas["projecao_mensal"] = _ou_nulo(projecao, sem_projecao)
+        colunas["gerado_30dias"] = gerado
+    colunas["performance_percentual"] = [
+        None if nulo else int(v) for v, nulo in zip(performance.tolist(), sem_performance.tolist())
+    ]
+    colunas["mensagem"] = ["Sem projeção" if nulo else None for nulo in sem_projecao.tolist()]
+
+    nomes = list(colunas)
+    return [dict(zip(nomes, linha)) for linha in zip(*colunas.values())]
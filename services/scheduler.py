@@ -1,11 +1,8 @@
 from apscheduler.schedulers.background import BackgroundScheduler
-from services.performance_service import (
-    get_performance_diaria,
-    get_performance_7dias,
-    get_performance_30dias
-)
+from sqlalchemy import text
+from services.performance_service import calcular_performances
 from database import SessionLocal
-from integracoes.solarcloud_service import get_api_instance
+from utils import get_apis_ativas
 import logging
 
 # Configura logging em vez de prints (melhor para produção)
@@ -17,44 +14,22 @@ def executar_rotina_1h():
     db = SessionLocal()
 
     try:
-        clientes = db.execute("SELECT id FROM users").fetchall()
+        clientes = db.execute(text("SELECT id FROM users")).fetchall()
         for cliente in clientes:
             cliente_id = cliente[0]
             try:
-                # Busca todas as integrações desse cliente
-                integracoes = db.execute(
-                    "SELECT plataforma, username, senha FROM integracoes WHERE cliente_id = :cid",
-                    {"cid": cliente_id}
-                ).fetchall()
-
-                apis = []
-                for integracao in integracoes:
-                    plataforma = integracao[0].lower()
-                    username = integracao[1]
-                    senha = integracao[2]
-
-                    if plataforma == "sungrow":
-                        from clients.isolarcloud_client import ApiSolarCloud
-                        from utils import get_integracao_por_plataforma
-                        integracao_solar = get_integracao_por_plataforma(db, cliente_id, "Sungrow")
-                        if integracao_solar:
-                            apis.append(ApiSolarCloud(db=db, integracao=integracao_solar))
-
-                    elif plataforma == "deye":
-                        from clients.deye_client import ApiDeye
-                        apis.append(ApiDeye(username=username, password=senha, db=db))
-
-                    # Adicione outras plataformas aqui no mesmo padrão
+                apis = get_apis_ativas(db, cliente_id)
 
                 if apis:
-                    get_performance_diaria(apis, db, cliente_id)
-                    get_performance_7dias(apis, db, cliente_id)
-                    get_performance_30dias(apis, db, cliente_id)
+                    # calcular_performances completa o livro diário (só ontem sai dos
+                    # fabricantes) e recalcula, ignorando o cache do dia anterior
+                    calcular_performances(apis, db, cliente_id, forcar=True)
                     logger.info(f"✅ Performance atualizada para cliente {cliente_id}")
                 else:
                     logger.warning(f"⚠️ Nenhuma integração ativa para cliente {cliente_id}")
 
             except Exception as e:
+                db.rollback()
                 logger.error(f"❌ Erro ao calcular performance para cliente {cliente_id}: {e}")
 
     except Exception as e:
@@ -63,8 +38,59 @@ def executar_rotina_1h():
         db.close()
 
 
+def manter_tokens_validos():
+    """
+    Passa por todas as integrações pedindo o token ao broker, que renova em
+    segundo plano os que estão perto de expirar. Assim as requisições da
+    dashboard não pagam a latência de login.
+    """
+    from modelos import Integracao
+    from clients.isolarcloud_client import ApiSolarCloud
+    from clients.deye_client import ApiDeye
+    from clients.huawei_client import ApiHuawei
+    from clients.hypontech_client import ApiHyponCloud
+
+    db = SessionLocal()
+    try:
+        for integracao in db.query(Integracao).all():
+            plataforma = integracao.plataforma.lower()
+            try:
+                if plataforma == "sungrow":
+                    ApiSolarCloud(db=db, integracao=integracao)
+                elif plataforma == "deye":
+                    ApiDeye(integracao=integracao, db=db).autenticar()
+                elif plataforma == "huawei":
+                    ApiHuawei(integracao, db).get_token_valido()
+                elif plataforma == "hypontech":
+                    ApiHyponCloud(db=db, integracao=integracao).login_solarcloud()
+            except Exception as e:
+                logger.error(f"❌ Erro ao renovar token da integração {integracao.id}: {e}")
+    finally:
+        db.close()
+
+
+def sincronizar_alarmes_sungrow():
+    """Sincronização incremental dos alarmes de todas as integrações Sungrow."""
+    from modelos import Integracao
+    from clients.isolarcloud_client import ApiSolarCloud
+    from services.alarm_service import sincronizar_alarmes
+
+    db = SessionLocal()
+    try:
+        for integracao in db.query(Integracao).filter(Integracao.plataforma.ilike("sungrow")).all():
+            try:
+                sincronizar_alarmes(db, ApiSolarCloud(db=db, integracao=integracao))
+            except Exception as e:
+                db.rollback()
+                logger.error(f"❌ Erro ao sincronizar alarmes da integração {integracao.id}: {e}")
+    finally:
+        db.close()
+
+
 def start_scheduler():
     scheduler = BackgroundScheduler()
     scheduler.add_job(executar_rotina_1h, 'cron', hour=1, minute=0)
+    scheduler.add_job(manter_tokens_validos, 'interval', minutes=5)
+    scheduler.add_job(sincronizar_alarmes_sungrow, 'interval', minutes=5)
     scheduler.start()
     logger.info("✅ Scheduler iniciado com rotina diária às 01h")
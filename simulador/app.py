@@ -0,0 +1,86 @@
+"""
+Simulador local das APIs dos fabricantes (iSolarCloud, DeyeCloud, FusionSolar
+e Hypontech) para testes de carga e benchmark sem acesso externo.
+
+    uvicorn simulador.app:app --port 8100
+
+e aponte os clientes para ele:
+
+    SUNGROW_BASE_URL=http://localhost:8100/sungrow/openapi/
+    DEYE_BASE_URL=http://localhost:8100/deye/v1.0/
+    HUAWEI_BASE_URL=http://localhost:8100/huawei/thirdData/
+    HYPON_BASE_URL=http://localhost:8100/hypon/v2/
+
+Tamanho da frota, latência, taxa de erro e limite de chamadas são
+configurados por variáveis SIM_* (ver simulador/frota.py e abaixo).
+"""
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from collections import defaultdict, deque
+from simulador import sungrow, deye, huawei, hypon
+from simulador.frota import SEMENTE
+import threading
+import asyncio
+import random
+import time
+import os
+
+LATENCIA_MS = float(os.getenv("SIM_LATENCIA_MS", 80))
+LATENCIA_JITTER_MS = float(os.getenv("SIM_LATENCIA_JITTER_MS", 40))
+TAXA_ERRO = float(os.getenv("SIM_TAXA_ERRO", 0.0))
+# Chamadas por segundo aceitas por fabricante/interface antes de responder com limite de frequência (0 = sem limite)
+LIMITE_RPS = int(os.getenv("SIM_LIMITE_RPS", 0))
+
+# Resposta de limite de frequência no formato de cada fabricante
+RESPOSTAS_LIMITE = {
+    "sungrow": (200, {"result_code": "E900", "result_msg": "system busy", "result_data": None}),
+    "hypon": (200, {"result_code": "E900", "result_msg": "system busy", "result_data": None}),
+    "deye": (429, {"code": "2101019", "msg": "too many requests", "success": False}),
+    "huawei": (200, {"success": False, "failCode": 407, "data": None, "message": "ACCESS_FREQUENCY_IS_TOO_HIGH"}),
+}
+
+app = FastAPI(title="Simulador de fabricantes")
+for modulo in (sungrow, deye, huawei, hypon):
+    app.include_router(modulo.router)
+
+_sorteio = random.Random(f"{SEMENTE}:falhas")
+_chamadas = defaultdict(deque)  # (fabricante, interface) -> instantes das chamadas no último segundo
+_lock = threading.Lock()
+
+
+def _limitado(fabricante: str, interface: str) -> bool:
+    if not LIMITE_RPS:
+        return False
+    agora = time.monotonic()
+    with _lock:
+        janela = _chamadas[(fabricante, interface)]
+        while janela and agora - janela[0] > 1:
+            janela.popleft()
+        if len(janela) >= LIMITE_RPS:
+            return True
+        janela.append(agora)
+        return False
+
+
+@app.middleware("http")
+async def condicoes_de_rede(request: Request, call_next):
+    partes = request.url.path.strip("/").split("/")
+    fabricante, interface = partes[0], partes[-1]
+
+    latencia = max(0.0, _sorteio.gauss(LATENCIA_MS, LATENCIA_JITTER_MS)) / 1000
+    if latencia:
+        await asyncio.sleep(latencia)
+
+    if fabricante in RESPOSTAS_LIMITE and interface != "login":
+        if _limitado(fabricante, interface):
+            status_code, corpo = RESPOSTAS_LIMITE[fabricante]
+            return JSONResponse(status_code=status_code, content=corpo)
+        if TAXA_ERRO and _sorteio.random() < TAXA_ERRO:
+            return JSONResponse(status_code=500, content={"erro": "falha simulada"})
+
+    return await call_next(request)
+
+
+@app.get("/")
+def status():
+    return {"simulador": "ok", "fabricantes": list(RESPOSTAS_LIMITE)}
@@ -0,0 +1,88 @@
+from fastapi import APIRouter, Body, Header
+from fastapi.responses import JSONResponse
+from datetime import datetime
+from typing import Optional
+from simulador import frota
+
+router = APIRouter(prefix="/deye/v1.0")
+FABRICANTE = "deye"
+
+
+def _ok(**dados):
+    return {"code": "1000000", "msg": "success", "success": True, **dados}
+
+
+def _erro_token():
+    return JSONResponse(status_code=401, content={"code": "2101006", "msg": "invalid token", "success": False})
+
+
+def _conta(authorization: Optional[str]):
+    token = (authorization or "").replace("Bearer ", "")
+    return token[len("sim:"):] if token.startswith("sim:") else None
+
+
+@router.post("/account/token")
+def account_token(appId: str = None, body: dict = Body(...)):
+    return _ok(accessToken=f"sim:{body.get('email')}", tokenType="bearer", expiresIn="5183999")
+
+
+@router.post("/account/info")
+def account_info(authorization: Optional[str] = Header(None)):
+    if _conta(authorization) is None:
+        return _erro_token()
+    return _ok(orgInfoList=[{"companyId": 10001, "companyName": "Simulador", "roleName": "admin"}])
+
+
+@router.post("/station/list")
+def station_list(body: dict = Body(...), authorization: Optional[str] = Header(None)):
+    conta = _conta(authorization)
+    if conta is None:
+        return _erro_token()
+
+    pagina, tamanho = int(body.get("page", 1)), int(body.get("size", 10))
+    usinas = frota.usinas(FABRICANTE, conta)
+    agora = frota.agora()
+
+    estacoes = []
+    for u in usinas[(pagina - 1) * tamanho: pagina * tamanho]:
+        capacidade_inv = u["capacidade"] / len(u["inversores"])
+        estacoes.append({
+            "id": int(u["id"]),
+            "name": u["nome"],
+            "locationAddress": u["cidade"],
+            "installedCapacity": u["capacidade"],
+            "generationPower": round(sum(frota.potencia(i, capacidade_inv, agora) for i in u["inversores"]), 1),
+            "connectionStatus": "NORMAL",
+        })
+
+    return _ok(stationList=estacoes, total=len(usinas))
+
+
+@router.post("/station/history")
+def station_history(body: dict = Body(...), authorization: Optional[str] = Header(None)):
+    """Série diária (granularity 2) de startAt até o dia anterior a endAt."""
+    conta = _conta(authorization)
+    if conta is None:
+        return _erro_token()
+
+    u = frota.usina(FABRICANTE, conta, body.get("stationId"))
+    if not u:
+        return _ok(stationDataItems=[])
+
+    inicio = datetime.strptime(body["startAt"], "%Y-%m-%d").date()
+    fim = datetime.strptime(body["endAt"], "%Y-%m-%d").date()
+    capacidade_inv = u["capacidade"] / len(u["inversores"])
+
+    itens = []
+    for dia in frota.dias(inicio, min(fim, frota.agora().date())):
+        if dia == fim and fim != inicio:
+            break
+        fim_do_dia = datetime.combine(dia, datetime.max.time())
+        itens.append({
+            "year": dia.year,
+            "month": dia.month,
+            "day": dia.day,
+            "generationValue": round(sum(frota.energia_ate(i, capacidade_inv, fim_do_dia) for i in u["inversores"]), 2),
+        })
+
+    return _ok(stationDataItems=itens)
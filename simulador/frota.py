@@ -0,0 +1,144 @@
+"""
+Frota sintética do simulador. Todos os valores são derivados de forma
+determinística de (SIM_SEMENTE, fabricante, conta, usina, inversor, data),
+então duas execuções com a mesma configuração enxergam exatamente os mesmos
+dados e a geração de um dia passado nunca muda.
+"""
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+from pytz import timezone
+import random
+import math
+import os
+
+SEMENTE = os.getenv("SIM_SEMENTE", "42")
+USINAS_POR_CONTA = int(os.getenv("SIM_USINAS", 50))
+INVERSORES_POR_USINA = int(os.getenv("SIM_INVERSORES_POR_USINA", 2))
+# Fração das usinas com alarme em aberto / já resolvido
+FRACAO_ALARMES = float(os.getenv("SIM_FRACAO_ALARMES", 0.1))
+
+CIDADES = ["São Paulo - SP", "Campinas - SP", "Belo Horizonte - MG", "Goiânia - GO", "Fortaleza - CE",
+           "Recife - PE", "Cuiabá - MT", "Londrina - PR", "Uberlândia - MG", "Petrolina - PE"]
+
+ALARMES = [
+    ("10", "Isolamento baixo", 2),
+    ("38", "Sobretensão da rede", 3),
+    ("322", "Falha de comunicação", 4),
+    ("501", "Temperatura elevada", 3),
+]
+
+
+def agora() -> datetime:
+    """Horário de Brasília sem fuso, no mesmo formato em que os clientes enviam as datas."""
+    return datetime.now(timezone("America/Sao_Paulo")).replace(tzinfo=None)
+
+
+def gerador(*partes) -> random.Random:
+    return random.Random(":".join(str(p) for p in (SEMENTE,) + partes))
+
+
+@lru_cache(maxsize=None)
+def usinas(fabricante: str, conta: str) -> tuple:
+    """Usinas da conta: tupla de dicts com id, nome, cidade, capacidade (kWp) e inversores."""
+    rng = gerador(fabricante, conta)
+    base_id = rng.randint(1_000_000, 8_000_000)
+    resultado = []
+    for i in range(USINAS_POR_CONTA):
+        usina_id = str(base_id + i)
+        capacidade = round(gerador(fabricante, usina_id, "cap").uniform(5, 300), 1)
+        resultado.append({
+            "id": usina_id,
+            "nome": f"Usina {fabricante.title()} {i + 1:04d}",
+            "cidade": CIDADES[i % len(CIDADES)],
+            "capacidade": capacidade,
+            "inversores": tuple(f"{usina_id}_1_{n + 1}_1" for n in range(INVERSORES_POR_USINA)),
+        })
+    return tuple(resultado)
+
+
+def usina(fabricante: str, conta: str, usina_id) -> dict:
+    return next((u for u in usinas(fabricante, conta) if u["id"] == str(usina_id)), None)
+
+
+def inversor(fabricante: str, conta: str, inversor_id) -> tuple:
+    """(usina, capacidade do inversor) de um inversor, ou (None, 0)."""
+    usina_id = str(inversor_id).split("_")[0]
+    u = usina(fabricante, conta, usina_id)
+    if not u or str(inversor_id) not in u["inversores"]:
+        return None, 0.0
+    return u, u["capacidade"] / len(u["inversores"])
+
+
+def energia_dia(inversor_id: str, capacidade: float, dia: date) -> float:
+    """Energia total (kWh) do inversor no dia: horas de sol sazonais x clima do dia."""
+    sazonal = 5.0 + 0.8 * math.cos(2 * math.pi * (dia.timetuple().tm_yday - 15) / 365)
+    clima = gerador("clima", inversor_id.split("_")[0], dia.isoformat()).uniform(0.35, 1.05)
+    return round(capacidade * sazonal * clima, 2)
+
+
+def _fracao_do_dia(momento: datetime) -> float:
+    """Fração da energia diária já gerada até `momento` (curva senoidal das 6h às 18h)."""
+    hora = momento.hour + momento.minute / 60 + momento.second / 3600
+    if hora <= 6:
+        return 0.0
+    if hora >= 18:
+        return 1.0
+    return (1 - math.cos(math.pi * (hora - 6) / 12)) / 2
+
+
+def potencia(inversor_id: str, capacidade: float, momento: datetime) -> float:
+    """Potência ativa (W) do inversor no instante."""
+    hora = momento.hour + momento.minute / 60
+    if not 6 < hora < 18:
+        return 0.0
+    pico_kw = energia_dia(inversor_id, capacidade, momento.date()) * math.pi / 24
+    return round(pico_kw * 1000 * math.sin(math.pi * (hora - 6) / 12), 1)
+
+
+def energia_ate(inversor_id: str, capacidade: float, momento: datetime) -> float:
+    """Energia (kWh) gerada no dia de `momento` até o instante, limitada ao presente."""
+    momento = min(momento, agora())
+    return round(energia_dia(inversor_id, capacidade, momento.date()) * _fracao_do_dia(momento), 3)
+
+
+def energia_total(inversor_id: str, capacidade: float) -> float:
+    """Energia acumulada desde a instalação (kWh), aproximada pela média anual."""
+    dias_operacao = gerador("instalacao", inversor_id).randint(60, 2000)
+    return round(capacidade * 4.6 * dias_operacao, 1)
+
+
+def dias(inicio: date, fim: date):
+    """Dias de inicio a fim, inclusive."""
+    atual = inicio
+    while atual <= fim:
+        yield atual
+        atual += timedelta(days=1)
+
+
+def alarmes(fabricante: str, conta: str, resolvidos: bool) -> list:
+    """Alarmes sintéticos da conta: uma fração das usinas tem um alarme aberto e outra um resolvido."""
+    hoje = agora().date()
+    resultado = []
+    for u in usinas(fabricante, conta):
+        rng = gerador("alarme", u["id"], resolvidos)
+        if rng.random() >= FRACAO_ALARMES:
+            continue
+        codigo, nome, nivel = rng.choice(ALARMES)
+        inversor_id = rng.choice(u["inversores"])
+        criado = datetime.combine(hoje - timedelta(days=rng.randint(0, 20)), datetime.min.time()) + timedelta(
+            minutes=rng.randint(6 * 60, 18 * 60))
+        atualizado = criado + timedelta(hours=rng.randint(1, 48)) if resolvidos else criado
+        resultado.append({
+            "fault_id": f"{u['id']}{codigo}{int(criado.timestamp())}",
+            "ps_id": int(u["id"]),
+            "ps_name": u["nome"],
+            "ps_key": inversor_id,
+            "fault_code": codigo,
+            "fault_name": nome,
+            "fault_level": nivel,
+            "fault_type": 1,
+            "process_status": 9 if resolvidos else 8,
+            "create_time": criado.strftime("%Y-%m-%d %H:%M:%S"),
+            "update_time": atualizado.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    return sorted(resultado, key=lambda a: a["create_time"], reverse=True)
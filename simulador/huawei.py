@@ -0,0 +1,159 @@
+from fastapi import APIRouter, Body, Header, Response
+from datetime import datetime, timedelta
+from typing import Optional
+from pytz import timezone
+from simulador import frota
+
+router = APIRouter(prefix="/huawei/thirdData")
+FABRICANTE = "huawei"
+BRASIL = timezone("America/Sao_Paulo")
+
+
+def _ok(data):
+    return {"success": True, "failCode": 0, "data": data}
+
+
+def _erro_token():
+    return {"success": False, "failCode": 305, "data": None, "message": "USER_MUST_RELOGIN"}
+
+
+def _conta(xsrf_token: Optional[str]):
+    token = xsrf_token or ""
+    return token[len("sim:"):] if token.startswith("sim:") else None
+
+
+def _codigos(valor) -> list:
+    return [c for c in str(valor or "").split(",") if c]
+
+
+def _ms(momento: datetime) -> int:
+    return int(BRASIL.localize(momento).timestamp() * 1000)
+
+
+def _inversores(conta: str, dev_ids: list):
+    """(devId, inversor_id, capacidade) dos devIds conhecidos; devId é o ps_key sem '_'."""
+    por_dev_id = {
+        i.replace("_", ""): (i, u["capacidade"] / len(u["inversores"]))
+        for u in frota.usinas(FABRICANTE, conta) for i in u["inversores"]
+    }
+    return [(d, *por_dev_id[d]) for d in dev_ids if d in por_dev_id]
+
+
+@router.post("/login")
+def login(response: Response, body: dict = Body(...)):
+    response.headers["xsrf-token"] = f"sim:{body.get('userName')}"
+    return {"success": True, "failCode": 0, "data": None}
+
+
+@router.post("/stations")
+def stations(body: dict = Body(...), xsrf_token: Optional[str] = Header(None)):
+    conta = _conta(xsrf_token)
+    if conta is None:
+        return _erro_token()
+
+    pagina, tamanho = int(body.get("pageNo", 1)), int(body.get("pageSize", 100))
+    usinas = frota.usinas(FABRICANTE, conta)
+    lista = [
+        {"plantCode": f"NE={u['id']}", "plantName": u["nome"], "plantAddress": u["cidade"], "capacity": u["capacidade"]}
+        for u in usinas[(pagina - 1) * tamanho: pagina * tamanho]
+    ]
+    return _ok({"list": lista, "total": len(usinas), "pageNo": pagina, "pageCount": -(-len(usinas) // tamanho)})
+
+
+@router.post("/getStationRealKpi")
+def get_station_real_kpi(body: dict = Body(...), xsrf_token: Optional[str] = Header(None)):
+    conta = _conta(xsrf_token)
+    if conta is None:
+        return _erro_token()
+
+    agora = frota.agora()
+    dados = []
+    for codigo in _codigos(body.get("stationCodes")):
+        u = frota.usina(FABRICANTE, conta, codigo.replace("NE=", ""))
+        if not u:
+            continue
+        capacidade_inv = u["capacidade"] / len(u["inversores"])
+        total = sum(frota.energia_total(i, capacidade_inv) for i in u["inversores"])
+        dados.append({
+            "stationCode": codigo,
+            "dataItemMap": {
+                "day_power": round(sum(frota.energia_ate(i, capacidade_inv, agora) for i in u["inversores"]), 2),
+                "total_power": round(total, 2),
+                "co2_reduction": round(total * 0.000475, 2),
+                "total_income": round(total * 0.75, 2),
+                "real_health_state": 3,
+            },
+        })
+    return _ok(dados)
+
+
+@router.post("/getDevList")
+def get_dev_list(body: dict = Body(...), xsrf_token: Optional[str] = Header(None)):
+    conta = _conta(xsrf_token)
+    if conta is None:
+        return _erro_token()
+
+    dados = []
+    for codigo in _codigos(body.get("stationCodes")):
+        u = frota.usina(FABRICANTE, conta, codigo.replace("NE=", ""))
+        for i in (u["inversores"] if u else ()):
+            dados.append({"id": int(i.replace("_", "")), "devTypeId": 1, "stationCode": codigo, "esnCode": f"SIM{i}"})
+    return _ok(dados)
+
+
+@router.post("/getDevRealKpi")
+def get_dev_real_kpi(body: dict = Body(...), xsrf_token: Optional[str] = Header(None)):
+    conta = _conta(xsrf_token)
+    if conta is None:
+        return _erro_token()
+
+    agora = frota.agora()
+    return _ok([
+        {"devId": int(dev_id), "dataItemMap": {"active_power": round(frota.potencia(i, capacidade, agora) / 1000, 3)}}
+        for dev_id, i, capacidade in _inversores(conta, _codigos(body.get("devIds")))
+    ])
+
+
+@router.post("/getDevKpiDay")
+def get_dev_kpi_day(body: dict = Body(...), xsrf_token: Optional[str] = Header(None)):
+    """Energia diária de cada inversor em todos os dias do mês de collectTime."""
+    conta = _conta(xsrf_token)
+    if conta is None:
+        return _erro_token()
+
+    referencia = datetime.fromtimestamp(int(body.get("collectTime")) / 1000, BRASIL).date()
+    inicio = referencia.replace(day=1)
+    fim = min((inicio + timedelta(days=31)).replace(day=1) - timedelta(days=1), frota.agora().date())
+
+    dados = []
+    for dev_id, i, capacidade in _inversores(conta, _codigos(body.get("devIds"))):
+        for dia in frota.dias(inicio, fim):
+            dados.append({
+                "devId": int(dev_id),
+                "collectTime": _ms(datetime.combine(dia, datetime.min.time())),
+                "dataItemMap": {"product_power": frota.energia_ate(i, capacidade, datetime.combine(dia, datetime.max.time()))},
+            })
+    return _ok(dados)
+
+
+@router.post("/getDevHistoryKpi")
+def get_dev_history_kpi(body: dict = Body(...), xsrf_token: Optional[str] = Header(None)):
+    """Potência a cada 5 minutos entre startTime e endTime."""
+    conta = _conta(xsrf_token)
+    if conta is None:
+        return _erro_token()
+
+    inicio = datetime.fromtimestamp(int(body.get("startTime")) / 1000, BRASIL).replace(tzinfo=None)
+    fim = min(datetime.fromtimestamp(int(body.get("endTime")) / 1000, BRASIL).replace(tzinfo=None), frota.agora())
+
+    dados = []
+    for dev_id, i, capacidade in _inversores(conta, _codigos(body.get("devIds"))):
+        momento = inicio
+        while momento <= fim:
+            dados.append({
+                "devId": int(dev_id),
+                "collectTime": _ms(momento),
+                "dataItemMap": {"active_power": round(frota.potencia(i, capacidade, momento) / 1000, 3)},
+            })
+            momento += timedelta(minutes=5)
+    return _ok(dados)
@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Body
+from fastapi.responses import JSONResponse
+from datetime import datetime
+from simulador import frota
+
+router = APIRouter(prefix="/hypon/v2")
+FABRICANTE = "hypon"
+
+
+def _ok(result_data):
+    return {"result_code": "1", "result_msg": "success", "result_data": result_data}
+
+
+def _erro_token():
+    return JSONResponse(status_code=401, content={"result_code": "E00003", "result_msg": "token invalid", "result_data": None})
+
+
+def _conta(body: dict):
+    token = body.get("token") or ""
+    return token[len("sim:"):] if token.startswith("sim:") else None
+
+
+@router.post("/login")
+def login(body: dict = Body(...)):
+    return _ok({"token": f"sim:{body.get('user_account')}"})
+
+
+@router.post("/plant/list")
+def plant_list(body: dict = Body(...)):
+    conta = _conta(body)
+    if conta is None:
+        return _erro_token()
+
+    pagina, tamanho = int(body.get("page", 1)), int(body.get("page_size", 10))
+    usinas = frota.usinas(FABRICANTE, conta)
+    agora = frota.agora()
+
+    pagina_usinas = []
+    for u in usinas[(pagina - 1) * tamanho: pagina * tamanho]:
+        capacidade_inv = u["capacidade"] / len(u["inversores"])
+        pagina_usinas.append({
+            "plant_id": int(u["id"]),
+            "plant_name": u["nome"],
+            "address": u["cidade"],
+            "capacity": u["capacidade"],
+            "power": round(sum(frota.potencia(i, capacidade_inv, agora) for i in u["inversores"]), 1),
+            "e_today": round(sum(frota.energia_ate(i, capacidade_inv, agora) for i in u["inversores"]), 2),
+            "e_total": round(sum(frota.energia_total(i, capacidade_inv) for i in u["inversores"]), 1),
+            "status": "online",
+        })
+
+    return _ok({"pageList": pagina_usinas, "rowCount": len(usinas)})
+
+
+@router.post("/plant/energy/day")
+def plant_energy_day(body: dict = Body(...)):
+    """Série diária de start_date a end_date (inclusive), limitada a hoje."""
+    conta = _conta(body)
+    if conta is None:
+        return _erro_token()
+
+    u = frota.usina(FABRICANTE, conta, body.get("plant_id"))
+    if not u:
+        return _ok({"list": []})
+
+    inicio = datetime.strptime(body["start_date"], "%Y-%m-%d").date()
+    fim = datetime.strptime(body["end_date"], "%Y-%m-%d").date()
+    capacidade_inv = u["capacidade"] / len(u["inversores"])
+
+    itens = []
+    for dia in frota.dias(inicio, min(fim, frota.agora().date())):
+        fim_do_dia = datetime.combine(dia, datetime.max.time())
+        itens.append({
+            "date": dia.isoformat(),
+            "energy": round(sum(frota.energia_ate(i, capacidade_inv, fim_do_dia) for i in u["inversores"]), 2),
+        })
+
+    return _ok({"list": itens})
@@ -0,0 +1,188 @@
+from fastapi import APIRouter, Body
+from fastapi.responses import JSONResponse
+from datetime import datetime, timedelta
+from simulador import frota
+
+router = APIRouter(prefix="/sungrow/openapi")
+FABRICANTE = "sungrow"
+
+
+def _ok(result_data):
+    return {"result_code": "1", "result_msg": "success", "result_data": result_data}
+
+
+def _erro_token():
+    return JSONResponse(
+        status_code=401,
+        content={"result_code": "E00003", "result_msg": "er_token_login_invalid", "result_data": None},
+    )
+
+
+def _conta(body: dict):
+    token = str(body.get("token") or "")
+    return token[len("sim:"):] if token.startswith("sim:") else None
+
+
+def _valor(valor, unidade: str) -> dict:
+    return {"value": str(valor), "unit": unidade}
+
+
+@router.post("/login")
+def login(body: dict = Body(...)):
+    return _ok({"token": f"sim:{body.get('user_account')}", "user_account": body.get("user_account")})
+
+
+@router.post("/getPowerStationList")
+def get_power_station_list(body: dict = Body(...)):
+    conta = _conta(body)
+    if conta is None:
+        return _erro_token()
+
+    pagina, tamanho = int(body.get("curPage", 1)), int(body.get("size", 10))
+    usinas = frota.usinas(FABRICANTE, conta)
+    agora = frota.agora()
+
+    page_list = []
+    for u in usinas[(pagina - 1) * tamanho: pagina * tamanho]:
+        capacidade_inv = u["capacidade"] / len(u["inversores"])
+        potencia = sum(frota.potencia(i, capacidade_inv, agora) for i in u["inversores"])
+        hoje = sum(frota.energia_ate(i, capacidade_inv, agora) for i in u["inversores"])
+        total = sum(frota.energia_total(i, capacidade_inv) for i in u["inversores"])
+        page_list.append({
+            "ps_id": int(u["id"]),
+            "ps_name": u["nome"],
+            "ps_location": u["cidade"],
+            "total_capcity": _valor(u["capacidade"], "kWp"),
+            "curr_power": _valor(int(potencia), "W"),
+            "today_energy": _valor(round(hoje, 2), "kWh"),
+            "total_energy": _valor(round(total / 1000, 2), "MWh"),
+            "co2_reduce_total": _valor(round(total * 0.000475, 2), "t"),
+            "total_income": _valor(round(total * 0.75, 2), "R$"),
+            "ps_fault_status": 3,
+        })
+
+    return _ok({"pageList": page_list, "rowCount": len(usinas)})
+
+
+@router.post("/getDeviceList")
+def get_device_list(body: dict = Body(...)):
+    conta = _conta(body)
+    if conta is None:
+        return _erro_token()
+
+    u = frota.usina(FABRICANTE, conta, body.get("ps_id"))
+    inversores = u["inversores"] if u else ()
+    return _ok({
+        "pageList": [
+            {"ps_key": ps_key, "device_type": 1, "device_sn": f"SIM{ps_key.replace('_', '')}", "ps_id": u["id"]}
+            for ps_key in inversores
+        ],
+        "rowCount": len(inversores),
+    })
+
+
+@router.post("/getDevicePointsDayMonthYearDataList")
+def get_device_points_day_month_year(body: dict = Body(...)):
+    conta = _conta(body)
+    if conta is None:
+        return _erro_token()
+
+    mensal = str(body.get("data_type")) == "4"
+    inicio, fim = str(body.get("start_time")), str(body.get("end_time"))
+    hoje = frota.agora().date()
+
+    if mensal:
+        dia_inicio = datetime.strptime(inicio[:6], "%Y%m").date()
+        dia_fim = (datetime.strptime(fim[:6], "%Y%m") + timedelta(days=31)).replace(day=1).date() - timedelta(days=1)
+    else:
+        dia_inicio = datetime.strptime(inicio[:8], "%Y%m%d").date()
+        dia_fim = datetime.strptime(fim[:8], "%Y%m%d").date()
+
+    resultado = {}
+    for ps_key in body.get("ps_key_list") or []:
+        u, capacidade = frota.inversor(FABRICANTE, conta, ps_key)
+        if not u:
+            continue
+
+        por_periodo = {}
+        for dia in frota.dias(dia_inicio, min(dia_fim, hoje)):
+            chave = dia.strftime("%Y%m") if mensal else dia.strftime("%Y%m%d")
+            energia = frota.energia_ate(ps_key, capacidade, datetime.combine(dia, datetime.max.time()))
+            por_periodo[chave] = por_periodo.get(chave, 0.0) + energia * 1000  # Wh
+
+        campo = "4" if mensal else "2"
+        resultado[ps_key] = {"p1": [{"time_stamp": k, campo: str(round(v, 1))} for k, v in por_periodo.items()]}
+
+    return _ok(resultado)
+
+
+@router.post("/getDevicePointMinuteDataList")
+def get_device_point_minute_data_list(body: dict = Body(...)):
+    conta = _conta(body)
+    if conta is None:
+        return _erro_token()
+
+    inicio = datetime.strptime(str(body.get("start_time_stamp")), "%Y%m%d%H%M%S")
+    fim = min(datetime.strptime(str(body.get("end_time_stamp")), "%Y%m%d%H%M%S"), frota.agora())
+    intervalo = timedelta(minutes=int(body.get("minute_interval") or 5))
+
+    # Alinha ao primeiro slot de `intervalo` a partir do início pedido
+    resto = (inicio.minute * 60 + inicio.second) % int(intervalo.total_seconds())
+    primeiro = inicio if not resto else inicio + timedelta(seconds=int(intervalo.total_seconds()) - resto)
+
+    resultado = {}
+    for ps_key in body.get("ps_key_list") or []:
+        u, capacidade = frota.inversor(FABRICANTE, conta, ps_key)
+        if not u:
+            continue
+
+        itens = []
+        momento = primeiro
+        while momento <= fim:
+            itens.append({
+                "time_stamp": momento.strftime("%Y%m%d%H%M%S"),
+                "p24": str(frota.potencia(ps_key, capacidade, momento)),
+                "p1": str(round(frota.energia_ate(ps_key, capacidade, momento) * 1000, 1)),
+            })
+            momento += intervalo
+        resultado[ps_key] = itens
+
+    return _ok(resultado)
+
+
+@router.post("/getDeviceRealTimeData")
+def get_device_real_time_data(body: dict = Body(...)):
+    conta = _conta(body)
+    if conta is None:
+        return _erro_token()
+
+    agora = frota.agora()
+    pontos = body.get("point_id_list") or []
+    lista = []
+    for ps_key in body.get("ps_key_list") or []:
+        u, capacidade = frota.inversor(FABRICANTE, conta, ps_key)
+        if not u:
+            continue
+
+        potencia = frota.potencia(ps_key, capacidade, agora)
+        rng = frota.gerador("tempo_real", ps_key, agora.strftime("%Y%m%d%H%M"))
+        ponto = {"ps_key": ps_key, "device_sn": f"SIM{ps_key.replace('_', '')}"}
+        for p in pontos:
+            ponto[f"p{p}"] = str(round(potencia, 1) if str(p) == "24" else round(rng.uniform(0, 600), 2))
+        lista.append({"device_point": ponto})
+
+    return _ok({"device_point_list": lista})
+
+
+@router.post("/getFaultAlarmInfo")
+def get_fault_alarm_info(body: dict = Body(...)):
+    conta = _conta(body)
+    if conta is None:
+        return _erro_token()
+
+    alarmes = frota.alarmes(FABRICANTE, conta, resolvidos=str(body.get("process_status")) == "9")
+    if body.get("ps_id"):
+        alarmes = [a for a in alarmes if str(a["ps_id"]) == str(body["ps_id"])]
+
+    pagina, tamanho = int(body.get("curPage", 1)), int(body.get("size", 10))
+    return _ok({"pageList": alarmes[(pagina - 1) * tamanho: pagina * tamanho], "rowCount": len(alarmes)})
@@ -0,0 +1,115 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+# Os módulos do projeto são importados a partir da raiz do repositório
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Simulador sem latência e com uma frota pequena (lidos na importação de simulador/)
+os.environ.setdefault("SIM_LATENCIA_MS", "0")
+os.environ.setdefault("SIM_LATENCIA_JITTER_MS", "0")
+os.environ.setdefault("SIM_USINAS", "4")
+
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+from requests.structures import CaseInsensitiveDict
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+HOST_SIMULADOR = "http://simulador/"
+BASE_URLS = {
+    "clients.isolarcloud_client.ApiSolarCloud": HOST_SIMULADOR + "sungrow/openapi/",
+    "clients.hypontech_client.ApiHyponCloud": HOST_SIMULADOR + "hypon/v2/",
+    "clients.deye_client.ApiDeye": HOST_SIMULADOR + "deye/v1.0/",
+    "clients.huawei_client.ApiHuawei": HOST_SIMULADOR + "huawei/thirdData/",
+}
+
+
+class AdaptadorSimulador(HTTPAdapter):
+    """Entrega as requisições dos clientes ao app do simulador, sem rede."""
+
+    def __init__(self):
+        super().__init__()
+        from fastapi.testclient import TestClient
+        from simulador.app import app
+        self.cliente = TestClient(app)
+
+    def send(self, request, **kwargs):
+        resposta = self.cliente.request(
+            request.method, request.url, content=request.body, headers=dict(request.headers)
+        )
+        response = Response()
+        response.status_code = resposta.status_code
+        response.headers = CaseInsensitiveDict(resposta.headers)
+        response._content = resposta.content
+        response.encoding = "utf-8"
+        response.url = request.url
+        response.request = request
+        return response
+
+
+@pytest.fixture
+def simulador(monkeypatch):
+    """Aponta todos os clientes de fabricante para o simulador local."""
+    from clients import sessao_http, disjuntor
+
+    monkeypatch.setitem(sessao_http._adaptadores, HOST_SIMULADOR, AdaptadorSimulador())
+    monkeypatch.setattr(sessao_http, "RECUO_BASE", 0)
+    monkeypatch.setattr(disjuntor, "_disjuntores", {})
+    for caminho, url in BASE_URLS.items():
+        modulo, classe = caminho.rsplit(".", 1)
+        monkeypatch.setattr(getattr(__import__(modulo, fromlist=[classe]), classe), "base_url", url)
+    return HOST_SIMULADOR
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """
+    Banco SQLite em memória com todas as tabelas. Os upserts do projeto usam o
+    insert do Postgres; nos testes eles passam pelo insert equivalente do SQLite.
+    """
+    from database import Base
+    import modelos  # noqa: F401
+    from models import device_catalog, generation_history, vendor_alarm, performance_cache, monthly_projection, daily_generation  # noqa: F401
+    from services import alarm_service, performance_service, geracao_diaria_service
+
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    Sessao = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    for modulo in (alarm_service, performance_service, geracao_diaria_service):
+        monkeypatch.setattr(modulo, "insert", sqlite.insert)
+
+    sessao = Sessao()
+    sessao.fabrica = Sessao
+    yield sessao
+    sessao.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def token_pronto(monkeypatch):
+    """Registra no broker um token do simulador para a integração, evitando o login pelo banco."""
+    from datetime import datetime, timedelta
+    from clients.token_broker import token_broker
+
+    def registrar(integracao_id: int, token: str):
+        monkeypatch.setitem(token_broker._tokens, integracao_id, {
+            "token": token, "obtido_em": datetime.utcnow(), "validade": timedelta(hours=1),
+        })
+
+    return registrar
+
+
+def integracao_falsa(**campos):
+    padrao = dict(
+        id=1, cliente_id=1, plataforma="Sungrow", username="conta", senha="senha",
+        appkey="APPKEY", x_access_key="XKEY", token_acesso=None, token_expira_em=None,
+        token_updated_at=None, appid="app", appsecret="segredo", companyid=None,
+    )
+    padrao.update(campos)
+    return SimpleNamespace(**padrao)
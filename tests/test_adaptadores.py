@@ -0,0 +1,62 @@
+import asyncio
+import threading
+
+from types import SimpleNamespace
+
+from clients import adaptadores
+from clients.base_client import AdapterSincrono
+from clients.adaptadores import criar_adapter, reunir
+
+
+class ClienteFalso:
+    def __init__(self, db, barreira):
+        self.db = db
+        self.barreira = barreira
+        self.sessoes = []
+
+    def get_usinas(self):
+        self.sessoes.append(self.db)
+        self.barreira.wait(timeout=5)  # só passa se os dois clientes estiverem rodando juntos
+        return [{"ps_id": 1}]
+
+
+class AdapterFalso(AdapterSincrono):
+    plataforma = "falso"
+
+
+def test_cada_chamada_usa_session_propria_e_fabricantes_seguem_em_paralelo(db):
+    barreira = threading.Barrier(2)
+    clientes = [ClienteFalso(db, barreira), ClienteFalso(db, barreira)]
+
+    resultados = asyncio.run(reunir([AdapterFalso(c) for c in clientes], "listar_usinas"))
+
+    assert resultados == [[{"ps_id": 1}], [{"ps_id": 1}]]
+    primeira, segunda = (c.sessoes[0] for c in clientes)
+    assert db not in (primeira, segunda) and primeira is not segunda
+    assert primeira.get_bind() is db.get_bind()
+    assert all(c.db is db for c in clientes)
+
+
+class ClienteQueUsaODbNoLogin:
+    barreira = None
+
+    def __init__(self, db, integracao):
+        self.db = db
+        self.sessao_do_login = db
+        self.barreira.wait(timeout=5)  # os dois logins acontecem ao mesmo tempo
+
+
+def test_clientes_criados_juntos_nao_dividem_a_session_da_requisicao(db, monkeypatch):
+    monkeypatch.setattr(ClienteQueUsaODbNoLogin, "barreira", threading.Barrier(2))
+    monkeypatch.setitem(adaptadores.CLIENTES_POR_PLATAFORMA, "falso", ClienteQueUsaODbNoLogin)
+    monkeypatch.setitem(adaptadores.ADAPTADORES, ClienteQueUsaODbNoLogin, AdapterFalso)
+    integracoes = [SimpleNamespace(id=i, plataforma="Falso") for i in (1, 2)]
+
+    async def criar():
+        return await asyncio.gather(*(criar_adapter(i, db) for i in integracoes))
+
+    primeiro, segundo = (a.cliente for a in asyncio.run(criar()))
+
+    assert db not in (primeiro.sessao_do_login, segundo.sessao_do_login)
+    assert primeiro.sessao_do_login is not segundo.sessao_do_login
+    assert primeiro.db is db and segundo.db is db
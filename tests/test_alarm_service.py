@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from models.vendor_alarm import VendorAlarm
+from services import alarm_service as servico
+
+
+class ApiAlarmes:
+    """Responde getFaultAlarmInfo com listas fixas por process_status, numa página só."""
+
+    def __init__(self, atuais, resolvidos):
+        self.integracao = SimpleNamespace(id=1)
+        self.por_status = {servico.STATUS_ATUAIS: atuais, servico.STATUS_RESOLVIDOS: resolvidos}
+
+    def listar_alarmes_pagina(self, process_status, pagina, size):
+        alarmes = self.por_status[process_status]
+        return (alarmes if pagina == 1 else []), len(alarmes)
+
+
+def _alarme(fault_id, **campos):
+    return {"fault_id": fault_id, "ps_id": 10, "fault_code": "38", "create_time": "2025-03-01 10:00:00", **campos}
+
+
+def _status(db):
+    return {a.fault_id: a.process_status for a in db.query(VendorAlarm).filter_by(integracao_id=1)}
+
+
+def test_alarme_sem_process_status_fica_com_o_status_consultado(db):
+    servico.sincronizar_alarmes(db, ApiAlarmes([_alarme("A")], [_alarme("B")]), completo=True)
+
+    assert _status(db) == {"A": "8", "B": "9"}
+    assert servico.listar_alarmes(db, 1, servico.STATUS_ATUAIS) == [_alarme("A")]
+
+
+def test_varredura_completa_resolve_alarmes_que_sumiram_dos_atuais(db):
+    servico.sincronizar_alarmes(db, ApiAlarmes([_alarme("A"), _alarme("B")], []), completo=True)
+
+    # Incremental não enxerga o sumiço; a completa sim
+    servico.sincronizar_alarmes(db, ApiAlarmes([_alarme("A")], []))
+    assert _status(db) == {"A": "8", "B": "8"}
+
+    servico.sincronizar_alarmes(db, ApiAlarmes([_alarme("A")], []), completo=True)
+    assert _status(db) == {"A": "8", "B": "9"}
+    assert [a["fault_id"] for a in servico.listar_alarmes(db, 1, servico.STATUS_RESOLVIDOS)] == ["B"]
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from clients import deye_client
+from clients.deye_client import ApiDeye
+from simulador import frota
+from tests.conftest import integracao_falsa
+
+
+def test_geracao_diaria_inclui_o_ultimo_dia_do_periodo(simulador, token_pronto, monkeypatch):
+    monkeypatch.setattr(deye_client, "_usinas_cache", {})
+    token_pronto(2, "sim:conta")
+    api = ApiDeye(integracao=integracao_falsa(id=2, plataforma="Deye"), db=None)
+
+    ontem = frota.agora().date() - timedelta(days=1)
+    inicio = ontem - timedelta(days=6)
+    por_usina = api.get_geracao_diaria(inicio, ontem)
+
+    assert len(por_usina) == len(frota.usinas("deye", "conta"))
+    for dias in por_usina.values():
+        assert sorted(dias) == [inicio + timedelta(days=n) for n in range(7)]
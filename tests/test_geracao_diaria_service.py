@@ -0,0 +1,131 @@
+from datetime import date, timedelta
+
+import pytest
+
+from clients import deye_client
+from clients.adaptadores import ADAPTADORES
+from clients.base_client import AdapterSincrono
+from clients.deye_client import ApiDeye
+from models.daily_generation import DailyGeneration
+from services import geracao_diaria_service as servico
+from simulador import frota
+from tests.conftest import integracao_falsa
+
+ONTEM = date(2025, 3, 31)
+JANELA = [ONTEM - timedelta(days=n) for n in range(servico.DIAS_BACKFILL)]
+
+
+def test_primeira_carga_pede_a_janela_inteira():
+    assert servico.periodo_pendente({}, [], ONTEM) == (min(JANELA), ONTEM)
+
+
+def test_livro_em_dia_nao_pede_nada():
+    assert servico.periodo_pendente({"1": set(JANELA), "2": set(JANELA)}, [1, 2], ONTEM) is None
+
+
+def test_em_regime_pede_so_ontem():
+    gravados = {"1": set(JANELA) - {ONTEM}, "2": set(JANELA) - {ONTEM}}
+    assert servico.periodo_pendente(gravados, [1, 2], ONTEM) == (ONTEM, ONTEM)
+
+
+def test_falha_de_uma_usina_e_pedida_de_novo_mesmo_com_as_outras_em_dia():
+    buraco = ONTEM - timedelta(days=3)
+    gravados = {"1": set(JANELA), "2": set(JANELA) - {buraco}}
+    assert servico.periodo_pendente(gravados, [1, 2], ONTEM) == (buraco, ONTEM)
+
+
+def test_usina_nova_recebe_backfill():
+    assert servico.periodo_pendente({"1": set(JANELA)}, [1, "NE=9"], ONTEM) == (min(JANELA), ONTEM)
+
+
+class ClienteSemDados:
+    """Usina 1 com geração todo dia; a usina 2 o fabricante responde sempre sem dados."""
+    db = None
+
+    def __init__(self):
+        self.pedidos = []
+
+    def get_usinas(self):
+        return [{"ps_id": 1}, {"ps_id": 2}]
+
+    def get_geracao_diaria(self, inicio, fim):
+        self.pedidos.append((inicio, fim))
+        dias = [inicio + timedelta(days=n) for n in range((fim - inicio).days + 1)]
+        return {1: {dia: 10.0 for dia in dias}, 2: {}}
+
+
+class AdapterSemDados(AdapterSincrono):
+    plataforma = "falso"
+
+
+def test_usina_sem_dados_nao_prende_o_periodo_na_janela_inteira(db, monkeypatch):
+    monkeypatch.setitem(ADAPTADORES, ClienteSemDados, AdapterSemDados)
+    monkeypatch.setattr(servico, "_ontem", lambda: ONTEM)
+    cliente = ClienteSemDados()
+
+    servico.atualizar_geracao_diaria([cliente], db, 1)
+    servico.atualizar_geracao_diaria([cliente], db, 1)
+
+    # Na segunda execução só ontem volta a ser pedido: o fabricante pode consolidá-lo depois
+    assert cliente.pedidos == [(min(JANELA), ONTEM), (ONTEM, ONTEM)]
+    marcas = db.query(DailyGeneration).filter_by(plant_id="2").all()
+    assert {m.data for m in marcas} == set(JANELA) - {ONTEM}
+    assert all(m.energia_kwh is None for m in marcas)
+    assert [j["ps_id"] for j in servico.somar_janelas(db, 1, ate=ONTEM)["30dias"]] == [1]
+
+
+def test_marca_de_dia_sem_dado_nunca_apaga_um_valor(db):
+    servico._gravar(db, 1, "falso", {2: {ONTEM: None}})
+    servico._gravar(db, 1, "falso", {2: {ONTEM: 5.0}})
+    servico._gravar(db, 1, "falso", {2: {ONTEM: None}})
+    db.commit()
+
+    assert db.query(DailyGeneration).filter_by(plant_id="2").one().energia_kwh == 5.0
+
+
+@pytest.fixture
+def api_deye(simulador, token_pronto, monkeypatch):
+    monkeypatch.setattr(deye_client, "_usinas_cache", {})
+    token_pronto(2, "sim:conta")
+    return ApiDeye(integracao=integracao_falsa(id=2, plataforma="Deye"), db=None)
+
+
+def test_livro_completa_buracos_por_usina_e_soma_janelas(db, api_deye):
+    ontem = frota.agora().date() - timedelta(days=1)
+    usinas = frota.usinas("deye", "conta")
+
+    gravadas = servico.atualizar_geracao_diaria([api_deye], db, 1)
+    assert gravadas == len(usinas) * servico.DIAS_BACKFILL
+
+    # Em dia: nada a buscar
+    assert servico.atualizar_geracao_diaria([api_deye], db, 1) == 0
+
+    # Uma usina perdeu um dia no meio da janela: só ela tem o buraco, e ele volta
+    buraco = ontem - timedelta(days=5)
+    db.query(DailyGeneration).filter_by(plant_id=usinas[0]["id"], data=buraco).delete()
+    db.commit()
+    assert servico.atualizar_geracao_diaria([api_deye], db, 1) == len(usinas) * 6
+    assert db.query(DailyGeneration).filter_by(plant_id=usinas[0]["id"], data=buraco).count() == 1
+
+    janelas = servico.somar_janelas(db, 1)
+    assert {j["ps_id"] for j in janelas["diaria"]} == {int(u["id"]) for u in usinas}
+
+    linhas = db.query(DailyGeneration).filter_by(plant_id=usinas[0]["id"]).all()
+    esperado_7d = sum(l.energia_kwh for l in linhas if l.data > ontem - timedelta(days=7))
+    obtido_7d = next(j for j in janelas["7dias"] if j["ps_id"] == int(usinas[0]["id"]))
+    assert obtido_7d["energia_gerada_kWh"] == pytest.approx(esperado_7d, abs=0.01)
+
+
+def test_upsert_do_livro_usa_a_chave_unica_da_tabela():
+    from sqlalchemy.dialects import postgresql
+
+    class Capturar:
+        def execute(self, stmt):
+            self.sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    db = Capturar()
+    assert servico._gravar(db, 1, "deye", {1: {ONTEM: 1.0}}) == 1
+    assert "ON CONFLICT (cliente_id, fabricante, plant_id, data) DO UPDATE" in db.sql
+
+    unica = next(c for c in DailyGeneration.__table__.constraints if c.name == "uq_daily_generation_usina_data")
+    assert [col.name for col in unica.columns] == ["cliente_id", "fabricante", "plant_id", "data"]
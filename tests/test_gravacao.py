@@ -0,0 +1,75 @@
+import gzip
+from datetime import timedelta
+
+from requests.adapters import HTTPAdapter
+
+from clients import gravacao, isolarcloud_client, sessao_http
+from clients.isolarcloud_client import ApiSolarCloud
+from simulador import frota
+from tests.conftest import AdaptadorSimulador, integracao_falsa
+
+
+class SemRede(HTTPAdapter):
+    def send(self, request, **kwargs):
+        raise AssertionError(f"reprodução saiu para a rede: {request.url}")
+
+
+def _geracao_mes(simulador, monkeypatch, adaptador):
+    monkeypatch.setitem(sessao_http._adaptadores, simulador, adaptador)
+    api = ApiSolarCloud(db=None, integracao=integracao_falsa())
+    usina = frota.usinas("sungrow", "conta")[0]
+    api.usinas_cache = [{"ps_id": int(usina["id"])}]
+    monkeypatch.setattr(api, "_obter_ps_keys", lambda ps_id: list(usina["inversores"]))
+    return api.get_geracao_mes(data=frota.agora().strftime("%Y-%m"), plant_id=usina["id"])
+
+
+def test_gravar_e_reproduzir_devolvem_as_mesmas_respostas(simulador, token_pronto, monkeypatch, tmp_path):
+    monkeypatch.setattr(gravacao, "DIRETORIO", str(tmp_path))
+    monkeypatch.setattr(gravacao, "FATOR_LATENCIA", 0)
+    token_pronto(1, "sim:conta")
+
+    gravado = _geracao_mes(simulador, monkeypatch, gravacao.AdaptadorGravacao(AdaptadorSimulador(), "gravar"))
+    reprodutor = gravacao.AdaptadorGravacao(SemRede(), "reproduzir")
+    reproduzido = _geracao_mes(simulador, monkeypatch, reprodutor)
+
+    assert gravado["total"] > 0
+    assert reproduzido == gravado
+    assert sum(reprodutor._proxima.values()) > 0  # as respostas vieram da gravação
+
+    arquivo, = tmp_path.iterdir()
+    with gzip.open(arquivo, "rt", encoding="utf-8") as conteudo:
+        texto = conteudo.read()
+    assert "sim:conta" not in texto and "APPKEY" not in texto
+
+
+def _geracao_da_semana(simulador, monkeypatch, adaptador):
+    monkeypatch.setitem(sessao_http._adaptadores, simulador, adaptador)
+    api = ApiSolarCloud(db=None, integracao=integracao_falsa())
+    usina = frota.usinas("sungrow", "conta")[0]
+    api.usinas_cache = [{"ps_id": int(usina["id"])}]
+    monkeypatch.setattr(
+        isolarcloud_client.device_catalog_service, "obter_ps_keys_em_lote",
+        lambda db, integracao_id, ps_ids, buscar, max_concorrencia: [list(usina["inversores"])],
+    )
+    ontem = frota.agora().date() - timedelta(days=1)
+    return api.get_geracao_diaria(ontem - timedelta(days=6), ontem)[int(usina["id"])]
+
+
+def test_reproducao_em_outro_dia_encontra_a_gravacao_com_datas_deslocadas(simulador, token_pronto, monkeypatch, tmp_path):
+    monkeypatch.setattr(gravacao, "DIRETORIO", str(tmp_path))
+    monkeypatch.setattr(gravacao, "FATOR_LATENCIA", 0)
+    token_pronto(1, "sim:conta")
+
+    gravado = _geracao_da_semana(simulador, monkeypatch, gravacao.AdaptadorGravacao(AdaptadorSimulador(), "gravar"))
+
+    # A reprodução acontece 40 dias depois (o mês também muda)
+    deslocamento = timedelta(days=40)
+    hoje, agora = gravacao._hoje(), frota.agora
+    monkeypatch.setattr(gravacao, "_hoje", lambda: hoje + deslocamento)
+    monkeypatch.setattr(frota, "agora", lambda: agora() + deslocamento)
+    reprodutor = gravacao.AdaptadorGravacao(SemRede(), "reproduzir")
+    reproduzido = _geracao_da_semana(simulador, monkeypatch, reprodutor)
+
+    assert len(gravado) == 7
+    assert reproduzido == {dia + deslocamento: kwh for dia, kwh in gravado.items()}
+    assert sum(reprodutor._proxima.values()) > 0
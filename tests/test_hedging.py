@@ -0,0 +1,59 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from clients import hedging
+
+URL = "http://fabricante/getPowerStationList"
+
+
+class SessaoFalsa:
+    def __init__(self, *atrasos):
+        self.atrasos = list(atrasos)
+        self.chamadas = 0
+        self._lock = threading.Lock()
+
+    def post(self, url, **kwargs):
+        with self._lock:
+            atraso = self.atrasos[self.chamadas]
+            self.chamadas += 1
+        time.sleep(atraso)
+        return f"resposta-{atraso}"
+
+
+@pytest.fixture
+def hedge(monkeypatch):
+    monkeypatch.setattr(hedging, "HEDGE_ATIVO", True)
+    monkeypatch.setattr(hedging, "ORCAMENTO", 1.0)
+    monkeypatch.setattr(hedging, "estatisticas", hedging._Estatisticas())
+    for _ in range(hedging.AMOSTRAS_MINIMAS):
+        hedging.estatisticas.registrar_latencia("fabricante/getPowerStationList", 0.05)
+
+
+def test_fila_do_pool_nao_dispara_copia(hedge, monkeypatch):
+    ocupado = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=1)
+    executor.submit(ocupado.wait, 5)
+    monkeypatch.setattr(hedging, "_executor", executor)
+
+    sessao = SessaoFalsa(0.01)
+    try:
+        assert hedging.post_com_hedge(sessao, URL) == "resposta-0.01"
+    finally:
+        ocupado.set()
+        executor.shutdown()
+
+    assert sessao.chamadas == 1
+    assert list(hedging.estatisticas.chamadas) == [False]
+
+
+def test_principal_lenta_perde_para_a_copia(hedge):
+    sessao = SessaoFalsa(1.0, 0.0)
+
+    inicio = time.monotonic()
+    assert hedging.post_com_hedge(sessao, URL) == "resposta-0.0"
+
+    assert time.monotonic() - inicio < 0.5
+    assert list(hedging.estatisticas.chamadas) == [True]
@@ -0,0 +1,25 @@
+from models.generation_history import GenerationHistory
+from services.historico_service import obter_historico
+
+PARCIAL = {"30dias": [{"date": "2024-01-01", "production": 1.0}], "total": 1.0}
+COMPLETO = {"30dias": [{"date": "2024-01-01", "production": 3.0}], "total": 3.0}
+
+
+def _registro(db):
+    return db.query(GenerationHistory).filter_by(integracao_id=1, plant_id="7", periodo="2024-01").one()
+
+
+def test_periodo_encerrado_so_fecha_com_resposta_completa(db):
+    assert obter_historico(db, 1, 7, "mes", "2024-01", lambda: (PARCIAL, False)) == PARCIAL
+    assert not _registro(db).fechado
+
+    # Nova resposta parcial não substitui a versão salva
+    assert obter_historico(db, 1, 7, "mes", "2024-01", lambda: ({"30dias": [], "total": 0}, False)) == PARCIAL
+
+    assert obter_historico(db, 1, 7, "mes", "2024-01", lambda: (COMPLETO, True)) == COMPLETO
+    assert _registro(db).fechado
+
+    def nao_chamar():
+        raise AssertionError("período fechado não consulta o fabricante")
+
+    assert obter_historico(db, 1, 7, "mes", "2024-01", nao_chamar) == COMPLETO
@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+import pytest
+
+from clients import hypontech_client, sessao_http
+from clients.hypontech_client import ApiHyponCloud
+from simulador import frota
+from tests.conftest import integracao_falsa
+
+
+def _hypon(**campos):
+    return ApiHyponCloud(db=None, integracao=integracao_falsa(id=5, plataforma="Hypontech", **campos))
+
+
+def test_login_usa_as_chaves_do_ambiente_quando_a_integracao_nao_traz(simulador, monkeypatch):
+    monkeypatch.setattr(hypontech_client, "HYPON_APPKEY", "APPKEY-ENV")
+    monkeypatch.setattr(hypontech_client, "HYPON_ACCESS_KEY", "XKEY-ENV")
+    enviados = []
+    adaptador = sessao_http._adaptadores[simulador]
+    enviar = adaptador.send
+
+    def capturar(request, **kwargs):
+        enviados.append(request)
+        return enviar(request, **kwargs)
+
+    monkeypatch.setattr(adaptador, "send", capturar)
+    api = _hypon(appkey=None, x_access_key=None)
+
+    assert api._obter_token() == "sim:conta"
+
+    request, = enviados
+    assert request.url == simulador + "hypon/v2/login"
+    assert request.headers["x-access-key"] == "XKEY-ENV"
+    assert request.headers["sys_code"] == "901"
+    assert b'"appkey": "APPKEY-ENV"' in request.body
+
+
+def test_sem_chaves_na_integracao_nem_no_ambiente_falha_na_criacao(monkeypatch):
+    monkeypatch.setattr(hypontech_client, "HYPON_APPKEY", None)
+    monkeypatch.setattr(hypontech_client, "HYPON_ACCESS_KEY", None)
+
+    with pytest.raises(ValueError, match="HYPON_APPKEY"):
+        _hypon(appkey=None, x_access_key=None)
+
+    api = _hypon()
+    assert api.appkey == "APPKEY"
+    assert api.headers["x-access-key"] == "XKEY"
+
+
+def test_usinas_e_janelas_de_geracao_no_formato_dos_demais(simulador, token_pronto, monkeypatch):
+    monkeypatch.setattr(hypontech_client, "_usinas_cache", {})
+    token_pronto(5, "sim:conta")
+    api = _hypon()
+    usinas = frota.usinas("hypon", "conta")
+
+    listadas = api.get_usinas()
+    assert [u["ps_id"] for u in listadas] == [int(u["id"]) for u in usinas]
+    assert all(u["capacidade"] > 0 and u["ps_fault_status"] == 3 for u in listadas)
+
+    ontem = frota.agora().date() - timedelta(days=1)
+    por_usina = api.get_geracao_diaria(ontem - timedelta(days=29), ontem)
+    geracao = api.get_geracao()
+
+    assert len(geracao["diario"]) == len(geracao["7dias"]) == len(geracao["30dias"]["por_usina"]) == len(usinas)
+    primeira = int(usinas[0]["id"])
+    esperado_7d = sum(v for dia, v in por_usina[primeira].items() if dia > ontem - timedelta(days=7))
+    obtido_7d = next(j for j in geracao["7dias"] if j["ps_id"] == primeira)
+    assert obtido_7d["energia_gerada_kWh"] == pytest.approx(esperado_7d, abs=0.01)
@@ -0,0 +1,143 @@
+from datetime import datetime
+
+import pytest
+from pytz import timezone
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+
+from clients import isolarcloud_client
+from clients.excessions import FabricanteIndisponivel
+from clients.isolarcloud_client import ApiSolarCloud
+from simulador import frota
+from tests.conftest import integracao_falsa
+
+
+@pytest.fixture
+def api(simulador, token_pronto, monkeypatch):
+    token_pronto(1, "sim:conta")
+    api = ApiSolarCloud(db=None, integracao=integracao_falsa())
+    usina = frota.usinas("sungrow", "conta")[0]
+    api.usinas_cache = [{"ps_id": int(usina["id"])}]
+    monkeypatch.setattr(api, "_obter_ps_keys", lambda ps_id: list(usina["inversores"]))
+    return api, usina
+
+
+def test_geracao_mes_e_ano_somam_os_inversores(api):
+    api, usina = api
+    hoje = frota.agora()
+
+    mes = api.get_geracao_mes(data=hoje.strftime("%Y-%m"), plant_id=usina["id"])
+    assert mes["30dias"] and mes["total"] > 0
+
+    ano = api.get_geracao_ano(ano=str(hoje.year), plant_id=usina["id"])
+    assert ano["anual"][-1]["date"] == hoje.strftime("%Y-%m")
+
+
+class AdaptadorHtml(HTTPAdapter):
+    def send(self, request, **kwargs):
+        response = Response()
+        response.status_code = 502
+        response._content = b"<html>Bad Gateway</html>"
+        response.request = request
+        return response
+
+
+def test_geracao_mes_com_5xx_nao_json_volta_vazia(api, monkeypatch):
+    api, usina = api
+    monkeypatch.setattr("clients.sessao_http.MAX_TENTATIVAS", 1)
+    api.session.mount(api.base_url, AdaptadorHtml())
+
+    assert api.get_geracao_mes(data="2025-01", plant_id=usina["id"]) == {"30dias": [], "total": 0}
+
+
+def test_geracao_mes_com_lote_falho_nao_esta_completa(api, monkeypatch):
+    api, usina = api
+    api.ps_keys_por_requisicao = 1
+    post = api._post_with_auth
+    chamadas = []
+
+    def primeiro_lote_falha(url, body, hedge=False):
+        chamadas.append(body["ps_key_list"])
+        return None if len(chamadas) == 1 else post(url, body, hedge)
+
+    monkeypatch.setattr(api, "_post_with_auth", primeiro_lote_falha)
+    monkeypatch.setattr(api, "max_concorrencia", 1)
+
+    resultado, completo = api.get_geracao_mes(data=frota.agora().strftime("%Y-%m"), plant_id=usina["id"], com_status=True)
+    assert not completo and resultado["total"] > 0
+
+    _, completo = api.get_geracao_mes(data=frota.agora().strftime("%Y-%m"), plant_id=usina["id"], com_status=True)
+    assert completo
+
+
+def test_geracao_ano_com_disjuntor_aberto_levanta_fabricante_indisponivel(api):
+    api, usina = api
+    api.session.disjuntor.aberto_ate = float("inf")
+
+    with pytest.raises(FabricanteIndisponivel):
+        api.get_geracao_ano(ano="2025", plant_id=usina["id"])
+
+
+def test_geracao_diaria_inclui_usina_sem_dados_e_omite_a_que_falhou(api, monkeypatch):
+    api, usina = api
+    hoje = frota.agora().date()
+    api.usinas_cache = [{"ps_id": int(usina["id"])}, {"ps_id": 999}]
+    monkeypatch.setattr(
+        isolarcloud_client.device_catalog_service, "obter_ps_keys_em_lote",
+        lambda db, integracao_id, ps_ids, buscar, max_concorrencia: [list(usina["inversores"]), []],
+    )
+
+    por_usina = api.get_geracao_diaria(hoje, hoje)
+    assert por_usina[999] == {} and por_usina[int(usina["id"])]
+
+    monkeypatch.setattr(api, "_buscar_energia_diaria", lambda ps_keys, inicio, fim: ({}, {ps_keys[0]}))
+    assert api.get_geracao_diaria(hoje, hoje) == {999: {}}
+
+
+def _curva_do_dia(api, monkeypatch, respostas):
+    """Roda _atualizar_curva_do_dia uma vez por resposta e devolve (início, fim) pedidos em cada rodada."""
+    monkeypatch.setattr(isolarcloud_client, "_curvas_do_dia", {})
+    brasil = timezone("America/Sao_Paulo")
+    data_dt = datetime.strptime(datetime.now(brasil).strftime("%Y-%m-%d"), "%Y-%m-%d").replace(tzinfo=brasil)
+
+    inicios = []
+    for resposta in respostas:
+        def buscar(keys, blocos, resposta=resposta):
+            inicios.append((blocos[0][0], blocos[-1][1]))
+            return resposta
+        monkeypatch.setattr(api, "_buscar_curva_minutos", buscar)
+        api._atualizar_curva_do_dia(1, data_dt, ["1_1_1"])
+    return data_dt, inicios
+
+
+def test_ps_key_sem_pontos_nao_volta_a_meia_noite(monkeypatch):
+    api = ApiSolarCloud.__new__(ApiSolarCloud)
+    api.integracao = integracao_falsa()
+
+    data_dt, (primeiro, segundo) = _curva_do_dia(api, monkeypatch, [({}, set()), ({}, set())])
+
+    meia_noite = data_dt.replace(hour=0, minute=0, second=0)
+    assert primeiro[0] == meia_noite
+    retomada = max(meia_noite, primeiro[1] - isolarcloud_client.RELEITURA_CURVA)
+    assert segundo[0] == retomada.replace(minute=retomada.minute - retomada.minute % 5, second=0, microsecond=0)
+
+
+def test_ps_key_com_falha_e_buscado_de_novo(monkeypatch):
+    api = ApiSolarCloud.__new__(ApiSolarCloud)
+    api.integracao = integracao_falsa()
+
+    data_dt, (primeiro, segundo) = _curva_do_dia(api, monkeypatch, [({}, {"1_1_1"}), ({}, set())])
+
+    assert primeiro[0] == segundo[0] == data_dt.replace(hour=0, minute=0, second=0)
+
+
+def test_slot_publicado_com_atraso_ainda_e_pedido(monkeypatch):
+    api = ApiSolarCloud.__new__(ApiSolarCloud)
+    api.integracao = integracao_falsa()
+    hoje = datetime.now(timezone("America/Sao_Paulo")).strftime("%Y%m%d")
+    # 00:10 chegou, 00:05 ainda não: a próxima rodada precisa voltar a pedir 00:05
+    pontos = {"1_1_1": [{"time_stamp": hoje + "000000"}, {"time_stamp": hoje + "001000"}]}
+
+    data_dt, (_, segundo) = _curva_do_dia(api, monkeypatch, [(pontos, set()), ({}, set())])
+
+    assert segundo[0] <= data_dt.replace(hour=0, minute=5, second=0)
@@ -0,0 +1,60 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from clients import limitador_fusionsolar as modulo
+from clients.excessions import FabricanteIndisponivel
+
+
+@pytest.fixture
+def limitador(monkeypatch):
+    monkeypatch.setattr(modulo, "INTERVALO_MINIMO", 0.001)
+    monkeypatch.setattr(modulo, "INTERVALO_MAXIMO", 0.01)
+    monkeypatch.setattr(modulo, "MAX_TENTATIVAS", 3)
+    return modulo.LimitadorFusionSolar()
+
+
+def _resposta(status_code=200, fail_code=None):
+    return SimpleNamespace(status_code=status_code, json=lambda: {"success": fail_code is None, "failCode": fail_code})
+
+
+def test_espera_da_fila_nao_segura_o_lock_e_aparece_na_profundidade(limitador):
+    fila = limitador._fila(1, "getDevKpiDay")
+    fila.proxima = time.monotonic() + 0.3
+    resultado = []
+
+    chamada = threading.Thread(target=lambda: resultado.append(limitador.executar(1, "getDevKpiDay", _resposta)))
+    chamada.start()
+    time.sleep(0.05)
+
+    assert limitador.profundidade_fila(1) == {(1, "getDevKpiDay"): 1}
+    assert fila.lock.acquire(blocking=False)  # quem espera a vez não bloqueia a fila
+    fila.lock.release()
+
+    chamada.join(timeout=5)
+    assert resultado[0].status_code == 200
+    assert limitador.profundidade_fila(1) == {(1, "getDevKpiDay"): 0}
+
+
+def test_limite_persistente_levanta_fabricante_indisponivel(limitador):
+    chamadas = []
+
+    def limitada():
+        chamadas.append(1)
+        return _resposta(fail_code=407)
+
+    with pytest.raises(FabricanteIndisponivel):
+        limitador.executar(1, "stations", limitada)
+    assert len(chamadas) == modulo.MAX_TENTATIVAS
+
+
+def test_vaga_alem_da_espera_maxima_desiste_sem_chamar(limitador, monkeypatch):
+    monkeypatch.setattr(modulo, "ESPERA_MAXIMA", 0.05)
+    limitador._fila(1, "stations").proxima = time.monotonic() + 60
+
+    inicio = time.monotonic()
+    with pytest.raises(FabricanteIndisponivel):
+        limitador.executar(1, "stations", lambda: pytest.fail("não devia chamar o fabricante"))
+    assert time.monotonic() - inicio < 1
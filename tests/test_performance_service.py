@@ -0,0 +1,30 @@
+from models.performance_cache import PerformanceCache
+from services import performance_service as servico
+
+
+def _resultado(plant_id, percentual):
+    return {"plant_id": plant_id, "performance_percentual": percentual}
+
+
+def test_upsert_do_cache_usa_a_chave_unica_da_tabela():
+    from sqlalchemy.dialects import postgresql
+
+    class Capturar:
+        def execute(self, stmt):
+            self.sql = str(stmt.compile(dialect=postgresql.dialect()))
+
+    db = Capturar()
+    servico._gravar_performances(db, 1, "diaria", [_resultado(1, 90)])
+    assert "ON CONFLICT (cliente_id, tipo, plant_id) DO UPDATE" in db.sql
+
+
+def test_recalculo_de_uma_usina_so_toca_a_linha_dela(db):
+    servico._gravar_performances(db, 1, "diaria", [_resultado(1, 90), _resultado("NE=2", 80)])
+    db.commit()
+
+    servico._gravar_performances(db, 1, "diaria", [_resultado("NE=2", 85)])
+    db.commit()
+
+    linhas = {c.plant_id: c.resultado_json for c in db.query(PerformanceCache).filter_by(cliente_id=1, tipo="diaria")}
+    assert linhas == {"1": _resultado(1, 90), "NE=2": _resultado("NE=2", 85)}
+    assert [c.plant_id for c in servico._ler_caches(db, 1, plant_id="NE=2")["diaria"]] == ["NE=2"]
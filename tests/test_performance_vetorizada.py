@@ -0,0 +1,26 @@
+import calendar
+from datetime import datetime
+
+import pytest
+
+from services.performance_service import CALCULADORAS
+from services.performance_vetorizada import calcular_janela
+
+# (plant_id, kWh gerado, projeção mensal): com projeção, sem projeção, projeção zero, geração zero
+USINAS = [(1, 123.4, 3000), ("NE=2", 7.89, None), (3, 50.0, 0), (4, 0.0, 1234.5), (5, 3333.3, 98765.4)]
+
+
+@pytest.mark.parametrize("tipo", list(CALCULADORAS))
+def test_janela_vetorizada_igual_ao_calculo_por_usina(tipo):
+    hoje = datetime.now()
+    dias_do_mes = calendar.monthrange(hoje.year, hoje.month)[1]
+    projecoes = {(str(p), hoje.year, hoje.month): kwh for p, _, kwh in USINAS}
+
+    esperado = [CALCULADORAS[tipo](p, kwh, None, 1, projecoes=projecoes) for p, kwh, _ in USINAS]
+    obtido = calcular_janela(
+        tipo, [p for p, _, _ in USINAS], [kwh for _, kwh, _ in USINAS],
+        [proj for _, _, proj in USINAS], dias_do_mes, hoje.month,
+    )
+
+    assert obtido == esperado
+    assert [list(r) for r in obtido] == [list(r) for r in esperado]
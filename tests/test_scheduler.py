@@ -0,0 +1,22 @@
+from clients import deye_client
+from modelos import User, Integracao
+from models.daily_generation import DailyGeneration
+from models.performance_cache import PerformanceCache
+from services import scheduler
+from simulador import frota
+
+
+def test_rotina_1h_grava_livro_e_performance(db, simulador, token_pronto, monkeypatch):
+    monkeypatch.setattr(scheduler, "SessionLocal", db.fabrica)
+    monkeypatch.setattr(deye_client, "_usinas_cache", {})
+    db.add(User(id=1, email="cliente@exemplo.com", hashed_password="x"))
+    db.add(Integracao(id=2, cliente_id=1, plataforma="Deye", username="conta", senha="senha"))
+    db.commit()
+    token_pronto(2, "sim:conta")
+
+    scheduler.executar_rotina_1h()
+
+    usinas = {u["id"] for u in frota.usinas("deye", "conta")}
+    assert {l.plant_id for l in db.query(DailyGeneration).filter_by(cliente_id=1)} == usinas
+    tipos = {linha.tipo for linha in db.query(PerformanceCache).filter_by(cliente_id=1)}
+    assert tipos == {"diaria", "7dias", "30dias"}
@@ -0,0 +1,110 @@
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+from requests.models import Response
+
+from clients import disjuntor, sessao_http
+from clients.excessions import FabricanteIndisponivel
+
+
+class AdaptadorFalso(HTTPAdapter):
+    """Devolve, em ordem, as respostas (status ou (status, corpo)) e exceções de `roteiro`."""
+
+    def __init__(self, roteiro):
+        super().__init__()
+        self.roteiro = list(roteiro)
+        self.chamadas = 0
+
+    def send(self, request, **kwargs):
+        self.chamadas += 1
+        item = self.roteiro.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        status, corpo = item if isinstance(item, tuple) else (item, b'{"ok": true}')
+        response = Response()
+        response.status_code = status
+        response._content = corpo
+        response.request = request
+        response.url = request.url
+        return response
+
+
+@pytest.fixture
+def sessao(monkeypatch):
+    monkeypatch.setattr(sessao_http, "MAX_TENTATIVAS", 2)
+    monkeypatch.setattr(sessao_http, "RECUO_BASE", 0)
+    monkeypatch.setattr(disjuntor, "FALHAS_PARA_ABRIR", 1)
+    monkeypatch.setattr(disjuntor, "TEMPO_ABERTO", 0)
+    disjuntor._disjuntores.clear()
+
+    def criar(roteiro, erro_transitorio=None):
+        s = sessao_http.SessaoResiliente("teste", erro_transitorio)
+        s.mount("http://fabricante/", AdaptadorFalso(roteiro))
+        return s
+
+    return criar
+
+
+def test_disjuntor_abre_e_fecha_com_chamada_de_teste(monkeypatch):
+    monkeypatch.setattr(disjuntor, "FALHAS_PARA_ABRIR", 2)
+    monkeypatch.setattr(disjuntor, "TEMPO_ABERTO", 60)
+    d = disjuntor.Disjuntor("x")
+
+    d.registrar_falha()
+    assert d.permitir()
+    d.registrar_falha()
+    assert d.aberto and not d.permitir()
+
+    d.aberto_ate = 0  # tempo aberto esgotado
+    assert d.permitir()       # chamada de teste
+    assert not d.permitir()   # só uma por vez
+    d.registrar_sucesso()
+    assert not d.aberto and d.permitir()
+
+
+def test_retenta_erro_5xx_e_registra_sucesso(sessao):
+    s = sessao([502, 200])
+    assert s.get("http://fabricante/x").status_code == 200
+    assert s.disjuntor.falhas == 0
+
+
+@pytest.mark.parametrize("erro", [requests.exceptions.ChunkedEncodingError(), requests.TooManyRedirects()])
+def test_chamada_de_teste_com_excecao_nao_trava_o_disjuntor(sessao, erro):
+    s = sessao([requests.ConnectionError(), requests.ConnectionError(), erro, erro, 200])
+
+    with pytest.raises(requests.ConnectionError):
+        s.get("http://fabricante/x")
+    assert s.disjuntor.aberto_ate is not None
+
+    # Chamada de teste falha com uma RequestException que não é de conexão
+    with pytest.raises(type(erro)):
+        s.get("http://fabricante/x")
+    assert not s.disjuntor.testando
+
+    # O disjuntor volta a liberar a próxima chamada de teste
+    assert s.get("http://fabricante/x").status_code == 200
+    assert s.disjuntor.aberto_ate is None
+
+
+def test_hook_de_erro_transitorio_que_levanta_nao_trava_o_disjuntor(sessao):
+    def hook(response):
+        if response.text.startswith("<html"):
+            raise ValueError("corpo não é JSON")
+        return False
+
+    s = sessao([requests.Timeout(), requests.Timeout(), (200, b"<html>manutencao</html>"), 200], erro_transitorio=hook)
+    with pytest.raises(requests.Timeout):
+        s.get("http://fabricante/x")
+
+    with pytest.raises(ValueError):
+        s.get("http://fabricante/x")
+    assert not s.disjuntor.testando
+    assert s.get("http://fabricante/x").status_code == 200
+
+
+def test_disjuntor_aberto_recusa_sem_chamar_o_fabricante(sessao, monkeypatch):
+    monkeypatch.setattr(disjuntor, "TEMPO_ABERTO", 60)
+    s = sessao([500, 500])
+    s.get("http://fabricante/x")
+    with pytest.raises(FabricanteIndisponivel):
+        s.get("http://fabricante/x")
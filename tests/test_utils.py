@@ -0,0 +1,39 @@
+from modelos import User, Integracao
+from clients.isolarcloud_client import ApiSolarCloud
+from clients.deye_client import ApiDeye
+from clients.huawei_client import ApiHuawei
+from clients.hypontech_client import ApiHyponCloud
+from utils import get_apis_ativas
+
+
+def test_apis_ativas_monta_um_cliente_por_integracao(db, token_pronto):
+    db.add(User(id=1, email="cliente@exemplo.com", hashed_password="x"))
+    for id_, plataforma in enumerate(["Sungrow", "Deye", "Huawei", "Hypontech"], start=1):
+        db.add(Integracao(
+            id=id_, cliente_id=1, plataforma=plataforma, username="conta", senha="senha",
+            appkey="APPKEY", x_access_key="XKEY",
+        ))
+        token_pronto(id_, f"token-{id_}")
+    db.commit()
+
+    apis = get_apis_ativas(db, 1)
+
+    assert [type(api) for api in apis] == [ApiSolarCloud, ApiDeye, ApiHuawei, ApiHyponCloud]
+
+
+def test_geracoes_diarias_usa_os_clientes_de_get_apis_ativas(db, monkeypatch):
+    import app
+    from types import SimpleNamespace
+
+    class Api:
+        def __init__(self, diario):
+            self.diario = diario
+
+        def get_geracao(self):
+            if self.diario is None:
+                raise RuntimeError("fabricante fora do ar")
+            return {"diario": self.diario}
+
+    monkeypatch.setattr(app, "get_apis_ativas", lambda db, cliente_id: [Api([{"ps_id": 1}]), Api(None), Api([{"ps_id": 2}])])
+
+    assert app.listar_geracoes_diarias(db=db, usuario_logado=SimpleNamespace(id=1)) == [{"ps_id": 1}, {"ps_id": 2}]
@@ -7,6 +7,8 @@ from sqlalchemy.orm import Session
 import hashlib
 from clients.isolarcloud_client import ApiSolarCloud
 from clients.deye_client import ApiDeye
+from clients.huawei_client import ApiHuawei
+from clients.hypontech_client import ApiHyponCloud
 from datetime import datetime
 from pytz import timezone
 
@@ -22,6 +24,10 @@ def get_apis_ativas(db: Session, cliente_id: int):
             apis.append(ApiSolarCloud(db=db, integracao=integracao))
         elif integracao.plataforma.lower() == "deye":
             apis.append(ApiDeye(db=db, integracao=integracao))
+        elif integracao.plataforma.lower() == "huawei":
+            apis.append(ApiHuawei(db=db, integracao=integracao))
+        elif integracao.plataforma.lower() == "hypontech":
+            apis.append(ApiHyponCloud(db=db, integracao=integracao))
         # Adicione aqui novas plataformas se necessário
 
     return apis